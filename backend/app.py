@@ -5,12 +5,72 @@ from datetime import datetime
 import os
 import shutil
 
-from models import db, Data, FitbitAuth, FitbitWeight, WeightGoal
-from routes import api, fitbit_api, weight_goal_api
+from models import db, Data, FitbitAuth, FitbitWeight, WeightGoal, run_migrations
+from routes import api, auth_api, fitbit_api, weight_goal_api, metrics_api, profiling_allowed
 from config import get_config
 from swagger import register_swagger
+from services import (
+    start_sync_worker, register_rollup_hooks, register_goal_achievement_hooks, register_data_version_hooks,
+    register_result_cache_hooks, register_sqlite_pragmas, register_instrumentation
+)
+from cli import register_commands
 
-def create_app():
+def initialize_app(app):
+    """
+    データベースのスキーマ作成・マイグレーションと静的ファイルの準備
+    
+    gunicorn の preload_app ではマスタープロセスで1回だけ実行され、
+    フォークした各ワーカーでは繰り返さない。
+    
+    引数:
+        app (Flask): Flaskアプリケーション
+    """
+    with app.app_context():
+        # SQLiteファイルの置き場所を作成（相対パスは instance_path 基準に解決済み）
+        url = db.engine.url
+        if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
+        
+        db.create_all()
+        
+        # 既存データベースへのスキーマ変更（インデックス追加など）を適用
+        run_migrations()
+    
+    # OpenAPIスキーマファイルをコピー
+    static_dir = os.path.join(app.root_path, 'static')
+    os.makedirs(static_dir, exist_ok=True)
+    
+    openapi_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'openapi.yaml')
+    if os.path.exists(openapi_file):
+        shutil.copy(openapi_file, os.path.join(static_dir, 'openapi.yaml'))
+
+def reset_after_fork(app):
+    """
+    フォークしたワーカープロセスで、親プロセスから引き継いだ接続とクライアントを破棄
+    
+    データベース接続はソケットを閉じずにプールから切り離し（親プロセスの接続を壊さない）、
+    HTTP接続プール・トークンキャッシュ・APIトークンキャッシュ・結果キャッシュ・計測値は各ワーカーで作り直させる。
+    
+    引数:
+        app (Flask): Flaskアプリケーション
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    for name in ('fitbit_client', 'fitbit_token_cache', 'api_token_cache', 'result_cache', 'fitbit_sync_worker',
+                 'request_metrics'):
+        app.extensions.pop(name, None)
+
+def create_app(initialize=True):
+    """
+    Flaskアプリケーションを作成
+    
+    引数:
+        initialize (bool): initialize_app() によるスキーマ作成などを行う場合 True
+        
+    戻り値:
+        Flask: Flaskアプリケーション
+    """
     app = Flask(__name__)
     # 設定を適用
     app.config.from_object(get_config())
@@ -21,30 +81,49 @@ def create_app():
     # データベースを初期化
     db.init_app(app)
     
+    # SQLiteの接続ごとにPRAGMA（WALモードなど）を設定
+    register_sqlite_pragmas(app)
+    
+    # リクエストの計測（ルートごとの応答時間・SQLクエリ数）とプロファイリングのフックを登録
+    # （プロファイリングは METRICS_TOKEN またはセッション・APIトークンで認証されたリクエストのみ）
+    register_instrumentation(app, authorize_profile=profiling_allowed)
+    
     # ルートを登録
     app.register_blueprint(api, url_prefix='/api')
+    app.register_blueprint(auth_api, url_prefix='/api/auth')
     app.register_blueprint(fitbit_api, url_prefix='/api/fitbit')
     app.register_blueprint(weight_goal_api, url_prefix='/api/fit')
+    app.register_blueprint(metrics_api)
+    
+    # 体重記録の変更時に日次集計を更新するフックを登録
+    register_rollup_hooks()
+    
+    # 日次集計の更新後に目標の達成を判定するフックを登録
+    register_goal_achievement_hooks()
+    
+    # 書き込み時にデータバージョン（ETag）を更新するフックを登録
+    register_data_version_hooks()
+    
+    # 書き込み時に結果キャッシュを無効化する通知を登録
+    register_result_cache_hooks()
+    
+    # CLIコマンドを登録
+    register_commands(app)
     
     # セッションシークレットキー
     app.secret_key = app.config['SECRET_KEY']
     
-    with app.app_context():
-        # instance ディレクトリの存在を確認
-        os.makedirs('/app/instance', exist_ok=True)
-        db.create_all()
-        
-        # OpenAPIスキーマファイルをコピー
-        static_dir = os.path.join(app.root_path, 'static')
-        os.makedirs(static_dir, exist_ok=True)
-        
-        openapi_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'openapi.yaml')
-        if os.path.exists(openapi_file):
-            shutil.copy(openapi_file, os.path.join(static_dir, 'openapi.yaml'))
+    if initialize:
+        initialize_app(app)
     
     # Swagger UIを登録
     register_swagger(app)
     
+    # Fitbitデータのバックグラウンド同期を開始（設定で有効な場合）
+    # gunicorn ではフォーク後に各ワーカーで開始する（gunicorn.conf.py の post_worker_init）
+    if not app.config['DEFER_BACKGROUND_WORKERS']:
+        start_sync_worker(app)
+    
     return app
 
 app = create_app()
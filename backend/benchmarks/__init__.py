@@ -0,0 +1 @@
+# ベンチマークパッケージを定義
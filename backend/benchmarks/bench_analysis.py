@@ -0,0 +1,72 @@
+"""
+/api/fitbit/weight/analysis のベンチマーク
+
+数年分の記録に対して、ORMオブジェクトを読み込んでPythonのリストで統計を計算する
+従来の方法と、日次集計をNumPy配列として読み込むベクトル化された分析を比較する。
+
+実行方法:
+    cd backend && python -m benchmarks.bench_analysis
+"""
+import time
+from datetime import datetime
+
+from benchmarks.common import app, reset_database, seed_weights, time_request
+from models import FitbitWeight
+from services import load_daily_series, analyze_series, ANALYSIS_METRICS
+
+YEARS = (1, 3, 5, 10)
+READINGS_PER_DAY = 4
+
+
+def legacy_analysis(user_id, from_date, to_date):
+    """従来の実装（ORMオブジェクトを全件読み込み、Pythonで集計）"""
+    weight_data = FitbitWeight.query.filter(
+        FitbitWeight.user_id == user_id,
+        FitbitWeight.date >= from_date,
+        FitbitWeight.date <= to_date
+    ).order_by(FitbitWeight.date, FitbitWeight.time).all()
+    weights = [entry.weight for entry in weight_data if entry.weight]
+    dates = [entry.date.isoformat() for entry in weight_data]
+    return {
+        'count': len(weights),
+        'min_weight': min(weights),
+        'max_weight': max(weights),
+        'avg_weight': sum(weights) / len(weights),
+        'start_weight': weights[0],
+        'end_weight': weights[-1],
+        'change': weights[-1] - weights[0],
+        'chart_data': [{'date': date, 'weight': weight} for date, weight in zip(dates, weights)]
+    }
+
+
+def time_call(func, repeat=5):
+    """関数の最速の実行時間（ミリ秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def main():
+    print(f'{"years":>6} {"readings":>9} {"legacy ms":>10} {"summary ms":>11} {"all metrics ms":>15} {"endpoint ms":>12}')
+    with app.app_context():
+        client = app.test_client()
+        for years in YEARS:
+            reset_database()
+            readings = years * 365 * READINGS_PER_DAY
+            start_date = seed_weights('default_user', readings, readings_per_day=READINGS_PER_DAY)
+            from_date = start_date.isoformat()
+            to_date = datetime.now().date().isoformat()
+
+            legacy = time_call(lambda: legacy_analysis('default_user', from_date, to_date))
+            summary = time_call(lambda: analyze_series(load_daily_series('default_user', from_date, to_date)))
+            full = time_call(lambda: analyze_series(load_daily_series('default_user', from_date, to_date), ANALYSIS_METRICS))
+            endpoint = time_request(
+                client, f'/api/fitbit/weight/analysis?from_date={from_date}&to_date={to_date}&metrics=all')
+            print(f'{years:>6} {readings:>9} {legacy:>10.1f} {summary:>11.1f} {full:>15.1f} {endpoint:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+多数のユーザーの同期ジョブのスループット比較（ブロッキングI/Oと非同期I/O）
+
+ローカルのFitbit APIテストダブル（応答に --latency 秒の遅延）に対して、
+連携済みユーザーごとに1件の同期ジョブを登録し、run_pending_jobs() で全ジョブを処理する。
+FITBIT_ASYNC_IO を無効にした場合（ジョブごとに requests で順に取得）と
+有効にした場合（FITBIT_SYNC_BATCH_SIZE 件ずつ1つのイベントループで同時に取得）の
+処理時間・ジョブ/秒・Fitbit API呼び出しのレイテンシを出力する。
+どちらも実際のHTTP接続でテストダブルを呼び出す。
+
+実行方法:
+    cd backend && python -m benchmarks.bench_async_sync [--users 500] [--latency 0.05] [--concurrency 20]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import app, reset_database
+from models import db, FitbitSyncJob
+from services import enqueue_sync, get_fitbit_client, run_pending_jobs
+from tests.fake_fitbit import FakeFitbitServer, make_weight_logs, create_auth
+
+
+def run(server, users, async_io):
+    """
+    全ユーザーの同期ジョブを処理
+
+    戻り値:
+        tuple: (経過時間（秒）, Fitbit API呼び出しの計測値)
+    """
+    reset_database()
+    server.requests.clear()
+    # テストダブルのレート制限は全ユーザーで共有されるため、計測では制限しない
+    server.rate_limit = 10 ** 9
+    app.config['FITBIT_ASYNC_IO'] = async_io
+    client = get_fitbit_client()
+    client.metrics.reset()
+
+    for n in range(users):
+        create_auth(db, user_id=f'user-{n}')
+        enqueue_sync(f'user-{n}')
+
+    started = time.perf_counter()
+    processed = run_pending_jobs()
+    elapsed = time.perf_counter() - started
+
+    assert processed == users
+    assert FitbitSyncJob.query.filter(FitbitSyncJob.status != 'completed').count() == 0
+    assert len(server.weight_requests()) == users
+    return elapsed, client.metrics.snapshot()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.05, help='テストダブルの応答遅延（秒）')
+    parser.add_argument('--concurrency', type=int, default=20, help='FITBIT_ASYNC_CONCURRENCY')
+    parser.add_argument('--batch-size', type=int, default=100, help='FITBIT_SYNC_BATCH_SIZE')
+    args = parser.parse_args()
+
+    today = datetime.now().date()
+    with FakeFitbitServer(make_weight_logs(today - timedelta(days=29), 30), latency=args.latency) as server:
+        app.config['FITBIT_API_BASE_URL'] = server.base_url
+        app.config['FITBIT_ASYNC_CONCURRENCY'] = args.concurrency
+        app.config['FITBIT_SYNC_BATCH_SIZE'] = args.batch_size
+        app.extensions.pop('fitbit_client', None)
+        app.extensions.pop('fitbit_token_cache', None)
+
+        print(f'{args.users} users, API latency {args.latency * 1000:.0f} ms, '
+              f'async concurrency {args.concurrency}, batch size {args.batch_size}')
+        print(f'{"mode":>8} {"elapsed s":>10} {"jobs/s":>8} {"avg API ms":>11} {"max API ms":>11}')
+        with app.app_context():
+            results = {}
+            for mode in ('blocking', 'async'):
+                elapsed, metrics = run(server, args.users, async_io=mode == 'async')
+                results[mode] = elapsed
+                latency = metrics['latency']
+                print(f'{mode:>8} {elapsed:>10.2f} {args.users / elapsed:>8.1f} '
+                      f'{latency["avg_seconds"] * 1000:>11.1f} {latency["max_seconds"] * 1000:>11.1f}')
+        print(f'speedup: {results["blocking"] / results["async"]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
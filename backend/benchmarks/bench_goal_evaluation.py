@@ -0,0 +1,66 @@
+"""
+/api/fit/goal/evaluation と evaluate_all_active_goals のベンチマーク
+
+目標数を増やしながら、目標ごとに差分・予測のエンドポイントを呼ぶ方法と一括評価を比較する。
+また、ユーザー数を増やしながら全ユーザーのアクティブな目標の評価時間を計測する。
+結果キャッシュは無効にして計測する。
+
+実行方法:
+    cd backend && python -m benchmarks.bench_goal_evaluation
+"""
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import app, reset_database, seed_weights, add_goal, time_request
+from services import evaluate_all_active_goals
+
+GOAL_COUNTS = (1, 5, 20)
+USER_COUNTS = (10, 100)
+
+
+def time_per_goal(client, goal_ids, repeat=3):
+    """目標ごとに差分・予測のエンドポイントを呼ぶ場合の合計時間（ミリ秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for goal_id in goal_ids:
+            client.get(f'/api/fit/weight/diff?goal_id={goal_id}')
+            client.get(f'/api/fit/weight/projection?goal_id={goal_id}')
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def main():
+    app.config['RESULT_CACHE_BACKEND'] = 'none'
+    app.extensions.pop('result_cache', None)
+    today = datetime.now().date()
+
+    with app.app_context():
+        client = app.test_client()
+
+        print(f'{"goals":>6} {"per-goal ms":>12} {"batch ms":>10}')
+        for goals in GOAL_COUNTS:
+            reset_database()
+            start_date = seed_weights('default_user', 365 * 4)
+            goal_ids = [
+                add_goal('default_user', start_date, today + timedelta(days=30 + i)).id
+                for i in range(goals)
+            ]
+            per_goal = time_per_goal(client, goal_ids)
+            batch = time_request(client, '/api/fit/goal/evaluation')
+            print(f'{goals:>6} {per_goal:>12.1f} {batch:>10.1f}')
+
+        print(f'\n{"users":>6} {"evaluate-all ms":>16}')
+        for users in USER_COUNTS:
+            reset_database()
+            for i in range(users):
+                start_date = seed_weights(f'user-{i}', 365, start_log_id=i * 365)
+                add_goal(f'user-{i}', start_date, today + timedelta(days=90))
+            started = time.perf_counter()
+            evaluated = sum(len(evaluations) for _, evaluations in evaluate_all_active_goals())
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f'{users:>6} {elapsed:>16.1f}  ({evaluated} goals)')
+
+
+if __name__ == '__main__':
+    main()
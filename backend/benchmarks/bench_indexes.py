@@ -0,0 +1,95 @@
+"""
+FitbitWeight の複合インデックスのベンチマーク
+
+多数のユーザーの体重データを投入し、インデックスなし（旧スキーマ）と
+インデックスありで各エンドポイントの応答時間とクエリプランを比較する。
+
+実行方法:
+    cd backend && python -m benchmarks.bench_indexes [--rows 1000000] [--users 2000]
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from benchmarks.common import app, reset_database, seed_weights, add_auth, add_goal, time_request
+from models import db, FitbitWeight
+
+TARGET_USER = 'default_user'
+
+PLAN_QUERIES = {
+    'range': (
+        'SELECT * FROM fitbit_weight WHERE user_id = ? AND date >= ? AND date <= ? ORDER BY date, time',
+        (TARGET_USER, '2000-01-01', '2100-01-01')
+    ),
+    'latest': (
+        'SELECT weight FROM fitbit_weight WHERE user_id = ? ORDER BY date DESC, time DESC LIMIT 1',
+        (TARGET_USER,)
+    ),
+}
+
+
+def endpoints(goal_id):
+    return {
+        'GET /api/fitbit/weight': '/api/fitbit/weight',
+        'GET /api/fitbit/weight/analysis': '/api/fitbit/weight/analysis',
+        'GET /api/fit/goal': '/api/fit/goal',
+        'GET /api/fit/weight/diff': f'/api/fit/weight/diff?goal_id={goal_id}',
+        'GET /api/fit/weight/projection': f'/api/fit/weight/projection?goal_id={goal_id}',
+    }
+
+
+def query_plans():
+    plans = {}
+    with db.engine.connect() as connection:
+        for name, (sql, params) in PLAN_QUERIES.items():
+            rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+            plans[name] = '; '.join(row[-1] for row in rows)
+    return plans
+
+
+def measure(client, goal_id):
+    return {name: time_request(client, url) for name, url in endpoints(goal_id).items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=2000)
+    args = parser.parse_args()
+
+    per_user = args.rows // args.users
+    with app.app_context():
+        client = app.test_client()
+        reset_database()
+
+        print(f'seeding {per_user * args.users} rows for {args.users} users ...')
+        start_date = None
+        for i in range(args.users):
+            user_id = TARGET_USER if i == 0 else f'user-{i}'
+            first = seed_weights(user_id, per_user, readings_per_day=2, start_log_id=i * per_user)
+            if i == 0:
+                start_date = first
+        add_auth(TARGET_USER)
+        goal = add_goal(TARGET_USER, start_date, datetime.now().date() + timedelta(days=30))
+
+        results = {}
+        for label in ('without index', 'with index'):
+            with db.engine.begin() as connection:
+                for index in FitbitWeight.__table__.indexes:
+                    if label == 'without index':
+                        index.drop(connection, checkfirst=True)
+                    else:
+                        index.create(connection, checkfirst=True)
+            results[label] = measure(client, goal.id)
+            print(f'\n[{label}] query plans')
+            for name, plan in query_plans().items():
+                print(f'  {name:>7}: {plan}')
+
+        print(f'\n{"endpoint":<34} {"no index ms":>12} {"index ms":>10} {"speedup":>8}')
+        for name in results['without index']:
+            before = results['without index'][name]
+            after = results['with index'][name]
+            print(f'{name:<34} {before:>12.1f} {after:>10.1f} {before / after:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
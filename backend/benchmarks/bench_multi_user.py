@@ -0,0 +1,178 @@
+"""
+多数のユーザーによる同時アクセスの負荷生成ベンチマーク
+
+一時ファイルのSQLite（DATABASE_URL を指定した場合はそのデータベース）に多数のユーザーの
+体重記録・目標・APIトークンを投入し、複数のスレッドがランダムなユーザーとして
+ベアラートークン付きで目標・差分をポーリング（前回のETagで条件付きGET）し、
+一定の割合で体重記録の同期（upsert_weight_entries）を行う。
+操作ごとの応答時間のパーセンタイル、ユーザーごとの平均応答時間の分布、
+エラー数（database is locked などの5xx・例外）を出力する。
+
+実行方法:
+    cd backend && python -m benchmarks.bench_multi_user [--users 2000] [--threads 16] [--duration 10] [--sync-ratio 0.1]
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+_TMPDIR = tempfile.TemporaryDirectory()
+os.environ.setdefault('DATABASE_URL', f'sqlite:///{os.path.join(_TMPDIR.name, "bench.db")}')
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+
+from benchmarks.common import app, reset_database
+from models import db, ApiToken, FitbitWeight, WeightGoal
+from services import rebuild_rollups, upsert_weight_entries
+
+DAYS = 60
+
+
+def seed(users, batch_size=10000):
+    """
+    ユーザーごとに DAYS 日分の体重記録・目標1件・APIトークン1件を投入する
+
+    戻り値:
+        list: (ユーザーID, トークン, 目標ID) のリスト
+    """
+    today = datetime.now().date()
+    start_date = today - timedelta(days=DAYS - 1)
+    rng = random.Random(42)
+
+    rows = []
+    for u in range(users):
+        for day in range(DAYS):
+            rows.append({
+                'user_id': f'user-{u}', 'weight': round(80 - day * 0.05 + rng.uniform(-0.5, 0.5), 1),
+                'date': start_date + timedelta(days=day), 'time': datetime.min.replace(hour=7).time(),
+                'source': 'bench', 'log_id': f'{u}-{day}', 'created_at': datetime.utcnow()
+            })
+            if len(rows) >= batch_size:
+                db.session.execute(insert(FitbitWeight), rows)
+                rows = []
+    if rows:
+        db.session.execute(insert(FitbitWeight), rows)
+    rebuild_rollups()
+
+    tokens = [f'bench-token-{u}' for u in range(users)]
+    db.session.execute(insert(ApiToken), [
+        {'user_id': f'user-{u}', 'token_hash': ApiToken.hash_token(tokens[u]), 'created_at': datetime.utcnow()}
+        for u in range(users)
+    ])
+    db.session.execute(insert(WeightGoal), [
+        {'user_id': f'user-{u}', 'target_weight': 70.0, 'target_date': today + timedelta(days=90),
+         'start_weight': 80.0, 'start_date': start_date, 'is_achieved': False}
+        for u in range(users)
+    ])
+    db.session.commit()
+
+    goal_ids = dict(db.session.query(WeightGoal.user_id, WeightGoal.id))
+    return [(f'user-{u}', tokens[u], goal_ids[f'user-{u}']) for u in range(users)]
+
+
+def run(users, threads, duration, sync_ratio):
+    """
+    ポーリングと同期を同時に実行
+
+    戻り値:
+        dict: 操作ごとの応答時間・ユーザーごとの応答時間・ステータスの集計・エラー数
+    """
+    deadline = time.monotonic() + duration
+    lock = threading.Lock()
+    result = {'ms': defaultdict(list), 'per_user': defaultdict(list), 'status': defaultdict(int), 'errors': 0}
+
+    def worker(n):
+        rng = random.Random(n)
+        client = app.test_client()
+        etags = {}
+        local_ms, local_user, local_status, errors = defaultdict(list), defaultdict(list), defaultdict(int), 0
+        sequence = 0
+        while time.monotonic() < deadline:
+            user_id, token, goal_id = users[rng.randrange(len(users))]
+            started = time.perf_counter()
+            try:
+                if rng.random() < sync_ratio:
+                    action = 'sync'
+                    with app.app_context():
+                        upsert_weight_entries(user_id, [{
+                            'logId': f'sync-{n}-{sequence}', 'weight': round(rng.uniform(74, 78), 1),
+                            'date': datetime.now().date().isoformat(), 'time': '08:00:00', 'source': 'bench'
+                        }])
+                        db.session.commit()
+                    status = 200
+                else:
+                    action, url = rng.choice((('goal', '/api/fit/goal'), ('diff', f'/api/fit/weight/diff?goal_id={goal_id}')))
+                    headers = {'Authorization': f'Bearer {token}'}
+                    if (user_id, url) in etags:
+                        headers['If-None-Match'] = etags[(user_id, url)]
+                    response = client.get(url, headers=headers)
+                    status = response.status_code
+                    if response.headers.get('ETag'):
+                        etags[(user_id, url)] = response.headers['ETag']
+            except OperationalError:
+                errors += 1
+                continue
+            elapsed = (time.perf_counter() - started) * 1000
+            local_ms[action].append(elapsed)
+            local_user[user_id].append(elapsed)
+            local_status[(action, status)] += 1
+            if status >= 500:
+                errors += 1
+            sequence += 1
+
+        with lock:
+            for action, values in local_ms.items():
+                result['ms'][action].extend(values)
+            for user_id, values in local_user.items():
+                result['per_user'][user_id].extend(values)
+            for key, count in local_status.items():
+                result['status'][key] += count
+            result['errors'] += errors
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--sync-ratio', type=float, default=0.1, help='同期を行う操作の割合')
+    args = parser.parse_args()
+
+    app.config['AUTH_DEFAULT_USER'] = ''
+    with app.app_context():
+        reset_database()
+        started = time.perf_counter()
+        users = seed(args.users)
+        print(f'seeded {args.users} users in {time.perf_counter() - started:.1f}s ({db.engine.url.get_backend_name()})')
+        db.session.remove()
+
+    result = run(users, args.threads, args.duration, args.sync_ratio)
+
+    print(f'{"action":>6} {"count":>7} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    for action, values in sorted(result['ms'].items()):
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        print(f'{action:>6} {len(values):>7} {len(values) / args.duration:>8.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f}')
+
+    means = np.array([np.mean(values) for values in result['per_user'].values()])
+    if means.size:
+        p50, p95, p99 = np.percentile(means, [50, 95, 99])
+        print(f'per-user mean latency over {means.size} users: p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms')
+    print('status: ' + ', '.join(f'{action} {status}={count}' for (action, status), count in sorted(result['status'].items())))
+    print(f'errors (5xx / database locked): {result["errors"]}')
+
+
+if __name__ == '__main__':
+    main()
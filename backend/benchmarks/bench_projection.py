@@ -0,0 +1,69 @@
+"""
+/api/fit/weight/projection のベンチマーク
+
+予測日数を数年まで増やしながら、従来の方法（直近7日の最初と最後の差から
+Pythonのループで1日ずつ予測を生成）と、各予測モデルによるベクトル化した生成を比較する。
+結果キャッシュは無効にして計測する。
+
+実行方法:
+    cd backend && python -m benchmarks.bench_projection
+"""
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import app, reset_database, seed_weights, add_goal, time_request
+from models import FitbitWeight
+from services import PROJECTION_MODELS, load_daily_series, project_weights
+
+HORIZONS = (30, 365, 1825, 3650)
+
+
+def legacy_projection(user_id, days):
+    """従来の実装（ORMオブジェクトを読み込み、1日ずつループで予測を生成）"""
+    today = datetime.now().date()
+    recent = FitbitWeight.query.filter(
+        FitbitWeight.user_id == user_id,
+        FitbitWeight.date >= today - timedelta(days=7)
+    ).order_by(FitbitWeight.date).all()
+    avg_change = (recent[-1].weight - recent[0].weight) / max((recent[-1].date - recent[0].date).days, 1)
+    projections = []
+    current = recent[-1].weight
+    for i in range(1, days + 1):
+        current += avg_change
+        projections.append({'date': (today + timedelta(days=i)).isoformat(), 'projected_weight': round(current, 1)})
+    return projections
+
+
+def time_call(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def main():
+    app.config['RESULT_CACHE_BACKEND'] = 'none'
+    app.extensions.pop('result_cache', None)
+
+    with app.app_context():
+        client = app.test_client()
+        reset_database()
+        start_date = seed_weights('default_user', 365 * 4)
+        goal = add_goal('default_user', start_date, datetime.now().date() + timedelta(days=365))
+        today = datetime.now().date()
+        series = load_daily_series('default_user', today - timedelta(days=28), today)
+
+        print(f'{"horizon":>8} {"model":>10} {"engine ms":>10} {"endpoint ms":>12}')
+        for horizon in HORIZONS:
+            legacy = time_call(lambda: legacy_projection('default_user', horizon))
+            print(f'{horizon:>8} {"legacy":>10} {legacy:>10.2f} {"-":>12}')
+            for model in PROJECTION_MODELS:
+                engine = time_call(lambda: project_weights(series, today, horizon, model))
+                endpoint = time_request(client, f'/api/fit/weight/projection?goal_id={goal.id}&model={model}&days={horizon}')
+                print(f'{horizon:>8} {model:>10} {engine:>10.2f} {endpoint:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+開発サーバー（flask run）と gunicorn のスループット比較
+
+一時ファイルのSQLiteにデータを投入し、各サーバーを別プロセスで起動して
+複数スレッドから一定時間リクエストを送り続け、秒間リクエスト数と応答時間のパーセンタイルを計測する。
+
+実行方法:
+    cd backend && python -m benchmarks.bench_server [--duration 10] [--concurrency 16]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+_tmpdir = tempfile.mkdtemp(prefix='bench_server_')
+os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(_tmpdir, "app.db")}'
+
+import numpy as np
+import requests
+
+from benchmarks.common import app, reset_database, seed_weights, add_goal
+
+PATHS = ('/api/fit/goal', '/api/fit/weight/diff', '/api/fit/weight/projection', '/api/fitbit/weight/analysis')
+
+SERVERS = {
+    'flask run': lambda port, workers: [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(port)],
+    'gunicorn gthread': lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers), '--access-logfile', os.devnull, 'app:app'
+    ],
+}
+
+
+def wait_until_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server did not start: {url}')
+
+
+def load(base_url, duration, concurrency):
+    """
+    duration 秒間 concurrency 本のスレッドからリクエストを送り続ける
+
+    戻り値:
+        tuple: (リクエスト数, 応答時間の配列（ミリ秒）, エラー数)
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(offset):
+        session = requests.Session()
+        local, failed, i = [], 0, offset
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            response = session.get(base_url + PATHS[i % len(PATHS)])
+            local.append((time.perf_counter() - started) * 1000)
+            failed += response.status_code != 200
+            i += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies), np.array(latencies), errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--port', type=int, default=5077)
+    args = parser.parse_args()
+
+    with app.app_context():
+        reset_database()
+        start_date = seed_weights('default_user', 365 * 4 * 4)
+        add_goal('default_user', start_date, datetime.now().date() + timedelta(days=365))
+
+    env = dict(os.environ, FITBIT_SYNC_WORKER_ENABLED='false', FLASK_ENV='production')
+    print(f'{"server":>18} {"requests/s":>11} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>7}')
+    for name, command in SERVERS.items():
+        process = subprocess.Popen(
+            command(args.port, args.workers), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            base_url = f'http://127.0.0.1:{args.port}'
+            wait_until_ready(base_url + '/')
+            count, latencies, errors = load(base_url, args.duration, args.concurrency)
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            print(f'{name:>18} {count / args.duration:>11.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {errors:>7}')
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
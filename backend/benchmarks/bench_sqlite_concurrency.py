@@ -0,0 +1,131 @@
+"""
+SQLiteの同時読み書きのベンチマーク
+
+一時ファイルのSQLiteに対して、書き込みスレッド（小さなトランザクションで体重記録を追加）と
+読み取りスレッド（集計クエリ）を同時に一定時間実行し、
+SQLAlchemyのデフォルト（ロールバックジャーナル）と SQLITE_PRAGMAS の設定（WALなど）で
+処理件数・応答時間・database is locked エラーの数を比較する。
+
+実行方法:
+    cd backend && python -m benchmarks.bench_sqlite_concurrency [--duration 5] [--writers 4] [--readers 8]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, insert, select, func
+from sqlalchemy.exc import OperationalError
+
+from config import Config, engine_options
+from models import db, FitbitWeight
+from services import apply_sqlite_pragmas
+
+PROFILES = {
+    'default': None,
+    'tuned': Config.SQLITE_PRAGMAS,
+}
+
+
+def make_engine(path, pragmas, busy_timeout):
+    uri = f'sqlite:///{path}'
+    options = engine_options(uri, 16, 16, 1800) if pragmas else {}
+    engine = create_engine(uri, connect_args={'timeout': busy_timeout}, **options)
+    if pragmas:
+        apply_sqlite_pragmas(engine, pragmas)
+    return engine
+
+
+def seed(engine, rows):
+    db.metadata.create_all(engine)
+    start = date(2020, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(insert(FitbitWeight), [
+            {'user_id': f'user-{i % 10}', 'weight': 70 + (i % 100) / 10, 'date': start + timedelta(days=i // 10),
+             'log_id': f'seed-{i}'}
+            for i in range(rows)
+        ])
+
+
+def run(engine, duration, writers, readers):
+    """
+    書き込みと読み取りを同時に実行
+
+    戻り値:
+        dict: 書き込み件数・読み取り件数・ロックエラー数・応答時間の配列
+    """
+    deadline = time.monotonic() + duration
+    lock = threading.Lock()
+    result = {'writes': 0, 'reads': 0, 'locked': 0, 'write_ms': [], 'read_ms': []}
+
+    def writer(n):
+        local, sequence = [], 0
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                with engine.begin() as connection:
+                    connection.execute(insert(FitbitWeight), [
+                        {'user_id': f'user-{n}', 'weight': 70.0, 'date': date.today(), 'log_id': f'w{n}-{sequence}-{k}'}
+                        for k in range(20)
+                    ])
+                local.append((time.perf_counter() - started) * 1000)
+            except OperationalError:
+                with lock:
+                    result['locked'] += 1
+            sequence += 1
+        with lock:
+            result['writes'] += len(local)
+            result['write_ms'].extend(local)
+
+    def reader(n):
+        local = []
+        query = select(func.count(), func.avg(FitbitWeight.weight)).where(FitbitWeight.user_id == f'user-{n % 10}')
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                with engine.connect() as connection:
+                    connection.execute(query).one()
+                local.append((time.perf_counter() - started) * 1000)
+            except OperationalError:
+                with lock:
+                    result['locked'] += 1
+        with lock:
+            result['reads'] += len(local)
+            result['read_ms'].extend(local)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    threads += [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--busy-timeout', type=float, default=1.0, help='sqlite3 の接続タイムアウト（秒）')
+    args = parser.parse_args()
+
+    print(f'{"profile":>8} {"writes/s":>9} {"reads/s":>9} {"write p99 ms":>13} {"read p99 ms":>12} {"locked":>7}')
+    for name, pragmas in PROFILES.items():
+        with tempfile.TemporaryDirectory() as tmpdir:
+            engine = make_engine(os.path.join(tmpdir, 'bench.db'), pragmas, args.busy_timeout)
+            seed(engine, args.rows)
+            result = run(engine, args.duration, args.writers, args.readers)
+            engine.dispose()
+        write_p99 = np.percentile(result['write_ms'], 99) if result['write_ms'] else float('nan')
+        read_p99 = np.percentile(result['read_ms'], 99) if result['read_ms'] else float('nan')
+        print(f'{name:>8} {result["writes"] / args.duration:>9.1f} {result["reads"] / args.duration:>9.1f} '
+              f'{write_p99:>13.1f} {read_p99:>12.1f} {result["locked"]:>7}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+定期同期（ポーリング）とWebhook通知による同期のFitbit API呼び出し回数の比較
+
+ローカルのFitbit APIテストダブルに対して、ユーザーごとに1日数回の体重記録が追加される1日を再現する。
+ポーリングでは FITBIT_SYNC_INTERVAL ごとに全ユーザーの期間の同期を行い、
+Webhookでは記録の追加ごとに通知を送り、通知された日だけを同期する
+（購読済みユーザーの期間の同期は FITBIT_SUBSCRIBED_SYNC_INTERVAL ごと）。
+それぞれの体重ログAPIの呼び出し回数とユーザーあたりの1日の呼び出し回数を出力する。
+
+実行方法:
+    cd backend && python -m benchmarks.bench_webhook_sync [--users 20] [--weighins 2]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import app, reset_database
+from models import db, FitbitSyncJob
+from services import run_pending_jobs, schedule_periodic_syncs, subscribe_user
+from tests.fake_fitbit import FakeFitbitServer, FakeNotificationSender, make_weight_logs, create_auth
+
+CLIENT_SECRET = 'bench-client-secret'
+
+
+def simulate_day(server, users, weighins, webhook):
+    """
+    1日分の同期を再現
+
+    戻り値:
+        tuple: (体重ログAPIの呼び出し回数, 経過時間（秒）)
+    """
+    reset_database()
+    server.requests.clear()
+    server.subscriptions.clear()
+    # テストダブルのレート制限は全ユーザーで共有されるため、計測では制限しない
+    server.rate_limit = 10 ** 9
+    user_ids = [f'user-{u}' for u in range(users)]
+    for user_id in user_ids:
+        create_auth(db, user_id=user_id)
+    subscriptions = {user_id: subscribe_user(user_id).subscription_id for user_id in user_ids} if webhook else {}
+
+    sender = FakeNotificationSender(CLIENT_SECRET, app.test_client())
+    interval = app.config['FITBIT_SYNC_INTERVAL']
+    steps = 86400 // interval
+    rng = random.Random(1)
+    # ユーザーごとの記録の時刻（何番目の同期間隔か）
+    schedule = {user_id: sorted(rng.randrange(steps) for _ in range(weighins)) for user_id in user_ids}
+
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    today = datetime.now().date()
+    for step in range(steps):
+        if webhook:
+            changes = [(subscriptions[user_id], today) for user_id, steps_at in schedule.items() if step in steps_at]
+            if changes:
+                sender.send(changes)
+        schedule_periodic_syncs(now=now + timedelta(seconds=step * interval + 1))
+        run_pending_jobs()
+    elapsed = time.perf_counter() - started
+
+    assert FitbitSyncJob.query.filter(FitbitSyncJob.status != 'completed').count() == 0
+    return len(server.weight_requests()), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--weighins', type=int, default=2, help='ユーザーあたりの1日の記録回数')
+    args = parser.parse_args()
+
+    today = datetime.now().date()
+    with FakeFitbitServer(make_weight_logs(today - timedelta(days=29), 30)) as server:
+        app.config['FITBIT_API_BASE_URL'] = server.base_url
+        app.config['FITBIT_CLIENT_SECRET'] = CLIENT_SECRET
+        app.config['AUTH_DEFAULT_USER'] = 'default_user'
+        app.extensions.pop('fitbit_client', None)
+        app.extensions.pop('fitbit_token_cache', None)
+
+        print(f'{args.users} users, {args.weighins} weigh-ins per user, sync interval {app.config["FITBIT_SYNC_INTERVAL"]}s')
+        print(f'{"mode":>8} {"weight API calls":>17} {"calls/user/day":>15} {"elapsed s":>10}')
+        with app.app_context():
+            results = {}
+            for mode in ('polling', 'webhook'):
+                calls, elapsed = simulate_day(server, args.users, args.weighins, webhook=mode == 'webhook')
+                results[mode] = calls
+                print(f'{mode:>8} {calls:>17} {calls / args.users:>15.1f} {elapsed:>10.1f}')
+        print(f'reduction: {1 - results["webhook"] / results["polling"]:.1%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+"""
+get_weight_diff のベンチマーク
+
+記録数を増やしながら /api/fit/weight/diff の応答時間を計測する。
+日付インデックス化により、1記録あたりのコストが一定（線形）であることを確認する。
+
+実行方法:
+    cd backend && python -m benchmarks.bench_weight_diff
+"""
+from datetime import datetime, timedelta
+
+from benchmarks.common import app, reset_database, seed_weights, add_goal, time_request
+
+SIZES = (1000, 2500, 5000, 10000, 20000)
+READINGS_PER_DAY = 4
+
+
+def main():
+    print(f'{"readings":>10} {"days":>6} {"policy":>6} {"ms":>10} {"us/reading":>12}')
+    with app.app_context():
+        client = app.test_client()
+        for size in SIZES:
+            reset_database()
+            start_date = seed_weights('default_user', size, readings_per_day=READINGS_PER_DAY)
+            goal = add_goal('default_user', start_date, datetime.now().date() + timedelta(days=30))
+            days = (datetime.now().date() - start_date).days + 1
+            for policy in ('first', 'mean'):
+                elapsed = time_request(client, f'/api/fit/weight/diff?goal_id={goal.id}&daily_policy={policy}')
+                print(f'{size:>10} {days:>6} {policy:>6} {elapsed:>10.1f} {elapsed * 1000 / size:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+GET /api/fitbit/weight のメモリ使用量ベンチマーク
+
+10万件の記録に対して、全件を読み込んで jsonify する通常の応答と、
+stream=json / stream=ndjson のストリーミング応答のピークメモリを tracemalloc で比較する。
+
+実行方法:
+    cd backend && python -m benchmarks.bench_weight_stream [--rows 100000]
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.common import app, reset_database, seed_weights, add_auth
+
+
+def measure(client, url):
+    """応答を最後まで読み込んだ時のピークメモリ（MB）・応答サイズ（MB）・時間（ミリ秒）"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    size = 0
+    for chunk in response.response:
+        size += len(chunk)
+    response.close()
+    elapsed = (time.perf_counter() - started) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert response.status_code == 200
+    return peak / 1024 / 1024, size / 1024 / 1024, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    with app.app_context():
+        client = app.test_client()
+        reset_database()
+        add_auth('default_user')
+        start_date = seed_weights('default_user', args.rows)
+        base = f'/api/fitbit/weight?from_date={start_date.isoformat()}'
+
+        print(f'{"mode":>14} {"peak MB":>9} {"body MB":>9} {"ms":>9}')
+        for mode, url in (
+            ('buffered', base),
+            ('stream=json', base + '&stream=json'),
+            ('stream=ndjson', base + '&stream=ndjson'),
+        ):
+            peak, size, elapsed = measure(client, url)
+            print(f'{mode:>14} {peak:>9.1f} {size:>9.1f} {elapsed:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+体重取得・差分エンドポイントの出力形式ごとのペイロードサイズと応答時間のベンチマーク
+
+実行方法:
+    cd backend && python -m benchmarks.bench_wire_format [--years 5]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import app, reset_database, seed_weights, add_auth, add_goal
+
+FORMATS = (
+    ('json', ''),
+    ('columnar', '&format=columnar'),
+    ('columnar+delta', '&format=columnar&delta=true'),
+    ('binary', '&format=binary'),
+)
+
+
+def measure(client, url, repeat=3):
+    """最速の応答時間（ミリ秒）とペイロードサイズ（KB）"""
+    best = float('inf')
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        best = min(best, (time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.data[:200]
+        size = len(response.data)
+    return best, size / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--years', type=int, default=5)
+    args = parser.parse_args()
+
+    with app.app_context():
+        client = app.test_client()
+        reset_database()
+        add_auth('default_user')
+        start_date = seed_weights('default_user', args.years * 365 * 4)
+        goal = add_goal('default_user', start_date, datetime.now().date() + timedelta(days=30))
+
+        endpoints = (
+            ('weight', f'/api/fitbit/weight?from_date={start_date.isoformat()}'),
+            ('weight/diff', f'/api/fit/weight/diff?goal_id={goal.id}'),
+        )
+        print(f'{"endpoint":>12} {"format":>15} {"ms":>9} {"KB":>10}')
+        for name, base in endpoints:
+            for label, query in FORMATS:
+                elapsed, size = measure(client, base + query)
+                print(f'{name:>12} {label:>15} {elapsed:>9.1f} {size:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+ベンチマーク共通ユーティリティ
+
+ベンチマークは backend ディレクトリから ``python -m benchmarks.<name>`` で実行する。
+DATABASE_URL が未設定の場合はインメモリSQLiteを使用する。
+"""
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from sqlalchemy import insert
+
+from app import app
+from models import db, FitbitAuth, FitbitWeight, WeightGoal
+from services import rebuild_rollups
+
+
+def reset_database():
+    """全テーブルを作り直す"""
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+
+
+def seed_weights(user_id, readings, readings_per_day=4, end_date=None, start_log_id=0, batch_size=10000):
+    """
+    体重データを一括で投入する
+
+    引数:
+        user_id (str): ユーザー識別子
+        readings (int): 投入する記録数
+        readings_per_day (int): 1日あたりの記録数
+        end_date (date): 最終記録日（デフォルト: 今日）
+        start_log_id (int): log_id の開始番号
+        batch_size (int): 1回のINSERTで投入する行数
+
+    戻り値:
+        date: 最初の記録日
+    """
+    end_date = end_date or datetime.now().date()
+    days = max(1, readings // readings_per_day)
+    start_date = end_date - timedelta(days=days - 1)
+    rng = random.Random(42)
+
+    rows = []
+    for i in range(readings):
+        day = start_date + timedelta(days=i // readings_per_day)
+        hour = 6 + (i % readings_per_day) * (16 // readings_per_day)
+        rows.append({
+            'user_id': user_id,
+            'weight': round(80 - i * 0.001 + rng.uniform(-0.5, 0.5), 1),
+            'bmi': 24.0,
+            'date': day,
+            'time': datetime.min.replace(hour=hour % 24).time(),
+            'source': 'bench',
+            'log_id': str(start_log_id + i),
+            'created_at': datetime.utcnow(),
+        })
+        if len(rows) >= batch_size:
+            db.session.execute(insert(FitbitWeight), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(FitbitWeight), rows)
+    rebuild_rollups(user_id=user_id)
+    db.session.commit()
+    return start_date
+
+
+def add_goal(user_id, start_date, target_date, start_weight=80.0, target_weight=70.0):
+    """ベンチマーク用の目標を追加する"""
+    goal = WeightGoal(
+        user_id=user_id,
+        target_weight=target_weight,
+        target_date=target_date,
+        start_weight=start_weight,
+        start_date=start_date
+    )
+    db.session.add(goal)
+    db.session.commit()
+    return goal
+
+
+def add_auth(user_id):
+    """ベンチマーク用のFitbit認証情報を追加する"""
+    auth = FitbitAuth(
+        user_id=user_id,
+        access_token='bench-token',
+        refresh_token='bench-refresh-token',
+        expires_at=datetime.utcnow() + timedelta(hours=8),
+        scope='weight',
+        token_type='Bearer'
+    )
+    db.session.add(auth)
+    db.session.commit()
+    return auth
+
+
+def time_request(client, url, repeat=5):
+    """
+    エンドポイントの応答時間を計測する
+
+    戻り値:
+        float: 最速の応答時間（ミリ秒）
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        elapsed = (time.perf_counter() - started) * 1000
+        assert response.status_code == 200, response.data[:200]
+        best = min(best, elapsed)
+    return best
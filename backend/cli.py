@@ -0,0 +1,100 @@
+"""
+flask コマンドで実行する管理コマンド
+
+例:
+    flask --app app rollup rebuild
+    flask --app app rollup check --user-id default_user
+    flask --app app goals evaluate-all > evaluations.ndjson
+    flask --app app users issue-token alice --name mobile
+    flask --app app fitbit subscribe-all
+"""
+import json
+import click
+import requests
+from flask.cli import AppGroup
+from models import db, FitbitAuth, FitbitSubscription
+from services import (
+    rebuild_rollups, check_rollups, evaluate_all_active_goals, PROJECTION_MODELS, issue_api_token, revoke_api_tokens,
+    subscribe_user
+)
+
+rollup_cli = AppGroup('rollup', help='日次体重集計（fitbit_weight_daily）の管理')
+
+@rollup_cli.command('rebuild')
+@click.option('--user-id', default=None, help='対象ユーザー（省略時は全ユーザー）')
+def rebuild_command(user_id):
+    """日次集計を生の体重記録から作り直す"""
+    written = rebuild_rollups(user_id=user_id)
+    db.session.commit()
+    click.echo(f'Rebuilt {written} daily rollup rows')
+
+@rollup_cli.command('check')
+@click.option('--user-id', default=None, help='対象ユーザー（省略時は全ユーザー）')
+def check_command(user_id):
+    """日次集計と生の体重記録の整合性を確認（不整合があれば終了コード1）"""
+    problems = check_rollups(user_id=user_id)
+    for problem in problems:
+        click.echo(' '.join(f'{key}={value}' for key, value in problem.items()))
+    if problems:
+        click.echo(f'{len(problems)} inconsistencies found')
+        raise SystemExit(1)
+    click.echo('Daily rollups are consistent')
+
+goals_cli = AppGroup('goals', help='体重目標の管理')
+
+@goals_cli.command('evaluate-all')
+@click.option('--model', type=click.Choice(PROJECTION_MODELS), default=None, help='予測モデル')
+@click.option('--lookback', type=click.IntRange(min=2), default=None, help='予測に使用する直近の日数')
+def evaluate_all_command(model, lookback):
+    """全ユーザーのアクティブな目標を評価し、ユーザーごとに1行のNDJSONで出力"""
+    for user_id, evaluations in evaluate_all_active_goals(model=model, lookback=lookback):
+        click.echo(json.dumps({'user_id': user_id, 'evaluations': evaluations}, ensure_ascii=False))
+
+users_cli = AppGroup('users', help='ユーザーとAPIトークンの管理')
+
+@users_cli.command('issue-token')
+@click.argument('user_id')
+@click.option('--name', default=None, help='トークンの名前・用途')
+@click.option('--expires-in', type=click.IntRange(min=1), default=None, help='有効期間（秒。省略時は無期限）')
+def issue_token_command(user_id, name, expires_in):
+    """ユーザーのAPIトークンを発行して表示（トークンは再表示できない）"""
+    token, _ = issue_api_token(user_id, name=name, expires_in=expires_in)
+    click.echo(token)
+
+@users_cli.command('revoke-tokens')
+@click.argument('user_id')
+def revoke_tokens_command(user_id):
+    """ユーザーのAPIトークンをすべて失効"""
+    revoked = revoke_api_tokens(user_id)
+    click.echo(f'Revoked {revoked} tokens')
+
+fitbit_cli = AppGroup('fitbit', help='Fitbit連携の管理')
+
+@fitbit_cli.command('subscribe-all')
+def subscribe_all_command():
+    """Webhookを購読していない連携済みユーザーの体重データの更新通知を購読"""
+    subscribed = db.select(FitbitSubscription.user_id)
+    user_ids = [user_id for (user_id,) in db.session.query(FitbitAuth.user_id).filter(FitbitAuth.user_id.notin_(subscribed))]
+    failed = 0
+    for user_id in user_ids:
+        try:
+            subscribe_user(user_id)
+        except (PermissionError, requests.exceptions.RequestException) as e:
+            db.session.rollback()
+            failed += 1
+            click.echo(f'{user_id}: {e}', err=True)
+    click.echo(f'Subscribed {len(user_ids) - failed} users ({failed} failed)')
+    if failed:
+        raise SystemExit(1)
+
+def register_commands(app):
+    """
+    アプリケーションにCLIコマンドを登録
+    
+    引数:
+        app (Flask): Flaskアプリケーション
+    """
+    app.cli.add_command(rollup_cli)
+    app.cli.add_command(goals_cli)
+    app.cli.add_command(users_cli)
+    app.cli.add_command(fitbit_cli)
@@ -0,0 +1,63 @@
+"""
+本番環境用の gunicorn 設定
+
+実行方法:
+    gunicorn -c gunicorn.conf.py app:app
+
+preload_app によりアプリケーションの作成（スキーマ作成・マイグレーション・openapi.yaml のコピー）は
+マスタープロセスで1回だけ行い、各ワーカーはフォーク後に親プロセスの接続を破棄してから
+バックグラウンド同期を開始する。
+Fitbit API の呼び出しは I/O 待ちが中心のため、デフォルトはスレッドワーカー（gthread）を使用する。
+gevent を使う場合は gevent をインストールし、GUNICORN_WORKER_CLASS=gevent を設定する。
+
+環境変数:
+    GUNICORN_BIND: 待ち受けアドレス（デフォルト: 0.0.0.0:5000）
+    GUNICORN_WORKERS: ワーカープロセス数（デフォルト: CPU数 * 2 + 1）
+    GUNICORN_THREADS: gthread のワーカーあたりのスレッド数（デフォルト: 4）
+    GUNICORN_WORKER_CLASS: gthread, gevent, sync のいずれか（デフォルト: gthread）
+    GUNICORN_WORKER_CONNECTIONS: gevent のワーカーあたりの同時接続数（デフォルト: 1000）
+    GUNICORN_TIMEOUT: ワーカーのタイムアウト秒数（デフォルト: 60）
+    GUNICORN_PRELOAD: false の場合は各ワーカーでアプリケーションを作成する
+    FLASK_ENV: 設定の環境名（デフォルト: production）
+"""
+import multiprocessing
+import os
+
+# アプリケーションの読み込み前に設定する（バックグラウンド同期はフォーク後に各ワーカーで開始）
+os.environ.setdefault('DEFER_BACKGROUND_WORKERS', 'true')
+# FLASK_ENV が未設定なら本番用の設定（ProductionConfig）を使用する
+os.environ.setdefault('FLASK_ENV', 'production')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# メモリリーク対策としてワーカーを定期的に再起動（同時に再起動しないようばらつかせる）
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+def post_worker_init(worker):
+    """ワーカーでアプリケーションを読み込んだ後に、親プロセスの接続を破棄して同期を開始"""
+    from app import reset_after_fork
+    from services import start_sync_worker
+    
+    app = worker.wsgi
+    reset_after_fork(app)
+    start_sync_worker(app)
+
+def worker_exit(server, worker):
+    """ワーカーの終了時にバックグラウンド同期を停止"""
+    app = getattr(worker, 'wsgi', None)
+    sync_worker = app.extensions.get('fitbit_sync_worker') if app is not None else None
+    if sync_worker is not None:
+        sync_worker.stop(timeout=5)
@@ -1,6 +1,19 @@
 from .data_model import db, Data
 from .fitbit_auth import FitbitAuth
 from .fitbit_weight import FitbitWeight
+from .fitbit_weight_daily import FitbitWeightDaily
+from .fitbit_backfill import FitbitBackfill
+from .fitbit_sync_job import FitbitSyncJob
+from .fitbit_sync_state import FitbitSyncState
+from .fitbit_subscription import FitbitSubscription
 from .weight_goal import WeightGoal
+from .data_version import DataVersion
+from .api_token import ApiToken
+from .schema_migration import SchemaMigration
+from .migrations import run_migrations
 
-__all__ = ['db', 'Data', 'FitbitAuth', 'FitbitWeight', 'WeightGoal']
\ No newline at end of file
+__all__ = [
+    'db', 'Data', 'FitbitAuth', 'FitbitWeight', 'FitbitWeightDaily', 'FitbitBackfill',
+    'FitbitSyncJob', 'FitbitSyncState', 'FitbitSubscription', 'WeightGoal', 'DataVersion', 'ApiToken',
+    'SchemaMigration', 'run_migrations'
+]
\ No newline at end of file
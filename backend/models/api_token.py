@@ -0,0 +1,70 @@
+import hashlib
+from datetime import datetime
+from .data_model import db
+
+class ApiToken(db.Model):
+    """
+    APIアクセス用のベアラートークン（トークン自体は保存せず、SHA-256ハッシュのみを保存する）
+    
+    インデックス:
+        idx_api_token_user_id: user_id列のインデックス
+    
+    属性:
+        id (int): プライマリーキー
+        user_id (str): トークンの所有ユーザー
+        token_hash (str): トークンのSHA-256ハッシュ（16進数）
+        name (str): トークンの名前・用途
+        created_at (datetime): 作成日時
+        expires_at (datetime): 有効期限（Noneなら無期限）
+        revoked_at (datetime): 失効日時（Noneなら有効）
+    """
+    __tablename__ = 'api_token'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(100), nullable=False)
+    token_hash = db.Column(db.String(64), nullable=False, unique=True)
+    name = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=True)
+    revoked_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.Index('idx_api_token_user_id', 'user_id'),
+    )
+    
+    @staticmethod
+    def hash_token(token):
+        """
+        トークンのハッシュを計算
+        
+        引数:
+            token (str): ベアラートークン
+            
+        戻り値:
+            str: SHA-256ハッシュ（16進数）
+        """
+        return hashlib.sha256(token.encode()).hexdigest()
+    
+    def is_active(self, now=None):
+        """失効しておらず有効期限内であれば True"""
+        now = now or datetime.utcnow()
+        return self.revoked_at is None and (self.expires_at is None or self.expires_at > now)
+    
+    def to_dict(self):
+        """
+        モデルをJSONシリアライズ可能な辞書に変換（ハッシュは含めない）
+        
+        戻り値:
+            dict: モデルの属性を含む辞書
+        """
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'name': self.name,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'revoked_at': self.revoked_at.isoformat() if self.revoked_at else None
+        }
+    
+    def __repr__(self):
+        return f'<ApiToken {self.id}: {self.user_id}>'
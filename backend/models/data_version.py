@@ -0,0 +1,20 @@
+from datetime import datetime
+from .data_model import db
+
+class DataVersion(db.Model):
+    """
+    データのバージョン（書き込みのたびに増加する。HTTPキャッシュのETagに使用）
+    
+    属性:
+        scope (str): バージョンの対象（ユーザー識別子、または Data 用の 'data'）
+        version (int): バージョン番号
+        updated_at (datetime): 最終更新日時
+    """
+    __tablename__ = 'data_version'
+    
+    scope = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DataVersion {self.scope}: {self.version}>'
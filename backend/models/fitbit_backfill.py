@@ -0,0 +1,64 @@
+from datetime import datetime
+from .data_model import db
+
+class FitbitBackfill(db.Model):
+    """
+    Fitbit体重データの過去分取り込み（バックフィル）の進捗チェックポイント
+    
+    属性:
+        id (int): プライマリーキー
+        user_id (str): ユーザー識別子
+        from_date (date): 取り込み対象の開始日
+        to_date (date): 取り込み対象の終了日
+        next_date (date): 次に取り込む日（これより前の期間は取り込み済み）
+        status (str): 状態（pending, running, paused, completed, failed）
+        error (str): 最後に発生したエラー
+        retry_after (datetime): 再開可能になる日時（レート制限時）
+        windows_completed (int): 取り込み済みのウィンドウ数
+        inserted (int): 追加したレコード数
+        updated (int): 更新したレコード数
+        skipped (int): スキップしたレコード数
+        created_at (datetime): レコード作成日時
+        updated_at (datetime): レコード最終更新日時
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(100), nullable=False, unique=True)
+    from_date = db.Column(db.Date, nullable=False)
+    to_date = db.Column(db.Date, nullable=False)
+    next_date = db.Column(db.Date, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    error = db.Column(db.Text, nullable=True)
+    retry_after = db.Column(db.DateTime, nullable=True)
+    windows_completed = db.Column(db.Integer, nullable=False, default=0)
+    inserted = db.Column(db.Integer, nullable=False, default=0)
+    updated = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """
+        モデルをJSONシリアライズ可能な辞書に変換
+        
+        戻り値:
+            dict: モデルの属性を含む辞書
+        """
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'from_date': self.from_date.isoformat(),
+            'to_date': self.to_date.isoformat(),
+            'next_date': self.next_date.isoformat(),
+            'status': self.status,
+            'error': self.error,
+            'retry_after': self.retry_after.isoformat() if self.retry_after else None,
+            'windows_completed': self.windows_completed,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'skipped': self.skipped,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+    
+    def __repr__(self):
+        return f'<FitbitBackfill {self.id}: {self.user_id} - {self.status}>'
@@ -0,0 +1,42 @@
+from datetime import datetime
+from .data_model import db
+
+class FitbitSubscription(db.Model):
+    """
+    Fitbit Subscriptions API（Webhook）の購読
+    
+    Fitbitからの通知には subscription_id が含まれるため、これでユーザーを特定する。
+    subscription_id はユーザーIDを外部に出さないようにランダムに生成する。
+    
+    属性:
+        id (int): プライマリーキー
+        user_id (str): ユーザー識別子
+        subscription_id (str): Fitbitに登録した購読ID（50文字以内）
+        collection_type (str): 購読するコレクション（体重は body）
+        subscriber_id (str): Fitbitに登録したサブスクライバーID（Noneならデフォルト）
+        created_at (datetime): 登録日時
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(100), nullable=False, unique=True)
+    subscription_id = db.Column(db.String(50), nullable=False, unique=True)
+    collection_type = db.Column(db.String(20), nullable=False, default='body')
+    subscriber_id = db.Column(db.String(50), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """
+        モデルをJSONシリアライズ可能な辞書に変換
+        
+        戻り値:
+            dict: モデルの属性を含む辞書
+        """
+        return {
+            'user_id': self.user_id,
+            'subscription_id': self.subscription_id,
+            'collection_type': self.collection_type,
+            'subscriber_id': self.subscriber_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<FitbitSubscription {self.id}: {self.user_id} - {self.subscription_id}>'
@@ -0,0 +1,77 @@
+from datetime import datetime
+from .data_model import db
+
+class FitbitSyncJob(db.Model):
+    """
+    Fitbitデータ同期ジョブ（バックグラウンドワーカーが処理するキュー）
+    
+    インデックス:
+        idx_fitbit_sync_job_status: status, run_after 列のインデックス
+        idx_fitbit_sync_job_user_id: user_id列のインデックス
+    
+    属性:
+        id (int): プライマリーキー
+        user_id (str): ユーザー識別子
+        kind (str): ジョブの種類（sync: 期間の同期, day: Webhookで通知された1日分の同期, backfill: 過去データの取り込み）
+        from_date (date): 同期する期間の開始日（Noneの場合はデフォルト期間）
+        to_date (date): 同期する期間の終了日（Noneの場合は今日）
+        status (str): 状態（pending, running, completed, failed）
+        attempts (int): 実行回数
+        error (str): 最後に発生したエラー
+        inserted (int): 追加したレコード数
+        updated (int): 更新したレコード数
+        skipped (int): スキップしたレコード数
+        run_after (datetime): この日時以降に実行する（レート制限時の再実行など）
+        requested_at (datetime): ジョブ登録日時
+        started_at (datetime): 実行開始日時
+        finished_at (datetime): 実行終了日時
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(100), nullable=False)
+    kind = db.Column(db.String(20), nullable=False, default='sync')
+    from_date = db.Column(db.Date, nullable=True)
+    to_date = db.Column(db.Date, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    inserted = db.Column(db.Integer, nullable=False, default=0)
+    updated = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, nullable=True)
+    requested_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    # インデックスを定義
+    __table_args__ = (
+        db.Index('idx_fitbit_sync_job_status', 'status', 'run_after'),
+        db.Index('idx_fitbit_sync_job_user_id', 'user_id'),
+    )
+    
+    def to_dict(self):
+        """
+        モデルをJSONシリアライズ可能な辞書に変換
+        
+        戻り値:
+            dict: モデルの属性を含む辞書
+        """
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'kind': self.kind,
+            'from_date': self.from_date.isoformat() if self.from_date else None,
+            'to_date': self.to_date.isoformat() if self.to_date else None,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'skipped': self.skipped,
+            'run_after': self.run_after.isoformat() if self.run_after else None,
+            'requested_at': self.requested_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<FitbitSyncJob {self.id}: {self.user_id} - {self.kind} {self.status}>'
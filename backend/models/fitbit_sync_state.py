@@ -0,0 +1,44 @@
+from .data_model import db
+
+class FitbitSyncState(db.Model):
+    """
+    ユーザーごとのFitbitデータ同期状態
+    
+    属性:
+        id (int): プライマリーキー
+        user_id (str): ユーザー識別子
+        last_synced_at (datetime): 最後に同期が成功した日時
+        last_synced_date (date): 同期済みの最新の日付（high-water mark。次の定期同期はこの日から取得する）
+        last_log_id (int): これまでに取得した最大のlogId
+        last_attempt_at (datetime): 最後に同期を試みた日時
+        last_status (str): 最後の同期結果（completed, failed）
+        last_error (str): 最後に発生したエラー
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(100), nullable=False, unique=True)
+    last_synced_at = db.Column(db.DateTime, nullable=True)
+    last_synced_date = db.Column(db.Date, nullable=True)
+    last_log_id = db.Column(db.BigInteger, nullable=True)
+    last_attempt_at = db.Column(db.DateTime, nullable=True)
+    last_status = db.Column(db.String(20), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    
+    def to_dict(self):
+        """
+        モデルをJSONシリアライズ可能な辞書に変換
+        
+        戻り値:
+            dict: モデルの属性を含む辞書
+        """
+        return {
+            'user_id': self.user_id,
+            'last_synced_at': self.last_synced_at.isoformat() if self.last_synced_at else None,
+            'last_synced_date': self.last_synced_date.isoformat() if self.last_synced_date else None,
+            'last_log_id': self.last_log_id,
+            'last_attempt_at': self.last_attempt_at.isoformat() if self.last_attempt_at else None,
+            'last_status': self.last_status,
+            'last_error': self.last_error
+        }
+    
+    def __repr__(self):
+        return f'<FitbitSyncState {self.id}: {self.user_id} - {self.last_synced_at}>'
@@ -5,6 +5,11 @@ class FitbitWeight(db.Model):
     """
     Fitbit体重データモデル
     
+    インデックス:
+        idx_fitbit_weight_user_date_time: user_id, date, time, weight 列の複合インデックス
+            ユーザーごとの期間検索と日時順の並び替えに使用し、
+            weight を含めることで最新体重の取得はインデックスのみで完結する
+    
     属性:
         id (int): プライマリーキー
         user_id (str): ユーザー識別子
@@ -26,6 +31,25 @@ class FitbitWeight(db.Model):
     log_id = db.Column(db.String(100), nullable=True, unique=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # インデックスを定義
+    __table_args__ = (
+        db.Index('idx_fitbit_weight_user_date_time', 'user_id', 'date', 'time', 'weight'),
+    )
+    
+    @classmethod
+    def latest_weight(cls, user_id):
+        """
+        ユーザーの最新の体重値のみを取得（複合インデックスのみで完結する）
+        
+        引数:
+            user_id (str): ユーザー識別子
+            
+        戻り値:
+            float または None: 最新の体重
+        """
+        return db.session.query(cls.weight).filter(cls.user_id == user_id) \
+            .order_by(cls.date.desc(), cls.time.desc()).limit(1).scalar()
+    
     def to_dict(self):
         """
         モデルをJSONシリアライズ可能な辞書に変換
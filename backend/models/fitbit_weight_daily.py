@@ -0,0 +1,79 @@
+from datetime import datetime
+from .data_model import db
+
+class FitbitWeightDaily(db.Model):
+    """
+    ユーザーごとの日次体重集計（FitbitWeightから差分更新されるロールアップ）
+    
+    インデックス:
+        idx_fitbit_weight_daily_user_date: user_id, date 列の一意な複合インデックス
+    
+    属性:
+        id (int): プライマリーキー
+        user_id (str): ユーザー識別子
+        date (date): 記録日
+        count (int): その日の記録数
+        min_weight (float): 最小体重
+        max_weight (float): 最大体重
+        sum_weight (float): 体重の合計
+        first_weight (float): その日の最初の記録の体重
+        first_time (time): その日の最初の記録時間
+        last_weight (float): その日の最後の記録の体重
+        last_time (time): その日の最後の記録時間
+        bmi_sum (float): BMIの合計
+        bmi_count (int): BMIが記録されている記録数
+        updated_at (datetime): 集計日時
+    """
+    __tablename__ = 'fitbit_weight_daily'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(100), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    count = db.Column(db.Integer, nullable=False)
+    min_weight = db.Column(db.Float, nullable=False)
+    max_weight = db.Column(db.Float, nullable=False)
+    sum_weight = db.Column(db.Float, nullable=False)
+    first_weight = db.Column(db.Float, nullable=False)
+    first_time = db.Column(db.Time, nullable=True)
+    last_weight = db.Column(db.Float, nullable=False)
+    last_time = db.Column(db.Time, nullable=True)
+    bmi_sum = db.Column(db.Float, nullable=False, default=0.0)
+    bmi_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # インデックスを定義
+    __table_args__ = (
+        db.Index('idx_fitbit_weight_daily_user_date', 'user_id', 'date', unique=True),
+    )
+    
+    @property
+    def mean_weight(self):
+        """その日の平均体重"""
+        return self.sum_weight / self.count if self.count else None
+    
+    @property
+    def mean_bmi(self):
+        """その日の平均BMI"""
+        return self.bmi_sum / self.bmi_count if self.bmi_count else None
+    
+    def to_dict(self):
+        """
+        モデルをJSONシリアライズ可能な辞書に変換
+        
+        戻り値:
+            dict: モデルの属性を含む辞書
+        """
+        return {
+            'user_id': self.user_id,
+            'date': self.date.isoformat(),
+            'count': self.count,
+            'min_weight': self.min_weight,
+            'max_weight': self.max_weight,
+            'mean_weight': self.mean_weight,
+            'first_weight': self.first_weight,
+            'last_weight': self.last_weight,
+            'mean_bmi': self.mean_bmi
+        }
+    
+    def __repr__(self):
+        return f'<FitbitWeightDaily {self.id}: {self.user_id} - {self.date}>'
@@ -0,0 +1,87 @@
+"""
+軽量なスキーママイグレーション
+
+db.create_all() は既存のテーブルにインデックスや列を追加しないため、
+既存のデータベースに対するスキーマ変更はここに番号付きで登録する。
+各マイグレーションは冪等に書き、新規に create_all() で作成した
+データベースに対して実行しても問題がないようにする。
+"""
+from datetime import datetime
+from sqlalchemy import inspect
+from .data_model import db
+from .schema_migration import SchemaMigration
+
+def _create_missing_indexes(connection, model):
+    """モデルに定義されたインデックスのうち、存在しないものを作成"""
+    for index in model.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+def _add_fitbit_weight_indexes(connection):
+    from .fitbit_weight import FitbitWeight
+    _create_missing_indexes(connection, FitbitWeight)
+
+def _build_fitbit_weight_daily(connection):
+    from .fitbit_weight_daily import FitbitWeightDaily
+    from services.weight_rollup import rebuild_rollups
+    FitbitWeightDaily.__table__.create(connection, checkfirst=True)
+    rebuild_rollups(connection)
+
+def _add_fitbit_sync_high_water_marks(connection):
+    from .fitbit_sync_state import FitbitSyncState
+    # テーブルがなければ create_all() で新しい列を含めて作成される
+    if not inspect(connection).has_table(FitbitSyncState.__tablename__):
+        return
+    for name in ('last_synced_date', 'last_log_id'):
+        add_column_if_missing(connection, FitbitSyncState.__tablename__, FitbitSyncState.__table__.c[name])
+
+# (番号, 説明, 適用関数) のリスト。番号は昇順で追加する
+MIGRATIONS = [
+    (1, 'Add composite (user_id, date, time, weight) index to fitbit_weight', _add_fitbit_weight_indexes),
+    (2, 'Build fitbit_weight_daily rollups from existing readings', _build_fitbit_weight_daily),
+    (3, 'Add high-water mark columns to fitbit_sync_state', _add_fitbit_sync_high_water_marks),
+]
+
+def add_column_if_missing(connection, table_name, column):
+    """
+    列が存在しなければ追加
+    
+    引数:
+        connection (Connection): データベース接続
+        table_name (str): テーブル名
+        column (Column): 追加する列（モデルの列定義）
+    """
+    existing = {c['name'] for c in inspect(connection).get_columns(table_name)}
+    if column.name in existing:
+        return
+    column_type = column.type.compile(dialect=connection.dialect)
+    connection.exec_driver_sql(f'ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}')
+
+def run_migrations(engine=None):
+    """
+    未適用のマイグレーションを順に適用
+    
+    引数:
+        engine (Engine): 対象のエンジン（デフォルトはアプリケーションのエンジン）
+        
+    戻り値:
+        list: 適用したマイグレーション番号のリスト
+    """
+    engine = engine or db.engine
+    applied = []
+    
+    with engine.begin() as connection:
+        SchemaMigration.__table__.create(connection, checkfirst=True)
+        done = {row[0] for row in connection.execute(db.select(SchemaMigration.version))}
+        
+        for version, description, migrate in MIGRATIONS:
+            if version in done:
+                continue
+            migrate(connection)
+            connection.execute(
+                SchemaMigration.__table__.insert().values(
+                    version=version, description=description, applied_at=datetime.utcnow()
+                )
+            )
+            applied.append(version)
+    
+    return applied
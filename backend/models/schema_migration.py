@@ -0,0 +1,20 @@
+from datetime import datetime
+from .data_model import db
+
+class SchemaMigration(db.Model):
+    """
+    適用済みのスキーママイグレーション
+    
+    属性:
+        version (int): マイグレーション番号
+        description (str): マイグレーションの説明
+        applied_at (datetime): 適用日時
+    """
+    __tablename__ = 'schema_migration'
+    
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(255), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SchemaMigration {self.version}: {self.description}>'
@@ -1,6 +1,9 @@
 from datetime import datetime
 from .data_model import db
 
+# 最新体重が渡されなかったことを示す番兵
+_UNSET = object()
+
 class WeightGoal(db.Model):
     """
     体重目標データモデル
@@ -50,10 +53,15 @@ class WeightGoal(db.Model):
         self.start_date = start_date or datetime.now().date()
         self.description = description
     
-    def to_dict(self):
+    def to_dict(self, latest_weight=_UNSET):
         """
         モデルをJSONシリアライズ可能な辞書に変換
         
+        引数:
+            latest_weight (float または None): ユーザーの最新体重。
+                リクエスト内で一度だけ取得した値を渡すと進捗計算でのクエリを省略できる。
+                省略した場合はデータベースから取得する。
+        
         戻り値:
             dict: モデルの属性を含む辞書
         """
@@ -70,13 +78,16 @@ class WeightGoal(db.Model):
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
             'days_remaining': (self.target_date - datetime.now().date()).days if self.target_date else None,
-            'progress_percentage': self._calculate_progress() if not self.is_achieved else 100
+            'progress_percentage': self._calculate_progress(latest_weight) if not self.is_achieved else 100
         }
     
-    def _calculate_progress(self):
+    def _calculate_progress(self, latest_weight=_UNSET):
         """
         目標達成の進捗率を計算
         
+        引数:
+            latest_weight (float または None): ユーザーの最新体重（省略時はデータベースから取得）
+        
         戻り値:
             float: 進捗率（0〜100）
         """
@@ -84,12 +95,12 @@ class WeightGoal(db.Model):
             return 100.0
             
         try:
-            from models import FitbitWeight
-            
-            # 最新の体重を取得
-            latest_weight = FitbitWeight.query.filter_by(user_id=self.user_id).order_by(FitbitWeight.date.desc()).first()
+            # 最新の体重を取得（渡されていない場合のみクエリ）
+            if latest_weight is _UNSET:
+                from models import FitbitWeight
+                latest_weight = FitbitWeight.latest_weight(self.user_id)
             
-            if not latest_weight:
+            if latest_weight is None:
                 return 0.0
                 
             # 開始体重と目標体重の差分
@@ -99,7 +110,7 @@ class WeightGoal(db.Model):
                 return 100.0
                 
             # 現在の体重と目標体重の差分
-            current_diff = abs(latest_weight.weight - self.target_weight)
+            current_diff = abs(latest_weight - self.target_weight)
             
             # 進捗率を計算（減量・増量どちらにも対応）
             progress = ((total_diff - current_diff) / total_diff) * 100
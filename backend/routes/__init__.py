@@ -1,5 +1,12 @@
+from .auth import auth_api, current_user_id, authenticated_user_id, public_endpoint, require_user
 from .api import api
 from .fitbit import fitbit_api
 from .weight_goal import weight_goal_api
+from .metrics import metrics_api, profiling_allowed
 
-__all__ = ['api', 'fitbit_api', 'weight_goal_api']
\ No newline at end of file
+# ユーザーを解決できないリクエストは各ブループリントで401にする
+for _blueprint in (api, fitbit_api, weight_goal_api):
+    _blueprint.before_request(require_user)
+
+__all__ = ['auth_api', 'current_user_id', 'authenticated_user_id', 'public_endpoint', 'require_user', 'api', 'fitbit_api', 'weight_goal_api',
+           'metrics_api', 'profiling_allowed']
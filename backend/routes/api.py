@@ -1,9 +1,12 @@
 from flask import Blueprint, jsonify, request
 from models import db, Data
+from services import DATA_SCOPE
+from .http_cache import conditional_get
 
 api = Blueprint('api', __name__)
 
 @api.route('/data', methods=['GET'])
+@conditional_get(scope=DATA_SCOPE)
 def get_all_data():
     """
     すべてのデータを取得するエンドポイント
@@ -39,6 +42,7 @@ def add_data():
         return jsonify({'error': str(e)}), 400
 
 @api.route('/data/<int:id>', methods=['GET'])
+@conditional_get(scope=DATA_SCOPE)
 def get_data(id):
     """
     特定のIDのデータを取得するエンドポイント
@@ -102,6 +106,7 @@ def delete_data(id):
         return jsonify({'error': str(e)}), 400
 
 @api.route('/analytics', methods=['GET'])
+@conditional_get(scope=DATA_SCOPE)
 def get_analytics():
     """
     アナリティクス用のデータを取得するエンドポイント
@@ -0,0 +1,180 @@
+"""
+リクエストごとのユーザー解決（認証）
+
+ユーザーIDは以下の順に解決し、リクエスト内では1回だけ解決する。
+1. Authorization: Bearer ヘッダーのAPIトークン（検証結果はプロセス内にキャッシュ）
+2. セッションにログイン済みのユーザー（POST /api/auth/session）
+3. 設定 AUTH_DEFAULT_USER（開発用の単一ユーザー。本番環境では無効）
+
+api・fitbit_api・weight_goal_api の各ブループリントは require_user により
+ユーザーを解決できないリクエストを 401 で拒否する。
+"""
+from flask import Blueprint, current_app, jsonify, request, session
+from models import ApiToken
+from services import authenticate_token, issue_api_token, revoke_api_tokens
+
+auth_api = Blueprint('auth_api', __name__)
+
+# request.environ に保存する解決済みのユーザーと解決方法のキー
+_USER_KEY = 'weight_goal.user_id'
+_METHOD_KEY = 'weight_goal.auth_method'
+
+def public_endpoint(view):
+    """認証を必要としないエンドポイントとして登録するデコレーター"""
+    view.is_public_endpoint = True
+    return view
+
+def _bearer_token():
+    """Authorization ヘッダーのベアラートークン（ヘッダーがなければNone、形式が不正なら空文字列）"""
+    header = request.headers.get('Authorization')
+    if header is None:
+        return None
+    scheme, _, token = header.partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' else ''
+
+def _resolve_user():
+    """リクエストのユーザーIDと解決方法を取得"""
+    token = _bearer_token()
+    if token is not None:
+        # トークンが送られた場合は、無効でもセッションや既定ユーザーにはフォールバックしない
+        return authenticate_token(token), 'token'
+    
+    user_id = session.get('user_id')
+    if user_id:
+        return user_id, 'session'
+    
+    default_user = current_app.config.get('AUTH_DEFAULT_USER')
+    if default_user:
+        return default_user, 'default'
+    return None, None
+
+def current_user_id():
+    """
+    リクエストのユーザーIDを取得（リクエスト内では1回だけ解決する）
+    
+    戻り値:
+        str または None: ユーザーID。認証されていなければNone
+    """
+    if _USER_KEY not in request.environ:
+        request.environ[_USER_KEY], request.environ[_METHOD_KEY] = _resolve_user()
+    return request.environ[_USER_KEY]
+
+def authenticated_user_id():
+    """
+    セッションまたはAPIトークンで認証されたユーザーIDを取得
+    
+    戻り値:
+        str または None: ユーザーID。既定ユーザー（AUTH_DEFAULT_USER）へのフォールバックや未認証ならNone
+    """
+    user_id = current_user_id()
+    return user_id if request.environ[_METHOD_KEY] in ('session', 'token') else None
+
+def require_user():
+    """
+    ユーザーを解決できないリクエストを拒否する before_request フック
+    
+    戻り値:
+        tuple または None: 認証されていない場合は401エラー
+    """
+    if request.method == 'OPTIONS':
+        return None
+    view = current_app.view_functions.get(request.endpoint)
+    if view is not None and getattr(view, 'is_public_endpoint', False):
+        return None
+    if current_user_id() is None:
+        return jsonify({'error': 'Authentication required'}), 401
+    return None
+
+@auth_api.route('/session', methods=['POST'])
+@public_endpoint
+def login():
+    """
+    APIトークンでセッションにログインするエンドポイント
+    
+    リクエスト:
+        JSON: token を含む（または Authorization: Bearer ヘッダー）
+    
+    戻り値:
+        JSON: ログインしたユーザー
+    """
+    data = request.get_json(silent=True) or {}
+    token = data.get('token') or _bearer_token()
+    user_id = authenticate_token(token)
+    if user_id is None:
+        return jsonify({'error': 'Invalid token'}), 401
+    
+    session['user_id'] = user_id
+    request.environ[_USER_KEY], request.environ[_METHOD_KEY] = user_id, 'session'
+    return jsonify({'user_id': user_id})
+
+@auth_api.route('/session', methods=['DELETE'])
+@public_endpoint
+def logout():
+    """
+    セッションからログアウトするエンドポイント
+    
+    戻り値:
+        JSON: 処理結果
+    """
+    session.pop('user_id', None)
+    return jsonify({'success': True})
+
+@auth_api.route('/me', methods=['GET'])
+def me():
+    """
+    リクエストのユーザーを取得するエンドポイント
+    
+    戻り値:
+        JSON: user_id と解決方法（token, session, default）
+    """
+    return jsonify({'user_id': current_user_id(), 'auth_method': request.environ[_METHOD_KEY]})
+
+@auth_api.route('/tokens', methods=['GET'])
+def list_tokens():
+    """
+    ユーザーのAPIトークンの一覧を取得するエンドポイント（トークン自体は含まない）
+    
+    戻り値:
+        JSON: トークンのリスト
+    """
+    tokens = ApiToken.query.filter_by(user_id=current_user_id()).order_by(ApiToken.id).all()
+    return jsonify([token.to_dict() for token in tokens])
+
+@auth_api.route('/tokens', methods=['POST'])
+def create_token():
+    """
+    ユーザーのAPIトークンを発行するエンドポイント
+    
+    リクエスト:
+        JSON: name(オプション), expires_in(オプション、秒)を含む
+    
+    セッションまたはAPIトークンで認証されたリクエストのみ受け付ける
+    （AUTH_DEFAULT_USER による既定ユーザーには発行しない。CLIでは flask users issue-token を使用する）。
+    
+    戻り値:
+        JSON: 発行したトークン（token はこの応答でのみ取得できる）
+    """
+    if authenticated_user_id() is None:
+        return jsonify({'error': 'A session or API token is required to issue tokens'}), 401
+    
+    data = request.get_json(silent=True) or {}
+    expires_in = data.get('expires_in')
+    if expires_in is not None and (not isinstance(expires_in, int) or expires_in <= 0):
+        return jsonify({'error': 'expires_in must be a positive integer'}), 400
+    
+    token, record = issue_api_token(current_user_id(), name=data.get('name'), expires_in=expires_in)
+    return jsonify(dict(record.to_dict(), token=token)), 201
+
+@auth_api.route('/tokens/<int:token_id>', methods=['DELETE'])
+def revoke_token(token_id):
+    """
+    ユーザーのAPIトークンを失効させるエンドポイント
+    
+    戻り値:
+        JSON: 処理結果
+    """
+    if not revoke_api_tokens(current_user_id(), token_id=token_id):
+        return jsonify({'error': 'Token not found'}), 404
+    return jsonify({'success': True})
+
+auth_api.before_request(require_user)
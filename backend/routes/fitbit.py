@@ -1,14 +1,26 @@
-from flask import Blueprint, jsonify, request, redirect, url_for, current_app, session
+from flask import Blueprint, Response, jsonify, request, redirect, url_for, current_app, session, stream_with_context
 import requests
-import base64
 import json
 from datetime import datetime, timedelta
 from urllib.parse import urlencode
 import secrets
-from models import db, FitbitAuth, FitbitWeight
+from models import db, FitbitAuth, FitbitWeight, FitbitBackfill, FitbitSubscription, FitbitSyncJob, FitbitSyncState
+from services import (
+    start_backfill, enqueue_sync, plan_sync, apply_sync, record_sync_failure, fetch_weight_logs_async,
+    RateLimitExceeded, get_fitbit_client, get_token_cache, get_valid_token,
+    parse_metrics, load_daily_series, analyze_series,
+    weight_history_query, fetch_weight_page, iter_weight_dicts, stream_ndjson, stream_json_object,
+    parse_wire_format, columnar_payload, pack_binary, BINARY_MIMETYPE, parse_date_range,
+    verify_signature, sync_stale_before, subscribe_user, unsubscribe_user, parse_notifications, enqueue_notified_days
+)
+from .auth import current_user_id, public_endpoint
+from .http_cache import conditional_get, SHORT_LIVED
 
 fitbit_api = Blueprint('fitbit_api', __name__)
 
+# GET /weight の1ページあたりの最大件数
+MAX_WEIGHT_PAGE_SIZE = 5000
+
 # OAuth2.0認証フローのための状態トークン
 @fitbit_api.route('/auth', methods=['GET'])
 def auth():
@@ -21,6 +33,8 @@ def auth():
     # ステートトークンを生成（CSRF対策）
     state = secrets.token_urlsafe(16)
     session['fitbit_oauth_state'] = state
+    # コールバックで認証情報を保存するユーザー
+    session['fitbit_oauth_user'] = current_user_id()
     
     # 認証パラメータの設定
     params = {
@@ -36,6 +50,7 @@ def auth():
     return redirect(authorization_url)
 
 @fitbit_api.route('/callback', methods=['GET'])
+@public_endpoint
 def callback():
     """
     Fitbit認証コールバックエンドポイント
@@ -55,18 +70,10 @@ def callback():
     # クリア済みのCSRFトークン
     session.pop('fitbit_oauth_state', None)
     
-    # トークン取得のためのリクエスト
-    token_url = current_app.config['FITBIT_TOKEN_URL']
-    
-    # クライアントIDとシークレットを使用した認証
-    client_id = current_app.config['FITBIT_CLIENT_ID']
-    client_secret = current_app.config['FITBIT_CLIENT_SECRET']
-    auth_header = base64.b64encode(f"{client_id}:{client_secret}".encode()).decode()
-    
-    headers = {
-        'Authorization': f'Basic {auth_header}',
-        'Content-Type': 'application/x-www-form-urlencoded'
-    }
+    # 認証フローを開始したユーザー（Fitbitからのリダイレクトにはベアラートークンが付かないためセッションから取得）
+    user_id = session.pop('fitbit_oauth_user', None)
+    if not user_id:
+        return jsonify({'success': False, 'error': 'Invalid state'}), 400
     
     data = {
         'code': code,
@@ -76,16 +83,11 @@ def callback():
     
     # トークン取得
     try:
-        response = requests.post(token_url, headers=headers, data=data)
-        response.raise_for_status()
-        token_data = response.json()
+        token_data = get_fitbit_client().request_token(data)
         
         # トークンの有効期限を計算
         expires_at = datetime.utcnow() + timedelta(seconds=token_data['expires_in'])
         
-        # 仮のユーザーID（本番環境では認証システムと連携）
-        user_id = 'default_user'
-        
         # 既存の認証情報があるか確認
         auth_record = FitbitAuth.query.filter_by(user_id=user_id).first()
         
@@ -108,6 +110,15 @@ def callback():
             db.session.add(auth_record)
         
         db.session.commit()
+        get_token_cache().put(user_id, auth_record)
+        
+        # 体重データの更新通知を購読（失敗しても定期同期で取り込まれる）
+        if current_app.config['FITBIT_SUBSCRIPTIONS_ENABLED']:
+            try:
+                subscribe_user(user_id)
+            except (PermissionError, requests.exceptions.RequestException) as e:
+                db.session.rollback()
+                current_app.logger.warning('Fitbit subscription for %s failed: %s', user_id, e)
         
         # フロントエンドにリダイレクト（成功）
         return redirect(f"http://localhost:3000/fitbit/success")
@@ -115,7 +126,7 @@ def callback():
     except requests.exceptions.RequestException as e:
         # エラーハンドリング
         error_message = str(e)
-        if hasattr(e, 'response') and e.response:
+        if getattr(e, 'response', None) is not None:
             try:
                 error_data = e.response.json()
                 error_message = error_data.get('errors', [{}])[0].get('message', str(e))
@@ -125,57 +136,8 @@ def callback():
         # フロントエンドにリダイレクト（失敗）
         return redirect(f"http://localhost:3000/fitbit/error?message={error_message}")
 
-# リフレッシュトークンを使用してアクセストークンを更新
-def refresh_access_token(auth_record):
-    """
-    リフレッシュトークンを使用してアクセストークンを更新
-    
-    引数:
-        auth_record (FitbitAuth): 更新する認証レコード
-        
-    戻り値:
-        bool: 更新成功ならTrue、失敗ならFalse
-    """
-    token_url = current_app.config['FITBIT_TOKEN_URL']
-    
-    # クライアントIDとシークレットを使用した認証
-    client_id = current_app.config['FITBIT_CLIENT_ID']
-    client_secret = current_app.config['FITBIT_CLIENT_SECRET']
-    auth_header = base64.b64encode(f"{client_id}:{client_secret}".encode()).decode()
-    
-    headers = {
-        'Authorization': f'Basic {auth_header}',
-        'Content-Type': 'application/x-www-form-urlencoded'
-    }
-    
-    data = {
-        'grant_type': 'refresh_token',
-        'refresh_token': auth_record.refresh_token
-    }
-    
-    try:
-        response = requests.post(token_url, headers=headers, data=data)
-        response.raise_for_status()
-        token_data = response.json()
-        
-        # トークンの有効期限を計算
-        expires_at = datetime.utcnow() + timedelta(seconds=token_data['expires_in'])
-        
-        # 認証情報の更新
-        auth_record.access_token = token_data['access_token']
-        auth_record.refresh_token = token_data['refresh_token']
-        auth_record.expires_at = expires_at
-        auth_record.scope = token_data['scope']
-        auth_record.token_type = token_data['token_type']
-        
-        db.session.commit()
-        return True
-        
-    except requests.exceptions.RequestException:
-        return False
-
 # 有効なアクセストークンを取得（必要に応じて更新）
-def get_valid_access_token(user_id='default_user'):
+def get_valid_access_token(user_id):
     """
     有効なアクセストークンを取得（必要に応じて更新）
     
@@ -185,18 +147,8 @@ def get_valid_access_token(user_id='default_user'):
     戻り値:
         str または None: 有効なアクセストークン、または取得失敗時はNone
     """
-    auth_record = FitbitAuth.query.filter_by(user_id=user_id).first()
-    
-    if not auth_record:
-        return None
-    
-    # トークンが期限切れの場合は更新
-    if auth_record.is_token_expired():
-        success = refresh_access_token(auth_record)
-        if not success:
-            return None
-    
-    return auth_record.access_token
+    token = get_valid_token(user_id)
+    return token.access_token if token else None
 
 # 認証状態チェックエンドポイント
 @fitbit_api.route('/status', methods=['GET'])
@@ -207,150 +159,388 @@ def status():
     戻り値:
         JSON: 認証状態
     """
-    user_id = 'default_user'  # 本番環境では認証システムと連携
+    user_id = current_user_id()
     
-    auth_record = FitbitAuth.query.filter_by(user_id=user_id).first()
+    # キャッシュ済みのトークンが有効な場合はデータベースにアクセスしない
+    token = get_valid_token(user_id)
     
-    if not auth_record:
-        return jsonify({
-            'is_authenticated': False,
-            'message': 'Not authenticated with Fitbit'
-        })
-    
-    # トークンの期限切れ確認
-    if auth_record.is_token_expired():
-        success = refresh_access_token(auth_record)
-        if not success:
+    if not token:
+        if not FitbitAuth.query.filter_by(user_id=user_id).first():
             return jsonify({
                 'is_authenticated': False,
-                'message': 'Authentication expired and refresh failed'
+                'message': 'Not authenticated with Fitbit'
             })
+        return jsonify({
+            'is_authenticated': False,
+            'message': 'Authentication expired and refresh failed'
+        })
     
     return jsonify({
         'is_authenticated': True,
-        'expires_at': auth_record.expires_at.isoformat(),
-        'scope': auth_record.scope
+        'expires_at': token.expires_at.isoformat(),
+        'scope': token.scope
     })
 
 # 体重データ取得エンドポイント
 @fitbit_api.route('/weight', methods=['GET'])
 def get_weight():
     """
-    Fitbitから体重データを取得するエンドポイント
+    保存済みの体重データを取得するエンドポイント
+    
+    Fitbit APIは呼び出さず、ローカルのデータを即座に返す。
+    最後の同期から同期間隔（Webhookを購読している場合は FITBIT_SUBSCRIBED_SYNC_INTERVAL）が
+    経過している場合はバックグラウンド同期を登録する。
     
     クエリパラメータ:
         from_date (str): 開始日 (YYYY-MM-DD)
         to_date (str): 終了日 (YYYY-MM-DD)
+        limit (int): 1ページの件数（指定した場合はページ単位で返し、next_cursor を含める）
+        cursor (str): 前のページの next_cursor
+        stream (str): json または ndjson（全件を少しずつ書き出す。limit とは併用不可）
+        format (str): json（デフォルト）, columnar, binary（日付と体重の列のみ。stream・limit とは併用不可）
+        delta (bool): format=columnar/binary で差分エンコードする場合 true
         
     戻り値:
-        JSON: 体重データ
+        JSON: 体重データと同期状態（stream=ndjson の場合は1行1件のJSON、format=binary の場合はバイナリ）
     """
     # 期間指定（デフォルトは過去30日）
-    today = datetime.now().strftime('%Y-%m-%d')
-    from_date = request.args.get('from_date', (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'))
-    to_date = request.args.get('to_date', today)
+    try:
+        from_date, to_date = parse_date_range(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    stream = request.args.get('stream')
+    limit = request.args.get('limit')
+    
+    if stream not in (None, 'json', 'ndjson'):
+        return jsonify({'success': False, 'error': 'Invalid stream. Use json or ndjson'}), 400
+    if stream and limit:
+        return jsonify({'success': False, 'error': 'stream cannot be combined with limit'}), 400
+    try:
+        wire_format, delta = parse_wire_format(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if wire_format != 'json' and (stream or limit):
+        return jsonify({'success': False, 'error': f'format={wire_format} cannot be combined with stream or limit'}), 400
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= MAX_WEIGHT_PAGE_SIZE:
+            return jsonify({'success': False, 'error': f'limit must be between 1 and {MAX_WEIGHT_PAGE_SIZE}'}), 400
     
     # ユーザーIDを取得（本番環境では認証システムと連携）
-    user_id = 'default_user'
+    user_id = current_user_id()
+    
+    try:
+        query = weight_history_query(user_id, from_date, to_date, request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
-    # アクセストークンを取得
-    access_token = get_valid_access_token(user_id)
-    if not access_token:
+    # Fitbit連携済みか確認（キャッシュにトークンがあればDBは参照しない）
+    if get_token_cache().get(user_id) is None and not FitbitAuth.query.filter_by(user_id=user_id).first():
         return jsonify({
             'success': False,
             'error': 'Not authenticated with Fitbit or token refresh failed'
         }), 401
     
-    # Fitbit APIから体重データを取得
-    headers = {
-        'Authorization': f'Bearer {access_token}'
+    # 同期状態を確認し、古ければバックグラウンド同期を登録
+    state = FitbitSyncState.query.filter_by(user_id=user_id).first()
+    stale_before = sync_stale_before(user_id)
+    sync_pending = False
+    if state is None or state.last_attempt_at is None or state.last_attempt_at < stale_before:
+        enqueue_sync(user_id)
+        sync_pending = True
+    
+    last_synced_at = state.last_synced_at.isoformat() if state and state.last_synced_at else None
+    
+    # グラフ用の列指向形式（日付と体重の列のみを取得）
+    if wire_format != 'json':
+        rows = query.with_entities(FitbitWeight.date, FitbitWeight.weight).all()
+        dates = [row[0] for row in rows]
+        columns = {'weight': [row[1] for row in rows]}
+        if wire_format == 'binary':
+            response = Response(pack_binary(dates, columns, delta), mimetype=BINARY_MIMETYPE)
+            response.headers['X-Sync-Pending'] = 'true' if sync_pending else 'false'
+            if last_synced_at:
+                response.headers['X-Last-Synced-At'] = last_synced_at
+            return response
+        return jsonify({
+            'success': True,
+            'last_synced_at': last_synced_at,
+            'sync_pending': sync_pending,
+            'data': columnar_payload(dates, columns, delta)
+        })
+    
+    # 全件を少しずつ読み込みながら書き出す（範囲の大きさによらずメモリ使用量は一定）
+    if stream == 'ndjson':
+        return Response(stream_with_context(stream_ndjson(iter_weight_dicts(query))),
+                        mimetype='application/x-ndjson')
+    if stream == 'json':
+        extra = {'success': True, 'last_synced_at': last_synced_at, 'sync_pending': sync_pending}
+        return Response(stream_with_context(stream_json_object(iter_weight_dicts(query), 'data', extra)),
+                        mimetype='application/json')
+    
+    response = {
+        'success': True,
+        'last_synced_at': last_synced_at,
+        'sync_pending': sync_pending
     }
+    if limit is not None:
+        entries, response['next_cursor'] = fetch_weight_page(query, limit)
+    else:
+        entries = query.all()
+    response['data'] = [entry.to_dict() for entry in entries]
     
-    url = f"{current_app.config['FITBIT_API_BASE_URL']}/1/user/-/body/log/weight/date/{from_date}/{to_date}.json"
+    return jsonify(response)
+
+# 同期ジョブ登録エンドポイント
+@fitbit_api.route('/sync', methods=['POST'])
+async def request_sync():
+    """
+    Fitbitデータの同期を登録（wait=true の場合はリクエスト内で実行）するエンドポイント
     
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        weight_data = response.json()
-        
-        # データベースに保存
-        weight_entries = []
-        for entry in weight_data.get('weight', []):
-            # 日時の処理
-            log_date = datetime.strptime(entry.get('date', ''), '%Y-%m-%d').date()
-            log_time = None
-            if 'time' in entry:
-                time_str = entry.get('time', '')
-                try:
-                    log_time = datetime.strptime(time_str, '%H:%M:%S').time()
-                except ValueError:
-                    pass
-            
-            # 既存のエントリを確認
-            existing = FitbitWeight.query.filter_by(log_id=str(entry.get('logId'))).first()
-            
-            if not existing:
-                new_entry = FitbitWeight(
-                    user_id=user_id,
-                    weight=entry.get('weight'),
-                    bmi=entry.get('bmi'),
-                    date=log_date,
-                    time=log_time,
-                    source=entry.get('source'),
-                    log_id=str(entry.get('logId'))
-                )
-                db.session.add(new_entry)
-                weight_entries.append(new_entry)
-        
-        if weight_entries:
-            db.session.commit()
-        
-        # 同期後にデータベースから取得（保存されたすべてのデータを含む）
-        stored_data = FitbitWeight.query.filter(
-            FitbitWeight.user_id == user_id,
-            FitbitWeight.date >= from_date,
-            FitbitWeight.date <= to_date
-        ).order_by(FitbitWeight.date, FitbitWeight.time).all()
+    通常はバックグラウンド同期のジョブを登録して 202 を返す。
+    wait=true の場合は非同期クライアント（fetch_weight_logs_async）でFitbit APIを呼び出して同期し、
+    保存した件数を返す。
+    
+    リクエスト:
+        JSON: from_date, to_date（オプション。省略時は直近の期間）
+        クエリ: wait（オプション。true ならリクエスト内で同期する）
         
+    戻り値:
+        JSON: 登録されたジョブ、または同期した件数と同期状態
+    """
+    data = request.get_json(silent=True) or {}
+    user_id = current_user_id()
+    
+    try:
+        from_date = datetime.strptime(data['from_date'], '%Y-%m-%d').date() if data.get('from_date') else None
+        to_date = datetime.strptime(data['to_date'], '%Y-%m-%d').date() if data.get('to_date') else None
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    if not FitbitAuth.query.filter_by(user_id=user_id).first():
         return jsonify({
-            'success': True,
-            'data': [entry.to_dict() for entry in stored_data]
-        })
-        
-    except requests.exceptions.RequestException as e:
-        error_message = str(e)
-        status_code = 500
-        
-        # レスポンスがあればエラー詳細を取得
-        if hasattr(e, 'response') and e.response:
-            status_code = e.response.status_code
-            try:
-                error_data = e.response.json()
-                error_message = error_data.get('errors', [{}])[0].get('message', str(e))
-            except:
-                pass
+            'success': False,
+            'error': 'Not authenticated with Fitbit'
+        }), 401
+    
+    if request.args.get('wait', '').lower() != 'true':
+        job = enqueue_sync(user_id, from_date=from_date, to_date=to_date)
+        return jsonify({'success': True, 'job': job.to_dict()}), 202
+    
+    try:
+        plan = plan_sync(user_id, from_date, to_date)
+    except PermissionError as e:
+        return jsonify({'success': False, 'error': str(e)}), 401
+    
+    results = await fetch_weight_logs_async([(user_id, plan.access_token, plan.from_date, plan.end_date, user_id)])
+    weight_logs = results[user_id]
+    if isinstance(weight_logs, RateLimitExceeded):
+        record_sync_failure(user_id, weight_logs)
+        response = jsonify({'success': False, 'error': str(weight_logs)})
+        response.headers['Retry-After'] = str(weight_logs.retry_after)
+        return response, 429
+    if isinstance(weight_logs, Exception):
+        record_sync_failure(user_id, weight_logs)
+        return jsonify({'success': False, 'error': f'Fitbit sync failed: {weight_logs}'}), 502
+    
+    counts = apply_sync(plan, weight_logs)
+    state = FitbitSyncState.query.filter_by(user_id=user_id).first()
+    return jsonify({'success': True, 'counts': counts, 'state': state.to_dict()})
+
+# 同期状態取得エンドポイント
+@fitbit_api.route('/sync', methods=['GET'])
+def sync_status():
+    """
+    Fitbitデータの同期状態を取得するエンドポイント
+    
+    戻り値:
+        JSON: 同期状態と最新のジョブ
+    """
+    user_id = current_user_id()
+    
+    state = FitbitSyncState.query.filter_by(user_id=user_id).first()
+    latest_job = FitbitSyncJob.query.filter_by(user_id=user_id) \
+        .order_by(FitbitSyncJob.requested_at.desc(), FitbitSyncJob.id.desc()).first()
+    
+    return jsonify({
+        'success': True,
+        'state': state.to_dict() if state else None,
+        'latest_job': latest_job.to_dict() if latest_job else None
+    })
+
+# Webhook（Fitbit Subscriptions API）の確認エンドポイント
+@fitbit_api.route('/webhook', methods=['GET'])
+@public_endpoint
+def verify_webhook():
+    """
+    Fitbitがサブスクライバーの登録時に行う確認に応答するエンドポイント
+    
+    クエリパラメータ:
+        verify (str): 確認コード
         
-        # APIレート制限の場合
-        if status_code == 429:
-            return jsonify({
-                'success': False,
-                'error': 'Fitbit API rate limit exceeded. Please try again later.'
-            }), 429
+    戻り値:
+        204: 確認コードが FITBIT_SUBSCRIBER_VERIFICATION_CODE と一致する場合
+        404: 一致しない場合
+    """
+    expected = current_app.config['FITBIT_SUBSCRIBER_VERIFICATION_CODE']
+    if expected and request.args.get('verify') == expected:
+        return '', 204
+    return '', 404
+
+# Webhook（Fitbit Subscriptions API）の通知エンドポイント
+@fitbit_api.route('/webhook', methods=['POST'])
+@public_endpoint
+def receive_webhook():
+    """
+    Fitbitからのデータ更新通知を受け取るエンドポイント
+    
+    Fitbitは数秒以内の応答を求めるため、ここではFitbit APIを呼ばず、
+    通知された（ユーザー, 日付）の組ごとに1日分の同期ジョブを登録するだけにする。
+    
+    リクエスト:
+        JSON: collectionType, date, ownerId, ownerType, subscriptionId を含む通知のリスト
         
-        # 認証エラーの場合
-        if status_code in (401, 403):
-            return jsonify({
-                'success': False,
-                'error': 'Authentication failed. Please reauthenticate with Fitbit.'
-            }), status_code
+    戻り値:
+        204: 受け付けた場合
+        404: X-Fitbit-Signature の署名が正しくない場合（Fitbitの推奨どおり404を返す）
+    """
+    body = request.get_data()
+    if not verify_signature(body, request.headers.get('X-Fitbit-Signature'), current_app.config['FITBIT_CLIENT_SECRET']):
+        return '', 404
+    
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid JSON'}), 400
+    
+    enqueue_notified_days(parse_notifications(payload))
+    return '', 204
+
+# Webhook購読の登録・解除エンドポイント
+@fitbit_api.route('/subscription', methods=['GET'])
+def subscription_status():
+    """
+    体重データの更新通知の購読状態を取得するエンドポイント
+    
+    戻り値:
+        JSON: 購読（未購読ならnull）
+    """
+    subscription = FitbitSubscription.query.filter_by(user_id=current_user_id()).first()
+    return jsonify({'success': True, 'subscription': subscription.to_dict() if subscription else None})
+
+@fitbit_api.route('/subscription', methods=['POST'])
+def create_subscription():
+    """
+    体重データの更新通知を購読するエンドポイント
+    
+    戻り値:
+        JSON: 購読
+    """
+    try:
+        subscription = subscribe_user(current_user_id())
+    except PermissionError as e:
+        return jsonify({'success': False, 'error': str(e)}), 401
+    except requests.exceptions.RequestException as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': f'Fitbit subscription failed: {e}'}), 502
+    return jsonify({'success': True, 'subscription': subscription.to_dict()}), 201
+
+@fitbit_api.route('/subscription', methods=['DELETE'])
+def delete_subscription():
+    """
+    体重データの更新通知の購読を解除するエンドポイント
+    
+    戻り値:
+        JSON: 処理結果
+    """
+    try:
+        if not unsubscribe_user(current_user_id()):
+            return jsonify({'success': False, 'error': 'Not subscribed'}), 404
+    except PermissionError as e:
+        return jsonify({'success': False, 'error': str(e)}), 401
+    except requests.exceptions.RequestException as e:
+        return jsonify({'success': False, 'error': f'Fitbit unsubscription failed: {e}'}), 502
+    return jsonify({'success': True})
+
+# 過去データ取り込み（バックフィル）エンドポイント
+@fitbit_api.route('/weight/backfill', methods=['POST'])
+def backfill_weight():
+    """
+    指定期間の体重データをAPIの上限日数ごとに分割して取り込むジョブを登録するエンドポイント
+    
+    取り込みはバックグラウンドワーカーが行う。
+    同じ期間の未完了ジョブがある場合はチェックポイントから再開する。
+    
+    リクエスト:
+        JSON: from_date (YYYY-MM-DD), to_date (YYYY-MM-DD、オプション。デフォルトは今日)
         
+    戻り値:
+        JSON: バックフィルの進捗
+    """
+    data = request.json or {}
+    user_id = current_user_id()
+    
+    if 'from_date' not in data:
+        return jsonify({'success': False, 'error': 'from_date is required'}), 400
+    
+    try:
+        from_date = datetime.strptime(data['from_date'], '%Y-%m-%d').date()
+        to_date = datetime.strptime(data['to_date'], '%Y-%m-%d').date() if data.get('to_date') else datetime.now().date()
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    if from_date > to_date:
+        return jsonify({'success': False, 'error': 'from_date must be before to_date'}), 400
+    
+    if not FitbitAuth.query.filter_by(user_id=user_id).first():
         return jsonify({
             'success': False,
-            'error': f'Error fetching weight data: {error_message}'
-        }), status_code
+            'error': 'Not authenticated with Fitbit'
+        }), 401
+    
+    # チェックポイントを作成し、取り込みはバックグラウンドワーカーで実行
+    record = start_backfill(user_id, from_date, to_date)
+    job = enqueue_sync(user_id, kind='backfill')
+    
+    return jsonify({
+        'success': True,
+        'backfill': record.to_dict(),
+        'job': job.to_dict()
+    }), 202
+
+@fitbit_api.route('/weight/backfill', methods=['GET'])
+def backfill_status():
+    """
+    バックフィルの進捗を取得するエンドポイント
+    
+    戻り値:
+        JSON: バックフィルの進捗
+    """
+    user_id = current_user_id()
+    
+    record = FitbitBackfill.query.filter_by(user_id=user_id).first()
+    if not record:
+        return jsonify({'success': False, 'error': 'No backfill found'}), 404
+    
+    return jsonify({'success': True, 'backfill': record.to_dict()})
+
+# Fitbit API呼び出しの計測値エンドポイント
+@fitbit_api.route('/client/metrics', methods=['GET'])
+def client_metrics():
+    """
+    Fitbit API呼び出しのレイテンシ・リトライ・スロットリングの計測値を取得するエンドポイント
+    
+    戻り値:
+        JSON: 計測値
+    """
+    return jsonify(get_fitbit_client().metrics.snapshot())
 
 # データ分析エンドポイント
 @fitbit_api.route('/weight/analysis', methods=['GET'])
+@conditional_get(cache_control=SHORT_LIVED)
 def analyze_weight():
     """
     体重データの分析を行うエンドポイント
@@ -358,52 +548,34 @@ def analyze_weight():
     クエリパラメータ:
         from_date (str): 開始日 (YYYY-MM-DD)
         to_date (str): 終了日 (YYYY-MM-DD)
+        metrics (str): 追加で計算する指標のカンマ区切り（trend, rolling, weekly, monthly, all）
         
     戻り値:
         JSON: 分析結果
     """
     # 期間指定（デフォルトは過去30日）
-    today = datetime.now().strftime('%Y-%m-%d')
-    from_date = request.args.get('from_date', (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'))
-    to_date = request.args.get('to_date', today)
+    try:
+        from_date, to_date = parse_date_range(request.args)
+        metrics = parse_metrics(request.args.get('metrics'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
     # ユーザーIDを取得（本番環境では認証システムと連携）
-    user_id = 'default_user'
+    user_id = current_user_id()
     
-    # データベースから体重データを取得
-    weight_data = FitbitWeight.query.filter(
-        FitbitWeight.user_id == user_id,
-        FitbitWeight.date >= from_date,
-        FitbitWeight.date <= to_date
-    ).order_by(FitbitWeight.date, FitbitWeight.time).all()
+    # 日次集計を列のみで読み込んで分析（記録数ではなく日数に比例するコスト）
+    series = load_daily_series(user_id, from_date, to_date)
     
-    if not weight_data:
+    if not len(series):
         return jsonify({
             'success': False,
             'error': 'No weight data available for the specified period'
         }), 404
     
-    # 分析データの準備
-    weights = [entry.weight for entry in weight_data if entry.weight]
-    dates = [entry.date.isoformat() for entry in weight_data]
-    
-    # 基本的な統計データ
-    analysis = {
-        'count': len(weights),
-        'min_weight': min(weights) if weights else None,
-        'max_weight': max(weights) if weights else None,
-        'avg_weight': sum(weights) / len(weights) if weights else None,
-        'start_weight': weights[0] if weights else None,
-        'end_weight': weights[-1] if weights else None,
-        'change': weights[-1] - weights[0] if len(weights) > 1 else 0,
-        'period': {
-            'from_date': from_date,
-            'to_date': to_date
-        },
-        'chart_data': [
-            {'date': date, 'weight': weight}
-            for date, weight in zip(dates, weights)
-        ]
+    analysis = analyze_series(series, metrics)
+    analysis['period'] = {
+        'from_date': from_date.isoformat(),
+        'to_date': to_date.isoformat()
     }
     
     return jsonify({
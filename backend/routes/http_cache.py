@@ -0,0 +1,115 @@
+"""
+読み取り系エンドポイントのHTTPキャッシュ（ETagと条件付きGET）とサーバー側の結果キャッシュ
+
+ETagはデータバージョンの対象（ユーザー）・データバージョン・パス・クエリパラメータ・当日の日付から作成する
+（日数や予測など当日の日付に依存する値があるため、日付が変わればETagも変わる）。
+If-None-Match が一致した場合はビュー関数を呼ばずに 304 を返す。
+結果キャッシュも同じ値をキーにするため、書き込みがあれば古い結果は使われない。
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import Response, request, make_response
+from services import get_data_version, get_result_cache
+from .auth import current_user_id
+
+# Cache-Control のポリシー
+# ユーザーが編集するデータは毎回再検証（条件付きGETなので変更がなければ本文は送らない）
+REVALIDATE = 'private, no-cache'
+# 同期でのみ変わる分析データは短時間ブラウザにキャッシュさせる
+SHORT_LIVED = 'private, max-age=60, must-revalidate'
+
+def _request_version(scope):
+    """リクエスト中のデータバージョン（同じリクエスト内では1回だけ取得する）"""
+    versions = request.environ.setdefault('weight_goal.data_versions', {})
+    if scope not in versions:
+        versions[scope] = get_data_version(scope)
+    return versions[scope]
+
+def _resolve_scope(scope):
+    """データバージョンの対象（Noneならリクエストのユーザー）"""
+    return current_user_id() if scope is None else scope
+
+def compute_etag(version, scope=''):
+    """
+    データバージョンとリクエストからETagを作成
+    
+    同じパスでもユーザーごとに内容が異なるため、対象もETagに含める。
+    
+    引数:
+        version (int): データバージョン
+        scope (str): データバージョンの対象
+        
+    戻り値:
+        str: ETag（引用符なし）
+    """
+    args = '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True)))
+    source = f'{scope}|{version}|{request.path}|{args}|{datetime.now().date().isoformat()}'
+    return f'v{version}-{hashlib.sha1(source.encode()).hexdigest()[:16]}'
+
+def conditional_get(scope=None, cache_control=REVALIDATE):
+    """
+    ETagによる条件付きGETに対応させるデコレーター
+    
+    引数:
+        scope (str): データバージョンの対象（Noneならリクエストのユーザー）
+        cache_control (str): 成功時と304応答の Cache-Control ヘッダー
+        
+    戻り値:
+        function: デコレーター
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            resolved = _resolve_scope(scope)
+            etag = compute_etag(_request_version(resolved), resolved)
+            
+            # 変更がなければビュー関数（重い計算）を呼ばずに返す
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
+
+def cached_response(scope=None):
+    """
+    成功した応答をサーバー側の結果キャッシュに保存するデコレーター
+    
+    キーはユーザー・データバージョン・パス・クエリパラメータ・当日の日付から作成する。
+    
+    引数:
+        scope (str): データバージョンの対象（Noneならリクエストのユーザー）
+        
+    戻り値:
+        function: デコレーター
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_result_cache()
+            if cache is None:
+                return view(*args, **kwargs)
+            
+            resolved = _resolve_scope(scope)
+            key = f'{resolved}:{compute_etag(_request_version(resolved), resolved)}'
+            cached = cache.get(key)
+            if cached is not None:
+                mimetype, _, body = cached.partition(b'\n')
+                response = Response(body, mimetype=mimetype.decode())
+                response.headers['X-Result-Cache'] = 'hit'
+                return response
+            
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                cache.set(key, resolved, response.mimetype.encode() + b'\n' + response.get_data())
+                response.headers['X-Result-Cache'] = 'miss'
+            return response
+        return wrapper
+    return decorator
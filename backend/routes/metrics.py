@@ -0,0 +1,46 @@
+"""
+計測値（Prometheusのテキスト形式）のエンドポイントとプロファイリングの認可
+
+METRICS_TOKEN を設定した場合は Authorization: Bearer <METRICS_TOKEN> を必須にする。
+本番環境（METRICS_REQUIRE_TOKEN）では METRICS_TOKEN が未設定なら /metrics を公開しない。
+"""
+import hmac
+from flask import Blueprint, Response, current_app, jsonify, request
+from services import render_prometheus
+from .auth import authenticated_user_id
+
+metrics_api = Blueprint('metrics_api', __name__)
+
+def metrics_token_matches():
+    """リクエストの Authorization ヘッダーが METRICS_TOKEN と一致するか（未設定ならFalse）"""
+    token = current_app.config.get('METRICS_TOKEN')
+    return bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+def profiling_allowed():
+    """
+    ?profile= によるリクエストのプロファイリングを許可するか
+    
+    戻り値:
+        bool: METRICS_TOKEN が一致するか、セッションまたはAPIトークンで認証されている場合True
+    """
+    return metrics_token_matches() or authenticated_user_id() is not None
+
+@metrics_api.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    リクエスト・SQLクエリ・Fitbit API呼び出し・キャッシュの計測値を取得するエンドポイント
+    
+    戻り値:
+        text/plain: Prometheusのテキスト形式の計測値
+    """
+    config = current_app.config
+    if not config['METRICS_ENABLED']:
+        return jsonify({'error': 'Not found'}), 404
+    if config['METRICS_REQUIRE_TOKEN'] and not config.get('METRICS_TOKEN'):
+        # トークンの設定漏れで計測値を公開しない
+        return jsonify({'error': 'Not found'}), 404
+    
+    if config.get('METRICS_TOKEN') and not metrics_token_matches():
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
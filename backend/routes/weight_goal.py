@@ -1,10 +1,22 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, current_app
 from datetime import datetime, timedelta
-from models import db, WeightGoal, FitbitWeight
+from models import db, WeightGoal, FitbitWeight, FitbitWeightDaily
 from sqlalchemy import func
+import numpy as np
+from services import (
+    parse_wire_format, columnar_payload, pack_binary, BINARY_MIMETYPE, get_result_cache,
+    load_daily_series, project_weights, PROJECTION_MODELS,
+    DAILY_WEIGHT_POLICIES, projected_completion_date, evaluate_user_goals
+)
+from .auth import current_user_id
+from .http_cache import conditional_get, cached_response
 
 weight_goal_api = Blueprint('weight_goal_api', __name__)
 
+# 予測日数と予測に使用する日数の上限
+MAX_PROJECTION_DAYS = 3650
+MAX_PROJECTION_LOOKBACK_DAYS = 730
+
 @weight_goal_api.route('/goal', methods=['POST'])
 def create_goal():
     """
@@ -18,7 +30,7 @@ def create_goal():
     """
     try:
         data = request.json
-        user_id = 'default_user'  # 本番環境では認証システムと連携
+        user_id = current_user_id()
         
         # 必須フィールドの検証
         if 'target_weight' not in data or 'target_date' not in data:
@@ -31,8 +43,8 @@ def create_goal():
             return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
             
         # 開始体重の取得（最新の体重データ）
-        latest_weight = FitbitWeight.query.filter_by(user_id=user_id).order_by(FitbitWeight.date.desc()).first()
-        start_weight = latest_weight.weight if latest_weight else data.get('start_weight')
+        latest_weight = FitbitWeight.latest_weight(user_id)
+        start_weight = latest_weight if latest_weight is not None else data.get('start_weight')
         
         if not start_weight:
             return jsonify({'error': 'No weight data available and no start_weight provided'}), 400
@@ -50,12 +62,13 @@ def create_goal():
         db.session.add(new_goal)
         db.session.commit()
         
-        return jsonify(new_goal.to_dict()), 201
+        return jsonify(new_goal.to_dict(latest_weight)), 201
         
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @weight_goal_api.route('/goal', methods=['GET'])
+@conditional_get()
 def get_goals():
     """
     ユーザーの体重目標を取得するエンドポイント
@@ -67,7 +80,7 @@ def get_goals():
         JSON: 目標のリスト
     """
     try:
-        user_id = 'default_user'  # 本番環境では認証システムと連携
+        user_id = current_user_id()
         active_only = request.args.get('active_only', 'false').lower() == 'true'
         
         # クエリを構築
@@ -79,12 +92,61 @@ def get_goals():
         # 結果を取得
         goals = query.order_by(WeightGoal.target_date).all()
         
-        return jsonify([goal.to_dict() for goal in goals])
+        # 最新の体重はリクエストごとに一度だけ取得し、全目標の進捗計算で共有
+        current_weight = FitbitWeight.latest_weight(user_id) if goals else None
+        
+        return jsonify([goal.to_dict(current_weight) for goal in goals])
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@weight_goal_api.route('/goal/evaluation', methods=['GET'])
+@conditional_get()
+@cached_response()
+def get_goal_evaluations():
+    """
+    ユーザーのすべての目標の進捗・差分の要約・予測をまとめて取得するエンドポイント
+    
+    日次集計と最新体重の読み込みは目標の数によらず1回だけ行う。
+    
+    クエリパラメータ:
+        active_only (bool): trueの場合、達成済みでない目標のみを評価
+        model (str): 予測モデル（デフォルトは WEIGHT_PROJECTION_MODEL）
+        lookback (int): 予測に使用する直近の日数（デフォルトは WEIGHT_PROJECTION_LOOKBACK_DAYS）
+        daily_policy (str): 1日に複数の記録がある場合の集約方法（first, last, mean。デフォルト: first）
+        
+    戻り値:
+        JSON: 目標ごとの評価結果のリスト
+    """
+    try:
+        user_id = current_user_id()
+        active_only = request.args.get('active_only', 'false').lower() == 'true'
+        model = request.args.get('model', current_app.config['WEIGHT_PROJECTION_MODEL']).lower()
+        daily_policy = request.args.get('daily_policy', 'first').lower()
+        try:
+            lookback = int(request.args.get('lookback', current_app.config['WEIGHT_PROJECTION_LOOKBACK_DAYS']))
+        except ValueError:
+            return jsonify({'error': 'lookback must be an integer'}), 400
+        
+        if model not in PROJECTION_MODELS:
+            return jsonify({'error': f'Invalid model. Use one of: {", ".join(PROJECTION_MODELS)}'}), 400
+        if not 2 <= lookback <= MAX_PROJECTION_LOOKBACK_DAYS:
+            return jsonify({'error': f'lookback must be between 2 and {MAX_PROJECTION_LOOKBACK_DAYS}'}), 400
+        if daily_policy not in DAILY_WEIGHT_POLICIES:
+            return jsonify({'error': f'Invalid daily_policy. Use one of: {", ".join(DAILY_WEIGHT_POLICIES)}'}), 400
+        
+        query = WeightGoal.query.filter_by(user_id=user_id)
+        if active_only:
+            query = query.filter_by(is_achieved=False)
+        goals = query.order_by(WeightGoal.target_date).all()
+        
+        return jsonify(evaluate_user_goals(user_id, goals, model=model, lookback=lookback, policy=daily_policy))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @weight_goal_api.route('/goal/<int:goal_id>', methods=['GET'])
+@conditional_get()
 def get_goal(goal_id):
     """
     特定の体重目標を取得するエンドポイント
@@ -96,7 +158,7 @@ def get_goal(goal_id):
         JSON: 指定されたIDの目標
     """
     try:
-        user_id = 'default_user'  # 本番環境では認証システムと連携
+        user_id = current_user_id()
         goal = WeightGoal.query.filter_by(id=goal_id, user_id=user_id).first_or_404()
         
         return jsonify(goal.to_dict())
@@ -119,7 +181,7 @@ def update_goal(goal_id):
         JSON: 更新された目標
     """
     try:
-        user_id = 'default_user'  # 本番環境では認証システムと連携
+        user_id = current_user_id()
         goal = WeightGoal.query.filter_by(id=goal_id, user_id=user_id).first_or_404()
         data = request.json
         
@@ -157,7 +219,7 @@ def delete_goal(goal_id):
         JSON: 削除の成功メッセージ
     """
     try:
-        user_id = 'default_user'  # 本番環境では認証システムと連携
+        user_id = current_user_id()
         goal = WeightGoal.query.filter_by(id=goal_id, user_id=user_id).first_or_404()
         
         db.session.delete(goal)
@@ -169,19 +231,33 @@ def delete_goal(goal_id):
         return jsonify({'error': str(e)}), 400
 
 @weight_goal_api.route('/weight/diff', methods=['GET'])
+@conditional_get()
+@cached_response()
 def get_weight_diff():
     """
     実測値と目標の差分を取得するエンドポイント
     
     クエリパラメータ:
         goal_id (int): 目標のID（指定しない場合はアクティブな目標を使用）
+        daily_policy (str): 1日に複数の記録がある場合の集約方法（first, last, mean。デフォルト: first）
+        format (str): daily_weight_diffs の形式（json, columnar, binary。binary は日ごとの列のみを返す）
+        delta (bool): format=columnar/binary で差分エンコードする場合 true
     
     戻り値:
-        JSON: 差分データ
+        JSON: 差分データ（format=binary の場合はバイナリ）
     """
     try:
-        user_id = 'default_user'  # 本番環境では認証システムと連携
+        user_id = current_user_id()
         goal_id = request.args.get('goal_id')
+        daily_policy = request.args.get('daily_policy', 'first').lower()
+        
+        if daily_policy not in DAILY_WEIGHT_POLICIES:
+            return jsonify({'error': f'Invalid daily_policy. Use one of: {", ".join(DAILY_WEIGHT_POLICIES)}'}), 400
+        
+        try:
+            wire_format, delta = parse_wire_format(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # 目標の取得
         if goal_id:
@@ -200,12 +276,15 @@ def get_weight_diff():
         start_date = goal.start_date
         target_date = goal.target_date
         
-        # 期間内の体重データを取得
-        weights = FitbitWeight.query.filter(
-            FitbitWeight.user_id == user_id,
-            FitbitWeight.date >= start_date,
-            FitbitWeight.date <= datetime.now().date()
-        ).order_by(FitbitWeight.date).all()
+        # 期間内の日次集計を取得（記録数ではなく日数に比例するコスト）
+        daily_rollups = FitbitWeightDaily.query.filter(
+            FitbitWeightDaily.user_id == user_id,
+            FitbitWeightDaily.date >= start_date,
+            FitbitWeightDaily.date <= datetime.now().date()
+        ).order_by(FitbitWeightDaily.date).all()
+        
+        # 日付ごとの実測値インデックスを1パスで構築
+        daily_weights = _build_daily_weight_index(daily_rollups, daily_policy)
         
         # 目標達成のための毎日の理想体重変化
         if target_date <= start_date:
@@ -216,49 +295,26 @@ def get_weight_diff():
             daily_target_change = total_change / total_days if total_days > 0 else 0
         
         # 理想の体重推移と実際の体重を比較
-        weight_diffs = []
-        current_date = start_date
         end_date = min(datetime.now().date(), target_date)
-        
-        # 日付ごとのループ
-        while current_date <= end_date:
-            # 目標体重を計算
-            days_since_start = (current_date - start_date).days
-            target_weight_for_day = goal.start_weight + (daily_target_change * days_since_start)
-            
-            # 実際の体重データを検索
-            actual_weight = next(
-                (w.weight for w in weights if w.date == current_date), 
-                None
-            )
-            
-            # 差分を計算
-            if actual_weight is not None:
-                diff = actual_weight - target_weight_for_day
-            else:
-                diff = None
-                
-            weight_diffs.append({
-                'date': current_date.isoformat(),
-                'target_weight': round(target_weight_for_day, 1),
-                'actual_weight': actual_weight,
-                'difference': round(diff, 1) if diff is not None else None
-            })
-            
-            current_date += timedelta(days=1)
+        if wire_format == 'json':
+            weight_diffs = _daily_weight_diffs(goal, daily_weights, daily_target_change, end_date)
+        else:
+            dates, columns = _daily_weight_diff_columns(goal, daily_weights, daily_target_change, end_date)
+            if wire_format == 'binary':
+                return Response(pack_binary(dates, columns, delta), mimetype=BINARY_MIMETYPE)
+            weight_diffs = columnar_payload(dates, columns, delta, decimals=1)
         
         # 現在の進行状況
-        latest_weight = FitbitWeight.query.filter_by(user_id=user_id).order_by(FitbitWeight.date.desc()).first()
-        current_weight = latest_weight.weight if latest_weight else None
+        current_weight = FitbitWeight.latest_weight(user_id)
         
         # レスポンスデータの構築
         response = {
-            'goal': goal.to_dict(),
+            'goal': goal.to_dict(current_weight),
             'current_weight': current_weight,
             'weight_to_lose': round(current_weight - goal.target_weight, 1) if current_weight else None,
             'days_remaining': (target_date - datetime.now().date()).days,
             'daily_weight_diffs': weight_diffs,
-            'avg_actual_change_per_day': _calculate_avg_change(weights) if weights else None
+            'avg_actual_change_per_day': _calculate_daily_avg_change(daily_rollups) if daily_rollups else None
         }
         
         return jsonify(response)
@@ -267,21 +323,37 @@ def get_weight_diff():
         return jsonify({'error': str(e)}), 400
 
 @weight_goal_api.route('/weight/projection', methods=['GET'])
+@conditional_get()
+@cached_response()
 def get_weight_projection():
     """
     現在の進捗から将来の体重を予測するエンドポイント
     
     クエリパラメータ:
         goal_id (int): 目標のID（指定しない場合はアクティブな目標を使用）
-        days (int): 予測したい将来の日数（デフォルト: 30）
+        days (int): 予測したい将来の日数（デフォルト: 30、最大: MAX_PROJECTION_DAYS）
+        model (str): 予測モデル（average, linear, theil_sen, ewma, holt。デフォルトは WEIGHT_PROJECTION_MODEL）
+        lookback (int): 予測に使用する直近の日数（デフォルトは WEIGHT_PROJECTION_LOOKBACK_DAYS）
     
     戻り値:
         JSON: 予測データ
     """
     try:
-        user_id = 'default_user'  # 本番環境では認証システムと連携
+        user_id = current_user_id()
         goal_id = request.args.get('goal_id')
-        days = int(request.args.get('days', 30))
+        model = request.args.get('model', current_app.config['WEIGHT_PROJECTION_MODEL']).lower()
+        try:
+            days = int(request.args.get('days', 30))
+            lookback = int(request.args.get('lookback', current_app.config['WEIGHT_PROJECTION_LOOKBACK_DAYS']))
+        except ValueError:
+            return jsonify({'error': 'days and lookback must be integers'}), 400
+        
+        if model not in PROJECTION_MODELS:
+            return jsonify({'error': f'Invalid model. Use one of: {", ".join(PROJECTION_MODELS)}'}), 400
+        if not 1 <= days <= MAX_PROJECTION_DAYS:
+            return jsonify({'error': f'days must be between 1 and {MAX_PROJECTION_DAYS}'}), 400
+        if not 2 <= lookback <= MAX_PROJECTION_LOOKBACK_DAYS:
+            return jsonify({'error': f'lookback must be between 2 and {MAX_PROJECTION_LOOKBACK_DAYS}'}), 400
         
         # 目標の取得
         if goal_id:
@@ -296,22 +368,18 @@ def get_weight_projection():
             if not goal:
                 return jsonify({'error': 'No active goal found'}), 404
         
-        # 過去7日間の体重データを取得して平均変化率を計算
-        one_week_ago = datetime.now().date() - timedelta(days=7)
-        recent_weights = FitbitWeight.query.filter(
-            FitbitWeight.user_id == user_id,
-            FitbitWeight.date >= one_week_ago
-        ).order_by(FitbitWeight.date).all()
-        
-        # 最新の体重データを取得
-        latest_weight_record = FitbitWeight.query.filter_by(user_id=user_id).order_by(FitbitWeight.date.desc()).first()
-        latest_weight = latest_weight_record.weight if latest_weight_record else goal.start_weight
-        
         # 今日の日付
         today = datetime.now().date()
         
+        # 直近の日次集計を取得
+        series = load_daily_series(user_id, today - timedelta(days=lookback), today)
+        
+        # 最新の体重データを取得
+        measured_weight = FitbitWeight.latest_weight(user_id)
+        latest_weight = measured_weight if measured_weight is not None else goal.start_weight
+        
         # データが不十分な場合はデフォルト値を使用
-        if len(recent_weights) < 2:
+        if len(series) < 2:
             # 十分なデータがない場合は、理想的な予測を返す（目標に向かって直線）
             total_days = (goal.target_date - today).days
             if total_days <= 0:
@@ -321,58 +389,35 @@ def get_weight_projection():
                 weight_to_change = goal.target_weight - latest_weight
                 avg_change_per_day = weight_to_change / total_days
             
-            # 予測データを生成
-            projections = []
-            current_weight = latest_weight
-            
-            for i in range(1, days + 1):
-                projection_date = today + timedelta(days=i)
-                current_weight += avg_change_per_day
-                
-                projections.append({
-                    'date': projection_date.isoformat(),
-                    'projected_weight': round(current_weight, 1)
-                })
+            offsets = np.arange(1, days + 1)
+            projections = _projection_points(today, offsets, latest_weight + avg_change_per_day * offsets)
             
             return jsonify({
-                'goal': goal.to_dict(),
+                'goal': goal.to_dict(measured_weight),
                 'latest_weight': latest_weight,
+                'model': None,
                 'avg_change_per_day': avg_change_per_day,
                 'projected_completion_date': goal.target_date.isoformat(),
                 'weight_projections': projections,
                 'insufficient_data': True
             })
         
-        # 十分なデータがある場合は実際の変化率を計算
-        avg_change_per_day = _calculate_avg_change(recent_weights)
-        
-        # 予測データを生成
-        projections = []
-        current_weight = latest_weight
-        
-        for i in range(1, days + 1):
-            projection_date = today + timedelta(days=i)
-            current_weight += avg_change_per_day
-            
-            projections.append({
-                'date': projection_date.isoformat(),
-                'projected_weight': round(current_weight, 1)
-            })
+        # 十分なデータがある場合はモデルで傾向を推定し、予測期間全体を一度に生成
+        projection = project_weights(series, today, days, model)
+        avg_change_per_day = projection.slope
+        projections = _projection_points(today, projection.offsets, projection.mean, projection.lower, projection.upper)
         
         # 予測達成日の計算
-        if (goal.target_weight > goal.start_weight and avg_change_per_day > 0) or \
-           (goal.target_weight < goal.start_weight and avg_change_per_day < 0):
-            weight_to_change = goal.target_weight - latest_weight
-            days_to_goal = abs(weight_to_change / avg_change_per_day) if avg_change_per_day != 0 else float('inf')
-            projected_completion_date = today + timedelta(days=round(days_to_goal))
-        else:
-            projected_completion_date = None
+        completion_date = projected_completion_date(goal, projection, today)
         
         return jsonify({
-            'goal': goal.to_dict(),
+            'goal': goal.to_dict(measured_weight),
             'latest_weight': latest_weight,
+            'model': model,
+            'lookback_days': lookback,
+            'estimated_weight': round(projection.level, 2),
             'avg_change_per_day': avg_change_per_day,
-            'projected_completion_date': projected_completion_date.isoformat() if projected_completion_date else None,
+            'projected_completion_date': completion_date.isoformat() if completion_date else None,
             'weight_projections': projections,
             'insufficient_data': False
         })
@@ -381,27 +426,147 @@ def get_weight_projection():
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e), 'trace': traceback.format_exc()}), 400
+
+def _projection_points(today, offsets, mean, lower=None, upper=None):
+    """
+    予測の配列を日付ごとの辞書のリストに変換
     
-def _calculate_avg_change(weights):
+    引数:
+        today (date): 基準日
+        offsets (ndarray): 基準日からの日数
+        mean (ndarray): 予測体重
+        lower (ndarray): 信頼区間の下限（オプション）
+        upper (ndarray): 信頼区間の上限（オプション）
+        
+    戻り値:
+        list: date, projected_weight（信頼区間がある場合は lower, upper も）を含む辞書のリスト
     """
-    体重変化の1日あたりの平均変化率を計算
+    dates = np.datetime_as_string(np.datetime64(today, 'D') + offsets).tolist()
+    columns = {'date': dates, 'projected_weight': np.round(mean, 1).tolist()}
+    if lower is not None:
+        columns['lower'] = np.round(lower, 1).tolist()
+        columns['upper'] = np.round(upper, 1).tolist()
+    keys = list(columns)
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
+def _daily_weight_diffs(goal, daily_weights, daily_target_change, end_date):
+    """
+    開始日から end_date までの日ごとの目標体重と実測値の差分を計算
     
     引数:
-        weights (list): 体重データのリスト
+        goal (WeightGoal): 体重目標
+        daily_weights (dict): 日付 -> 実測値 の辞書
+        daily_target_change (float): 1日あたりの目標変化量
+        end_date (date): 最終日
         
     戻り値:
-        float: 1日あたりの平均変化率
+        list: date, target_weight, actual_weight, difference を含む辞書のリスト
     """
-    if len(weights) < 2:
-        return 0
+    weight_diffs = []
+    current_date = goal.start_date
+    
+    # 日付ごとのループ
+    while current_date <= end_date:
+        # 目標体重を計算
+        days_since_start = (current_date - goal.start_date).days
+        target_weight_for_day = goal.start_weight + (daily_target_change * days_since_start)
+        
+        # 実際の体重データを検索
+        actual_weight = daily_weights.get(current_date)
+        
+        # 差分を計算
+        if actual_weight is not None:
+            diff = actual_weight - target_weight_for_day
+        else:
+            diff = None
+            
+        weight_diffs.append({
+            'date': current_date.isoformat(),
+            'target_weight': round(target_weight_for_day, 1),
+            'actual_weight': actual_weight,
+            'difference': round(diff, 1) if diff is not None else None
+        })
         
-    first_weight = weights[0]
-    last_weight = weights[-1]
+        current_date += timedelta(days=1)
+    
+    return weight_diffs
+
+def _daily_weight_diff_columns(goal, daily_weights, daily_target_change, end_date):
+    """
+    日ごとの目標体重と実測値の差分を列指向形式用の配列として計算
+    
+    戻り値:
+        tuple: (日付のリスト, 列名 -> 値の配列 の辞書。実測値がない日は NaN)
+    """
+    days = max((end_date - goal.start_date).days + 1, 0)
+    dates = [goal.start_date + timedelta(days=i) for i in range(days)]
+    target = goal.start_weight + daily_target_change * np.arange(days)
+    actual = np.array([daily_weights.get(day) for day in dates], dtype=np.float64)
+    return dates, {
+        'target_weight': target,
+        'actual_weight': actual,
+        'difference': actual - target
+    }
+
+def _calculate_daily_avg_change(daily_rollups):
+    """
+    日次集計から1日あたりの平均変化率を計算（最初の日の最初の記録から最後の日の最後の記録まで）
     
-    total_change = last_weight.weight - first_weight.weight
-    days = (last_weight.date - first_weight.date).days
+    引数:
+        daily_rollups (list): 日付順に並んだFitbitWeightDailyのリスト
+        
+    戻り値:
+        float: 1日あたりの平均変化率
+    """
+    first_day = daily_rollups[0]
+    last_day = daily_rollups[-1]
+    days = (last_day.date - first_day.date).days
     
     if days == 0:
         return 0
+    
+    return (last_day.last_weight - first_day.first_weight) / days
+
+def _build_daily_weight_index(daily_rollups, policy='first'):
+    """
+    日次集計から日付をキーとする実測値の辞書を構築
+    
+    引数:
+        daily_rollups (list): FitbitWeightDailyのリスト
+        policy (str): 同日に複数の記録がある場合の集約方法
+            first: その日の最初の記録
+            last: その日の最後の記録
+            mean: その日の記録の平均値
         
-    return total_change / days
\ No newline at end of file
+    戻り値:
+        dict: 日付 -> 体重 の辞書
+    """
+    if policy not in DAILY_WEIGHT_POLICIES:
+        raise ValueError(f'Unknown daily weight policy: {policy}')
+    
+    if policy == 'mean':
+        return {day.date: round(day.mean_weight, 2) for day in daily_rollups}
+    if policy == 'last':
+        return {day.date: day.last_weight for day in daily_rollups}
+    return {day.date: day.first_weight for day in daily_rollups}
+
+@weight_goal_api.route('/cache/metrics', methods=['GET'])
+def cache_metrics():
+    """
+    差分・予測の結果キャッシュのヒット・ミス・追い出しの件数を取得するエンドポイント
+    
+    戻り値:
+        JSON: 計測値（キャッシュが無効の場合は backend: none）
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return jsonify({'backend': 'none'})
+    
+    metrics = cache.stats.snapshot()
+    metrics.update({
+        'backend': cache.backend,
+        'entries': len(cache),
+        'max_entries': cache.max_entries,
+        'ttl': cache.ttl
+    })
+    return jsonify(metrics)
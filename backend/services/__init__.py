@@ -0,0 +1,67 @@
+from .fitbit_client import FitbitClient, RateLimitExceeded, get_fitbit_client, retry_after_seconds
+from .fitbit_sync import (
+    parse_weight_entry, upsert_weight_entries, get_sync_state, incremental_start_date, SyncPlan, plan_sync, apply_sync,
+    record_sync_failure, sync_user_weights
+)
+from .fitbit_async import AsyncFitbitClient, fetch_weight_logs_async, fetch_weight_logs_concurrently
+from .fitbit_tokens import TokenCache, get_token_cache, get_valid_token, refresh_access_token
+from .fitbit_subscriptions import (
+    SUBSCRIPTION_COLLECTION, verify_signature, is_subscribed, sync_stale_before, subscribe_user, unsubscribe_user,
+    parse_notifications, enqueue_notified_days
+)
+from .fitbit_backfill import split_date_range, start_backfill, run_backfill
+from .weight_rollup import (
+    mark_rollups_dirty, refresh_daily_rollups, rebuild_rollups, check_rollups, add_rollup_refresh_listener,
+    register_rollup_hooks
+)
+from .weight_analytics import ANALYSIS_METRICS, parse_metrics, load_daily_series, analyze_series
+from .weight_history import (
+    encode_cursor, decode_cursor, weight_history_query, fetch_weight_page,
+    iter_weight_dicts, stream_ndjson, stream_json_object
+)
+from .date_range import parse_date, parse_date_range
+from .dialect import dialect_name, upsert_insert
+from .wire_format import WIRE_FORMATS, BINARY_MIMETYPE, parse_wire_format, columnar_payload, pack_binary, unpack_binary
+from .data_version import DATA_SCOPE, mark_data_changed, get_data_version, add_data_change_listener, register_data_version_hooks
+from .result_cache import MemoryResultCache, SQLiteResultCache, create_result_cache, get_result_cache, register_result_cache_hooks
+from .weight_projection import PROJECTION_MODELS, Projection, project_weights
+from .goal_evaluation import (
+    DAILY_WEIGHT_POLICIES, projected_completion_date, evaluate_goal, evaluate_user_goals, evaluate_all_active_goals
+)
+from .goal_achievement import goal_reached, detect_achievements, register_goal_achievement_hooks
+from .sqlite_tuning import SQLITE_PRAGMA_NAMES, pragma_statements, apply_sqlite_pragmas, register_sqlite_pragmas
+from .instrumentation import (
+    RequestMetrics, get_request_metrics, register_instrumentation, render_prometheus
+)
+from .api_tokens import ApiTokenCache, get_api_token_cache, issue_api_token, revoke_api_tokens, authenticate_token
+from .sync_worker import (
+    SyncWorker, enqueue_sync, schedule_periodic_syncs, run_jobs_concurrently, run_pending_jobs, start_sync_worker
+)
+
+__all__ = [
+    'FitbitClient', 'RateLimitExceeded', 'get_fitbit_client', 'retry_after_seconds',
+    'parse_weight_entry', 'upsert_weight_entries', 'get_sync_state', 'incremental_start_date', 'SyncPlan', 'plan_sync',
+    'apply_sync', 'record_sync_failure', 'sync_user_weights',
+    'AsyncFitbitClient', 'fetch_weight_logs_async', 'fetch_weight_logs_concurrently',
+    'TokenCache', 'get_token_cache', 'get_valid_token', 'refresh_access_token',
+    'SUBSCRIPTION_COLLECTION', 'verify_signature', 'is_subscribed', 'sync_stale_before', 'subscribe_user',
+    'unsubscribe_user', 'parse_notifications', 'enqueue_notified_days',
+    'split_date_range', 'start_backfill', 'run_backfill',
+    'mark_rollups_dirty', 'refresh_daily_rollups', 'rebuild_rollups', 'check_rollups', 'add_rollup_refresh_listener',
+    'register_rollup_hooks',
+    'ANALYSIS_METRICS', 'parse_metrics', 'load_daily_series', 'analyze_series',
+    'encode_cursor', 'decode_cursor', 'weight_history_query', 'fetch_weight_page',
+    'iter_weight_dicts', 'stream_ndjson', 'stream_json_object',
+    'parse_date', 'parse_date_range', 'dialect_name', 'upsert_insert',
+    'WIRE_FORMATS', 'BINARY_MIMETYPE', 'parse_wire_format', 'columnar_payload', 'pack_binary', 'unpack_binary',
+    'DATA_SCOPE', 'mark_data_changed', 'get_data_version', 'add_data_change_listener', 'register_data_version_hooks',
+    'MemoryResultCache', 'SQLiteResultCache', 'create_result_cache', 'get_result_cache', 'register_result_cache_hooks',
+    'PROJECTION_MODELS', 'Projection', 'project_weights',
+    'DAILY_WEIGHT_POLICIES', 'projected_completion_date', 'evaluate_goal', 'evaluate_user_goals',
+    'evaluate_all_active_goals',
+    'goal_reached', 'detect_achievements', 'register_goal_achievement_hooks',
+    'SQLITE_PRAGMA_NAMES', 'pragma_statements', 'apply_sqlite_pragmas', 'register_sqlite_pragmas',
+    'RequestMetrics', 'get_request_metrics', 'register_instrumentation', 'render_prometheus',
+    'ApiTokenCache', 'get_api_token_cache', 'issue_api_token', 'revoke_api_tokens', 'authenticate_token',
+    'SyncWorker', 'enqueue_sync', 'schedule_periodic_syncs', 'run_jobs_concurrently', 'run_pending_jobs', 'start_sync_worker'
+]
@@ -0,0 +1,164 @@
+"""
+APIトークン（ベアラートークン）の発行・失効・検証
+
+検証結果はトークンのハッシュをキーにプロセス内へ一定時間キャッシュするため、
+同じトークンによる連続したリクエストではデータベースを参照しない。
+存在しないトークンも短時間キャッシュし、不正なトークンの連続送信による負荷を抑える。
+失効はこのプロセスのキャッシュに即時反映され、他のプロセスにはTTL経過後に反映される。
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, ApiToken
+from .result_cache import CacheStats
+
+# 存在しない・無効なトークンのキャッシュ値
+_INVALID = object()
+
+class ApiTokenCache:
+    """
+    トークンのハッシュからユーザーIDへのプロセス内キャッシュ（TTLとLRUによる上限付き）
+    """
+    
+    def __init__(self, ttl=60, max_entries=10000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+    
+    def get(self, token_hash):
+        """
+        キャッシュされた検証結果を取得
+        
+        引数:
+            token_hash (str): トークンのハッシュ
+        
+        戻り値:
+            str または None: ユーザーID（無効なトークンなら _INVALID、キャッシュになければNone）
+        """
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is None:
+                self.stats.incr('misses')
+                return None
+            user_id, expires_at, cached_until = entry
+            if cached_until <= self._clock() or (expires_at is not None and expires_at <= datetime.utcnow()):
+                del self._entries[token_hash]
+                self.stats.incr('expirations')
+                self.stats.incr('misses')
+                return None
+            self._entries.move_to_end(token_hash)
+            self.stats.incr('hits')
+            return user_id
+    
+    def put(self, token_hash, user_id, expires_at=None):
+        """検証結果を保存（user_id が _INVALID なら無効なトークンとして保存）"""
+        with self._lock:
+            self._entries[token_hash] = (user_id, expires_at, self._clock() + self.ttl)
+            self._entries.move_to_end(token_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.incr('evictions')
+    
+    def invalidate_user(self, user_id):
+        """ユーザーのトークンの検証結果をすべて破棄"""
+        with self._lock:
+            for token_hash in [key for key, entry in self._entries.items() if entry[0] == user_id]:
+                del self._entries[token_hash]
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+
+def get_api_token_cache():
+    """
+    アプリケーションで共有するAPIトークンキャッシュを取得
+    
+    戻り値:
+        ApiTokenCache: APIトークンキャッシュ
+    """
+    cache = current_app.extensions.get('api_token_cache')
+    if cache is None:
+        cache = ApiTokenCache(
+            ttl=current_app.config['AUTH_TOKEN_CACHE_TTL'],
+            max_entries=current_app.config['AUTH_TOKEN_CACHE_MAX_ENTRIES']
+        )
+        current_app.extensions['api_token_cache'] = cache
+    return cache
+
+def issue_api_token(user_id, name=None, expires_in=None):
+    """
+    APIトークンを発行（トークン自体は保存しないため、戻り値でのみ取得できる）
+    
+    引数:
+        user_id (str): トークンの所有ユーザー
+        name (str): トークンの名前・用途
+        expires_in (int): 有効期間（秒）。Noneなら無期限
+    
+    戻り値:
+        tuple: (トークン, ApiToken)
+    """
+    token = secrets.token_urlsafe(32)
+    record = ApiToken(
+        user_id=user_id,
+        token_hash=ApiToken.hash_token(token),
+        name=name,
+        expires_at=datetime.utcnow() + timedelta(seconds=expires_in) if expires_in else None
+    )
+    db.session.add(record)
+    db.session.commit()
+    return token, record
+
+def revoke_api_tokens(user_id, token_id=None):
+    """
+    ユーザーのAPIトークンを失効
+    
+    引数:
+        user_id (str): トークンの所有ユーザー
+        token_id (int): 失効させるトークンのID（Noneならユーザーの全トークン）
+    
+    戻り値:
+        int: 失効させたトークンの数
+    """
+    query = ApiToken.query.filter(ApiToken.user_id == user_id, ApiToken.revoked_at.is_(None))
+    if token_id is not None:
+        query = query.filter(ApiToken.id == token_id)
+    revoked = query.update({ApiToken.revoked_at: datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    get_api_token_cache().invalidate_user(user_id)
+    return revoked
+
+def authenticate_token(token):
+    """
+    ベアラートークンを検証し、所有ユーザーを取得
+    
+    引数:
+        token (str): ベアラートークン
+    
+    戻り値:
+        str または None: ユーザーID。無効なトークンならNone
+    """
+    if not token:
+        return None
+    
+    token_hash = ApiToken.hash_token(token)
+    cache = get_api_token_cache()
+    user_id = cache.get(token_hash)
+    if user_id is not None:
+        return None if user_id is _INVALID else user_id
+    
+    record = ApiToken.query.filter_by(token_hash=token_hash).first()
+    if record is None or not record.is_active():
+        cache.put(token_hash, _INVALID)
+        return None
+    
+    cache.put(token_hash, record.user_id, record.expires_at)
+    return record.user_id
@@ -0,0 +1,128 @@
+"""
+データバージョンの管理
+
+FitbitWeight・WeightGoal・Data への書き込みを検出し、コミット時に対象のバージョンを
+1つ増やす。読み取り系エンドポイントはバージョンからETagを作成し、
+変更がなければ重い計算をせずに 304 Not Modified を返す。
+"""
+from datetime import datetime
+from sqlalchemy import event, inspect, select, update, insert
+from sqlalchemy.orm import Session
+from models import db, Data, DataVersion, FitbitWeight, WeightGoal
+from .dialect import upsert_insert
+
+# Data（ユーザーに紐付かない共有データ）のバージョンの対象名
+DATA_SCOPE = 'data'
+
+# バージョンを増やす必要がある対象を保持するセッション情報のキー
+_PENDING_KEY = 'data_version_pending'
+
+# コミット待ちのバージョン更新済みの対象を保持するセッション情報のキー
+_COMMITTING_KEY = 'data_version_committing'
+
+# コミット後に変更された対象を通知する関数のリスト
+_listeners = []
+
+def add_data_change_listener(listener):
+    """
+    データ変更のコミット後に呼ばれる関数を登録（重複登録はしない）
+    
+    引数:
+        listener (callable): 変更された対象（ユーザー識別子または DATA_SCOPE）の集合を受け取る関数
+    """
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+def mark_data_changed(session, scope):
+    """
+    対象のデータが変更されたことをセッションに登録（コミット時にバージョンが増える）
+    
+    引数:
+        session (Session): データベースセッション
+        scope (str): ユーザー識別子または DATA_SCOPE
+    """
+    session.info.setdefault(_PENDING_KEY, set()).add(scope)
+
+def get_data_version(scope):
+    """
+    現在のバージョンを取得
+    
+    引数:
+        scope (str): ユーザー識別子または DATA_SCOPE
+        
+    戻り値:
+        int: バージョン番号（書き込みがまだない場合は0）
+    """
+    version = db.session.execute(
+        select(DataVersion.version).where(DataVersion.scope == scope)
+    ).scalar()
+    return version or 0
+
+def _bump_versions(session, scopes):
+    """対象ごとにバージョンを1つ増やす（行がなければ作成）"""
+    table = DataVersion.__table__
+    now = datetime.utcnow()
+    upsert = upsert_insert(session)
+    
+    for scope in sorted(scopes):
+        if upsert is not None:
+            session.execute(upsert(table).values(scope=scope, version=1, updated_at=now).on_conflict_do_update(
+                index_elements=[table.c.scope],
+                set_={'version': table.c.version + 1, 'updated_at': now}
+            ))
+            continue
+        
+        result = session.execute(
+            update(table).where(table.c.scope == scope).values(version=table.c.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            session.execute(insert(table).values(scope=scope, version=1, updated_at=now))
+
+def _scopes_for(obj):
+    """変更されたオブジェクトに対応するバージョンの対象"""
+    if isinstance(obj, Data):
+        return {DATA_SCOPE}
+    if isinstance(obj, (FitbitWeight, WeightGoal)):
+        history = inspect(obj).attrs.user_id.history
+        return {scope for scope in set(history.deleted or []) | {obj.user_id} if scope is not None}
+    return set()
+
+def _collect_changed_objects(session, flush_context):
+    """フラッシュされた変更からバージョンを増やす対象を登録"""
+    dirty = [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)]
+    for obj in list(session.new) + dirty + list(session.deleted):
+        for scope in _scopes_for(obj):
+            mark_data_changed(session, scope)
+
+def _commit_pending_versions(session):
+    """コミット直前に登録済みの対象のバージョンを増やす"""
+    session.flush()
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        _bump_versions(session, pending)
+        session.info.setdefault(_COMMITTING_KEY, set()).update(pending)
+
+def _notify_committed_versions(session):
+    """コミット後に変更された対象を通知"""
+    committed = session.info.pop(_COMMITTING_KEY, None)
+    if committed:
+        for listener in _listeners:
+            listener(committed)
+
+def _discard_pending_versions(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_COMMITTING_KEY, None)
+
+def register_data_version_hooks(session_class=Session):
+    """
+    セッションイベントにデータバージョン更新のフックを登録（重複登録はしない）
+    
+    引数:
+        session_class: イベントを登録するセッションクラス
+    """
+    if event.contains(session_class, 'after_flush', _collect_changed_objects):
+        return
+    event.listen(session_class, 'after_flush', _collect_changed_objects)
+    event.listen(session_class, 'before_commit', _commit_pending_versions)
+    event.listen(session_class, 'after_commit', _notify_committed_versions)
+    event.listen(session_class, 'after_rollback', _discard_pending_versions)
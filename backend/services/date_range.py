@@ -0,0 +1,48 @@
+"""
+リクエストパラメータの日付の解析
+
+日付は文字列のままクエリに渡さず、date 型に変換してから型付きのパラメータとして渡す
+（SQLite の文字列比較に依存せず、PostgreSQL でも同じ結果になるようにする）。
+"""
+from datetime import date, datetime, timedelta
+
+def parse_date(value, name='date'):
+    """
+    YYYY-MM-DD 形式の文字列を date に変換
+    
+    引数:
+        value (str): 日付文字列
+        name (str): エラーメッセージに使うパラメータ名
+        
+    戻り値:
+        date: 変換した日付
+        
+    例外:
+        ValueError: 形式が不正な場合
+    """
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'{name} must be a date in YYYY-MM-DD format') from e
+
+def parse_date_range(args, default_days=30, today=None):
+    """
+    クエリパラメータの from_date と to_date を解析
+    
+    引数:
+        args (MultiDict): クエリパラメータ
+        default_days (int): from_date を省略した場合に今日から遡る日数
+        today (date): 基準日（デフォルトは今日）
+        
+    戻り値:
+        tuple: (from_date, to_date)
+        
+    例外:
+        ValueError: 形式が不正な場合、または from_date が to_date より後の場合
+    """
+    today = today or date.today()
+    from_date = parse_date(args['from_date'], 'from_date') if args.get('from_date') else today - timedelta(days=default_days)
+    to_date = parse_date(args['to_date'], 'to_date') if args.get('to_date') else today
+    if from_date > to_date:
+        raise ValueError('from_date must be before to_date')
+    return from_date, to_date
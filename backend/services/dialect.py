@@ -0,0 +1,39 @@
+"""
+データベースの方言ごとの差異の吸収
+
+SQLite と PostgreSQL は INSERT ... ON CONFLICT に対応しているため、
+同時に書き込む複数ワーカー間でも一意制約の違反を起こさずにUPSERTできる。
+それ以外の方言では呼び出し側で通常のINSERT/UPDATEにフォールバックする。
+"""
+from sqlalchemy.dialects import sqlite, postgresql
+
+# ON CONFLICT に対応した方言ごとのINSERT
+_UPSERT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert
+}
+
+def dialect_name(executor):
+    """
+    セッションまたは接続の方言名を取得
+    
+    引数:
+        executor (Session または Connection): SQLの実行先
+        
+    戻り値:
+        str: sqlite, postgresql など
+    """
+    bind = executor.get_bind() if hasattr(executor, 'get_bind') else executor
+    return bind.dialect.name
+
+def upsert_insert(executor):
+    """
+    ON CONFLICT に対応したINSERTの構築関数を取得
+    
+    引数:
+        executor (Session または Connection): SQLの実行先
+        
+    戻り値:
+        callable または None: sqlite.insert / postgresql.insert（非対応の方言ではNone）
+    """
+    return _UPSERT_INSERTS.get(dialect_name(executor))
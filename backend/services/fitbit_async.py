@@ -0,0 +1,190 @@
+"""
+asyncio による Fitbit API の非同期呼び出し
+
+多数のユーザーの体重ログ取得を1つのイベントループで多重化する。
+HTTPは httpx.AsyncClient で行い、同時に実行するリクエスト数をセマフォで制限する。
+ユーザーごとのレート制限（トークンバケット）・リトライの判定と待機時間・計測値は同期版の FitbitClient と共有するため、
+どちらの経路の呼び出しも同じ上限と /api/fitbit/client/metrics に反映される。
+
+失敗は同期版と同じ requests の例外（RateLimitExceeded, HTTPError, ConnectionError, Timeout）として扱い、
+同期ジョブやバックフィルのエラー処理を共通にする。
+"""
+import asyncio
+import functools
+import time
+import httpx
+import requests
+from flask import current_app
+from .fitbit_client import bearer_headers, get_fitbit_client, raise_for_rate_limit, weight_log_path
+
+class AsyncFitbitClient:
+    """
+    Fitbit APIの非同期HTTPクライアント
+    
+    - 1つの httpx.AsyncClient の接続プールを共有し、同時実行数を max_concurrency に制限する
+    - レート制限の待機とリトライのバックオフは asyncio.sleep で行い、イベントループを止めない
+    - 429 と 5xx は同期版と同じジッター付き指数バックオフでリトライする
+    
+    イベントループごとに作成し、使用後は aclose() する（async with で使用できる）。
+    """
+    
+    def __init__(self, client, max_concurrency=50, transport=None, sleep=asyncio.sleep):
+        """
+        引数:
+            client (FitbitClient): 設定・レート制限・計測値を共有する同期版クライアント
+            max_concurrency (int): 同時に実行するリクエストの最大数
+            transport (httpx.AsyncBaseTransport): HTTPトランスポート（テストでは httpx.MockTransport を使用できる）
+            sleep (callable): 待機に使用するコルーチン関数
+        """
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self._sleep = sleep
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.http = httpx.AsyncClient(
+            base_url=client.base_url,
+            timeout=client.timeout,
+            verify=_ssl_context(),
+            transport=transport,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+        )
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+    
+    async def aclose(self):
+        """接続プールを閉じる"""
+        await self.http.aclose()
+    
+    async def request(self, method, url, user_key=None, retry_server_errors=None, **kwargs):
+        """
+        Fitbit APIを呼び出す
+        
+        レート制限・リトライの判定・計測は同期版の FitbitClient のものを使用し、
+        送信と待機だけを非同期で行う。
+        
+        引数:
+            method (str): HTTPメソッド
+            url (str): URL（/ で始まる場合はベースURLからの相対パス）
+            user_key (str): レート制限を適用するユーザーのキー（Noneなら適用しない）
+            retry_server_errors (bool): 5xx と通信エラーでリトライするか（デフォルトはGETのみ）
+            **kwargs: httpx に渡す引数
+        
+        戻り値:
+            httpx.Response: 最後に受信したレスポンス
+        
+        例外:
+            requests.exceptions.Timeout, requests.exceptions.ConnectionError: 通信エラーでリトライしない、または上限に達した場合
+        """
+        if retry_server_errors is None:
+            retry_server_errors = method.upper() == 'GET'
+        policy = self.client
+        
+        attempt = 0
+        while True:
+            if user_key is not None:
+                wait = policy.reserve_call(user_key)
+                if wait > 0:
+                    await self._sleep(wait)
+            
+            async with self._semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await self.http.request(method, url, **kwargs)
+                except httpx.TransportError as e:
+                    error = e
+                    response = None
+            
+            policy.record_response(user_key, response, started)
+            delay = policy.retry_delay(attempt, retry_server_errors, response)
+            if delay is None:
+                if response is None:
+                    raise _as_requests_error(error) from error
+                return response
+            
+            await self._sleep(delay)
+            attempt += 1
+    
+    async def get_weight_logs(self, access_token, start, end=None, user_key=None):
+        """
+        体重ログを取得
+        
+        引数:
+            access_token (str): アクセストークン
+            start (date または str): 開始日（end を省略した場合はその日のみ）
+            end (date または str): 終了日
+            user_key (str): レート制限を適用するユーザーのキー
+        
+        戻り値:
+            list: 体重ログのリスト
+        
+        例外:
+            RateLimitExceeded: レート制限に達した場合
+            requests.exceptions.RequestException: Fitbit APIの呼び出しに失敗した場合
+        """
+        response = await self.request('GET', weight_log_path(start, end), user_key=user_key,
+                                      headers=bearer_headers(access_token))
+        raise_for_rate_limit(response)
+        _raise_for_status(response)
+        return response.json().get('weight', [])
+
+@functools.lru_cache(maxsize=None)
+def _ssl_context():
+    """クライアントの作成ごとにCA証明書を読み込まないよう、プロセス内で共有するSSLコンテキスト"""
+    return httpx.create_ssl_context()
+
+def _as_requests_error(error):
+    """httpx の通信エラーを同期版と同じ requests の例外に変換"""
+    if isinstance(error, httpx.TimeoutException):
+        return requests.exceptions.Timeout(str(error))
+    return requests.exceptions.ConnectionError(str(error))
+
+def _raise_for_status(response):
+    """4xx・5xx のレスポンスを requests.exceptions.HTTPError として送出"""
+    if response.status_code >= 400:
+        raise requests.exceptions.HTTPError(
+            f'{response.status_code} Error: {response.reason_phrase} for url: {response.url}'
+        )
+
+async def fetch_weight_logs_async(fetches, max_concurrency=None, transport=None, pacing=None):
+    """
+    複数の体重ログ取得を1つのイベントループで同時に実行
+    
+    1件の失敗は他の取得を止めず、その件の結果として例外を返す。
+    
+    引数:
+        fetches (list): (キー, アクセストークン, 開始日, 終了日, ユーザーキー) のタプルのリスト（終了日がNoneなら1日分）
+        max_concurrency (int): 同時に実行するリクエストの最大数（デフォルトは FITBIT_ASYNC_CONCURRENCY）
+        transport (httpx.AsyncBaseTransport): HTTPトランスポート（デフォルトは app.extensions の
+            fitbit_async_transport。未設定なら通常のHTTP）
+        pacing (TokenBucket): ユーザーごとの制限に加えて適用する呼び出し間隔の制限（バックフィル用）
+    
+    戻り値:
+        dict: キーごとの体重ログのリスト、または失敗した場合の例外
+    """
+    max_concurrency = max_concurrency or current_app.config['FITBIT_ASYNC_CONCURRENCY']
+    transport = transport or current_app.extensions.get('fitbit_async_transport')
+    
+    async with AsyncFitbitClient(get_fitbit_client(), max_concurrency, transport=transport) as client:
+        async def fetch(key, access_token, start, end, user_key):
+            try:
+                if pacing is not None:
+                    wait = pacing.reserve()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                return key, await client.get_weight_logs(access_token, start, end, user_key=user_key)
+            except Exception as e:
+                return key, e
+        
+        return dict(await asyncio.gather(*(fetch(*item) for item in fetches)))
+
+def fetch_weight_logs_concurrently(fetches, **kwargs):
+    """
+    fetch_weight_logs_async() を新しいイベントループで実行
+    
+    同期ワーカーやCLIなど、イベントループの外から呼び出す。
+    引数と戻り値は fetch_weight_logs_async() と同じ。
+    """
+    return asyncio.run(fetch_weight_logs_async(fetches, **kwargs))
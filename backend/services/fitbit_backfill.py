@@ -0,0 +1,204 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, FitbitBackfill
+from .fitbit_client import RateLimitExceeded, get_fitbit_client
+from .fitbit_sync import upsert_weight_entries
+from .rate_limit import TokenBucket
+
+# Fitbitの体重ログAPIが1リクエストで返す最大日数
+FITBIT_MAX_WINDOW_DAYS = 31
+
+def split_date_range(from_date, to_date, window_days=FITBIT_MAX_WINDOW_DAYS):
+    """
+    期間をAPIの上限日数ごとのウィンドウに分割
+    
+    引数:
+        from_date (date): 開始日
+        to_date (date): 終了日
+        window_days (int): 1ウィンドウあたりの最大日数
+        
+    戻り値:
+        list: (開始日, 終了日) のタプルのリスト
+    """
+    windows = []
+    start = from_date
+    while start <= to_date:
+        end = min(start + timedelta(days=window_days - 1), to_date)
+        windows.append((start, end))
+        start = end + timedelta(days=1)
+    return windows
+
+def start_backfill(user_id, from_date, to_date):
+    """
+    バックフィルのチェックポイントを作成（同じ期間の未完了ジョブがあれば再利用）
+    
+    引数:
+        user_id (str): ユーザー識別子
+        from_date (date): 開始日
+        to_date (date): 終了日
+        
+    戻り値:
+        FitbitBackfill: チェックポイントレコード
+    """
+    record = FitbitBackfill.query.filter_by(user_id=user_id).first()
+    
+    # 同じ期間の未完了ジョブはチェックポイントから再開
+    if record and record.status != 'completed' and \
+       record.from_date == from_date and record.to_date == to_date:
+        return record
+    
+    if record is None:
+        record = FitbitBackfill(user_id=user_id)
+        db.session.add(record)
+    
+    record.from_date = from_date
+    record.to_date = to_date
+    record.next_date = from_date
+    record.status = 'pending'
+    record.error = None
+    record.retry_after = None
+    record.windows_completed = 0
+    record.inserted = 0
+    record.updated = 0
+    record.skipped = 0
+    db.session.commit()
+    
+    return record
+
+def run_backfill(user_id, access_token, max_workers=None, calls_per_hour=None, window_days=None):
+    """
+    チェックポイントから未取り込みの期間をウィンドウ単位で並列取得し、データベースに保存
+    
+    取得はワーカースレッド（FITBIT_ASYNC_IO が有効な場合は1つのイベントループ）で並列に行い、
+    保存は呼び出し元のスレッドでウィンドウの順に行う。連続して保存できたウィンドウまでをチェックポイントとして
+    記録するため、クラッシュやレート制限の後も途中から再開できる。
+    
+    引数:
+        user_id (str): ユーザー識別子
+        access_token (str): アクセストークン
+        max_workers (int): 同時に実行するリクエスト数
+        calls_per_hour (int): 1時間あたりに使用するAPI呼び出し回数の上限
+        window_days (int): 1リクエストあたりの日数
+        
+    戻り値:
+        FitbitBackfill または None: 更新後のチェックポイントレコード
+    """
+    config = current_app.config
+    max_workers = max_workers or config['FITBIT_BACKFILL_MAX_WORKERS']
+    calls_per_hour = calls_per_hour or config['FITBIT_BACKFILL_CALLS_PER_HOUR']
+    window_days = window_days or config['FITBIT_BACKFILL_WINDOW_DAYS']
+    
+    record = FitbitBackfill.query.filter_by(user_id=user_id).first()
+    if record is None or record.status == 'completed':
+        return record
+    
+    # レート制限のリセット前は再開しない
+    if record.retry_after and record.retry_after > datetime.utcnow():
+        return record
+    
+    windows = split_date_range(record.next_date, record.to_date, window_days)
+    record.status = 'running'
+    record.error = None
+    record.retry_after = None
+    db.session.commit()
+    
+    bucket = TokenBucket(max_workers, calls_per_hour / 3600.0)
+    
+    def save(index, weight_logs):
+        counts = upsert_weight_entries(user_id, weight_logs)
+        record.next_date = windows[index][1] + timedelta(days=1)
+        record.windows_completed += 1
+        record.inserted += counts['inserted']
+        record.updated += counts['updated']
+        record.skipped += counts['skipped']
+        db.session.commit()
+    
+    try:
+        if config['FITBIT_ASYNC_IO']:
+            failure = _fetch_windows_async(user_id, access_token, windows, max_workers, bucket, save)
+        else:
+            failure = _fetch_windows_threaded(user_id, access_token, windows, max_workers, bucket, save)
+    except Exception as e:
+        # 保存できなかったウィンドウ（不正な体重ログなど）以降はチェックポイントから再開する
+        db.session.rollback()
+        failure = e
+    
+    if failure is None:
+        record.status = 'completed'
+    elif isinstance(failure, RateLimitExceeded):
+        record.status = 'paused'
+        record.error = str(failure)
+        record.retry_after = datetime.utcnow() + timedelta(seconds=failure.retry_after)
+    else:
+        record.status = 'failed'
+        record.error = str(failure)
+    
+    db.session.commit()
+    return record
+
+def _fetch_windows_threaded(user_id, access_token, windows, max_workers, bucket, save):
+    """
+    ウィンドウをワーカースレッドで並列に取得し、先頭から連続して取得できたものを順に保存
+    
+    戻り値:
+        Exception または None: 最初に発生した取得の失敗
+    """
+    client = get_fitbit_client()
+    
+    # ワーカースレッドではアプリケーションコンテキストに依存しないクライアントのみを使用
+    def fetch(window):
+        bucket.acquire()
+        return client.get_weight_logs(access_token, window[0], window[1], user_key=user_id)
+    
+    results = {}
+    pending = {}
+    next_submit = 0
+    next_commit = 0
+    failure = None
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or (failure is None and next_submit < len(windows)):
+            # 同時実行数の範囲でウィンドウを投入
+            while failure is None and next_submit < len(windows) and len(pending) < max_workers:
+                pending[executor.submit(fetch, windows[next_submit])] = next_submit
+                next_submit += 1
+            
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    # 通信エラー以外（不正なレスポンス・トークンの失効など）も失敗として記録する
+                    failure = failure or e
+            
+            # 先頭から連続して取得できたウィンドウを順に保存
+            while next_commit in results:
+                save(next_commit, results.pop(next_commit))
+                next_commit += 1
+    
+    return failure
+
+def _fetch_windows_async(user_id, access_token, windows, max_workers, bucket, save):
+    """
+    ウィンドウを max_workers 件ずつ1つのイベントループで同時に取得し、順に保存
+    
+    戻り値:
+        Exception または None: 最初に発生した取得の失敗
+    """
+    from .fitbit_async import fetch_weight_logs_concurrently
+    
+    for offset in range(0, len(windows), max_workers):
+        indexes = range(offset, min(offset + max_workers, len(windows)))
+        results = fetch_weight_logs_concurrently(
+            [(index, access_token, windows[index][0], windows[index][1], user_id) for index in indexes],
+            max_concurrency=max_workers, pacing=bucket
+        )
+        # 失敗したウィンドウの手前までを保存（以降はチェックポイントから再開する）
+        for index in indexes:
+            if isinstance(results[index], Exception):
+                return results[index]
+            save(index, results[index])
+    
+    return None
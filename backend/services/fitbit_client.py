@@ -0,0 +1,451 @@
+import base64
+import math
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+from .rate_limit import TokenBucket
+
+# レイテンシヒストグラムのバケット境界（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class RateLimitExceeded(requests.exceptions.RequestException):
+    """
+    Fitbit APIのレート制限に達したことを示す例外
+    
+    属性:
+        retry_after (int): 再試行までの秒数
+    """
+    
+    def __init__(self, retry_after):
+        super().__init__(f'Fitbit API rate limit exceeded (retry after {retry_after}s)')
+        self.retry_after = retry_after
+
+class FitbitClientMetrics:
+    """
+    Fitbit API呼び出しの計測値
+    
+    呼び出し回数（ステータスコード別）、レイテンシのヒストグラム、
+    リトライ回数、スロットリングによる待機を記録する。
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """計測値を初期化"""
+        with self._lock:
+            self.calls = {}
+            self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+            self.latency_sum = 0.0
+            self.latency_max = 0.0
+            self.retries = 0
+            self.throttle_waits = 0
+            self.throttle_wait_seconds = 0.0
+            self.throttle_rejections = 0
+    
+    def record_call(self, status, latency):
+        """API呼び出し1回分を記録（通信エラーはステータス 'error'）"""
+        with self._lock:
+            self.calls[str(status)] = self.calls.get(str(status), 0) + 1
+            index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS))
+            self.latency_buckets[index] += 1
+            self.latency_sum += latency
+            self.latency_max = max(self.latency_max, latency)
+    
+    def record_retry(self):
+        """リトライ1回分を記録"""
+        with self._lock:
+            self.retries += 1
+    
+    def record_throttle(self, waited, rejected=False):
+        """スロットリングによる待機または拒否を記録"""
+        with self._lock:
+            if rejected:
+                self.throttle_rejections += 1
+            elif waited > 0:
+                self.throttle_waits += 1
+                self.throttle_wait_seconds += waited
+    
+    def snapshot(self):
+        """
+        計測値をJSONシリアライズ可能な辞書として取得
+        
+        戻り値:
+            dict: 計測値
+        """
+        with self._lock:
+            total = sum(self.calls.values())
+            cumulative = 0
+            histogram = []
+            for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), self.latency_buckets):
+                cumulative += count
+                histogram.append({'le': 'inf' if bound == float('inf') else bound, 'count': cumulative})
+            return {
+                'calls': dict(self.calls),
+                'total_calls': total,
+                'latency': {
+                    'avg_seconds': self.latency_sum / total if total else None,
+                    'max_seconds': self.latency_max,
+                    'sum_seconds': self.latency_sum,
+                    'histogram': histogram
+                },
+                'retries': self.retries,
+                'throttle': {
+                    'waits': self.throttle_waits,
+                    'wait_seconds': self.throttle_wait_seconds,
+                    'rejections': self.throttle_rejections
+                }
+            }
+
+class FitbitClient:
+    """
+    Fitbit APIのHTTPクライアント
+    
+    - 接続プール付きの requests.Session を共有し、Keep-Alive とTLSセッションを再利用する
+    - ユーザーごとのトークンバケットで呼び出しを制限し、Fitbit-Rate-Limit-* ヘッダーで同期する
+    - 429 と 5xx はジッター付き指数バックオフでリトライする
+    - すべての呼び出しにタイムアウトを設定する
+    """
+    
+    def __init__(self, base_url, token_url, client_id=None, client_secret=None, timeout=10,
+                 max_retries=3, backoff_base=0.5, backoff_max=30, pool_size=10,
+                 hourly_limit=150, max_throttle_wait=30, sleep=time.sleep):
+        self.base_url = base_url
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hourly_limit = hourly_limit
+        self.max_throttle_wait = max_throttle_wait
+        self.metrics = FitbitClientMetrics()
+        self._sleep = sleep
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+    
+    @classmethod
+    def from_config(cls, config):
+        """
+        アプリケーション設定からクライアントを作成
+        
+        引数:
+            config (dict): Flaskの設定
+            
+        戻り値:
+            FitbitClient: クライアント
+        """
+        return cls(
+            base_url=config['FITBIT_API_BASE_URL'],
+            token_url=config['FITBIT_TOKEN_URL'],
+            client_id=config['FITBIT_CLIENT_ID'],
+            client_secret=config['FITBIT_CLIENT_SECRET'],
+            timeout=config['FITBIT_REQUEST_TIMEOUT'],
+            max_retries=config['FITBIT_MAX_RETRIES'],
+            backoff_base=config['FITBIT_BACKOFF_BASE'],
+            backoff_max=config['FITBIT_BACKOFF_MAX'],
+            pool_size=config['FITBIT_POOL_SIZE'],
+            hourly_limit=config['FITBIT_RATE_LIMIT_PER_HOUR'],
+            max_throttle_wait=config['FITBIT_MAX_THROTTLE_WAIT']
+        )
+    
+    def bucket(self, user_key):
+        """ユーザーのトークンバケットを取得（なければ作成）"""
+        with self._buckets_lock:
+            bucket = self._buckets.get(user_key)
+            if bucket is None:
+                bucket = TokenBucket(self.hourly_limit, self.hourly_limit / 3600.0)
+                self._buckets[user_key] = bucket
+            return bucket
+    
+    def reserve_call(self, user_key):
+        """
+        ユーザーの呼び出し枠を確保し、送信前に待つ秒数を返す（同期版・非同期版で共通）
+        
+        引数:
+            user_key (str): レート制限を適用するユーザーのキー
+            
+        戻り値:
+            float: 送信前に待つ秒数
+            
+        例外:
+            RateLimitExceeded: 待ち時間が max_throttle_wait を超える場合
+        """
+        bucket = self.bucket(user_key)
+        wait = bucket.reserve()
+        
+        if wait > self.max_throttle_wait:
+            bucket.release()
+            self.metrics.record_throttle(wait, rejected=True)
+            raise RateLimitExceeded(math.ceil(wait))
+        
+        self.metrics.record_throttle(wait)
+        return wait
+    
+    def sync_rate_limit(self, user_key, response):
+        """レスポンスのレート制限ヘッダーでバケットを同期"""
+        remaining = response.headers.get('Fitbit-Rate-Limit-Remaining')
+        reset = response.headers.get('Fitbit-Rate-Limit-Reset')
+        if remaining is None or reset is None:
+            return
+        try:
+            self.bucket(user_key).sync(float(remaining), float(reset))
+        except ValueError:
+            pass
+    
+    def record_response(self, user_key, response, started):
+        """
+        1回分の送信結果を計測値とレート制限に反映（同期版・非同期版で共通）
+        
+        引数:
+            user_key (str): レート制限を適用するユーザーのキー（Noneなら適用しない）
+            response: 受信したレスポンス（requests・httpx。通信エラーの場合はNone）
+            started (float): 送信開始時の time.perf_counter()
+        """
+        latency = time.perf_counter() - started
+        if response is None:
+            self.metrics.record_call('error', latency)
+            return
+        self.metrics.record_call(response.status_code, latency)
+        if user_key is not None:
+            self.sync_rate_limit(user_key, response)
+    
+    def backoff_delay(self, attempt, response=None):
+        """リトライまでの待機秒数（ジッター付き指数バックオフ、429はリセット時刻を考慮）"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        
+        if response is not None and response.status_code == 429:
+            delay = max(delay, retry_after_seconds(response, default=0))
+        
+        return delay
+    
+    def retry_delay(self, attempt, retry_server_errors, response=None):
+        """
+        リトライするかを判定し、リトライまでの待機秒数を返す（同期版・非同期版で共通）
+        
+        引数:
+            attempt (int): これまでのリトライ回数
+            retry_server_errors (bool): 5xx と通信エラーでリトライするか
+            response: 受信したレスポンス（通信エラーの場合はNone）
+            
+        戻り値:
+            float または None: 待機秒数（リトライしない場合はNone）
+        """
+        if attempt >= self.max_retries:
+            return None
+        if response is None:
+            if not retry_server_errors:
+                return None
+            delay = self.backoff_delay(attempt)
+        else:
+            if not (response.status_code == 429 or (retry_server_errors and response.status_code >= 500)):
+                return None
+            delay = self.backoff_delay(attempt, response)
+            if delay > self.backoff_max:
+                # リセットまで長時間待つ必要がある場合は呼び出し元に返す
+                return None
+        
+        self.metrics.record_retry()
+        return delay
+    
+    def request(self, method, url, user_key=None, retry_server_errors=None, **kwargs):
+        """
+        Fitbit APIを呼び出す
+        
+        引数:
+            method (str): HTTPメソッド
+            url (str): URL（/ で始まる場合はベースURLからの相対パス）
+            user_key (str): レート制限を適用するユーザーのキー（Noneなら適用しない）
+            retry_server_errors (bool): 5xx と通信エラーでリトライするか（デフォルトはGETのみ）
+            **kwargs: requests に渡す引数
+            
+        戻り値:
+            requests.Response: 最後に受信したレスポンス
+        """
+        if url.startswith('/'):
+            url = f'{self.base_url}{url}'
+        if retry_server_errors is None:
+            retry_server_errors = method.upper() == 'GET'
+        kwargs.setdefault('timeout', self.timeout)
+        
+        attempt = 0
+        while True:
+            if user_key is not None:
+                wait = self.reserve_call(user_key)
+                if wait > 0:
+                    self._sleep(wait)
+            
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.record_response(user_key, None, started)
+                delay = self.retry_delay(attempt, retry_server_errors)
+                if delay is None:
+                    raise
+            else:
+                self.record_response(user_key, response, started)
+                delay = self.retry_delay(attempt, retry_server_errors, response)
+                if delay is None:
+                    return response
+            
+            self._sleep(delay)
+            attempt += 1
+    
+    def _basic_auth_headers(self):
+        credentials = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode()
+        return {
+            'Authorization': f'Basic {credentials}',
+            'Content-Type': 'application/x-www-form-urlencoded'
+        }
+    
+    def request_token(self, data):
+        """
+        トークンエンドポイントを呼び出す（認可コードの交換・リフレッシュ）
+        
+        引数:
+            data (dict): フォームパラメータ
+            
+        戻り値:
+            dict: トークンレスポンス
+        """
+        response = self.request('POST', self.token_url, headers=self._basic_auth_headers(), data=data)
+        response.raise_for_status()
+        return response.json()
+    
+    def get_weight_logs(self, access_token, start, end=None, user_key=None):
+        """
+        体重ログを取得
+        
+        引数:
+            access_token (str): アクセストークン
+            start (date または str): 開始日（end を省略した場合はその日のみ）
+            end (date または str): 終了日
+            user_key (str): レート制限を適用するユーザーのキー
+            
+        戻り値:
+            list: 体重ログのリスト
+        """
+        response = self.request('GET', weight_log_path(start, end), user_key=user_key,
+                                headers=bearer_headers(access_token))
+        raise_for_rate_limit(response)
+        response.raise_for_status()
+        return response.json().get('weight', [])
+
+    def _subscription_request(self, method, access_token, subscription_id, collection, subscriber_id, user_key):
+        headers = bearer_headers(access_token)
+        if subscriber_id:
+            headers['X-Fitbit-Subscriber-Id'] = subscriber_id
+        response = self.request(method, f'/1/user/-/{collection}/apiSubscriptions/{subscription_id}.json',
+                                user_key=user_key, headers=headers)
+        raise_for_rate_limit(response)
+        return response
+    
+    def create_subscription(self, access_token, subscription_id, collection='body', subscriber_id=None, user_key=None):
+        """
+        データ更新の通知（Webhook）を購読
+        
+        引数:
+            access_token (str): アクセストークン
+            subscription_id (str): 購読ID
+            collection (str): 購読するコレクション（体重は body）
+            subscriber_id (str): サブスクライバーID（Noneならデフォルト）
+            user_key (str): レート制限を適用するユーザーのキー
+            
+        戻り値:
+            dict: 登録された購読（既に登録済みの場合も含む）
+            
+        例外:
+            requests.exceptions.HTTPError: 登録に失敗した場合（409は購読IDが他のユーザーで使用済み）
+        """
+        response = self._subscription_request('POST', access_token, subscription_id, collection, subscriber_id, user_key)
+        response.raise_for_status()
+        return response.json() if response.content else {}
+    
+    def delete_subscription(self, access_token, subscription_id, collection='body', subscriber_id=None, user_key=None):
+        """
+        データ更新の通知（Webhook）の購読を解除
+        
+        戻り値:
+            bool: 解除した場合True、購読が存在しなかった場合False
+        """
+        response = self._subscription_request('DELETE', access_token, subscription_id, collection, subscriber_id, user_key)
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+def weight_log_path(start, end=None):
+    """
+    体重ログAPIのパスを作成
+    
+    引数:
+        start (date または str): 開始日（end を省略した場合はその日のみ）
+        end (date または str): 終了日
+        
+    戻り値:
+        str: ベースURLからの相対パス
+    """
+    start = start.isoformat() if hasattr(start, 'isoformat') else start
+    if end is None:
+        return f'/1/user/-/body/log/weight/date/{start}.json'
+    end = end.isoformat() if hasattr(end, 'isoformat') else end
+    return f'/1/user/-/body/log/weight/date/{start}/{end}.json'
+
+def bearer_headers(access_token):
+    """アクセストークンの Authorization ヘッダー"""
+    return {'Authorization': f'Bearer {access_token}'}
+
+def raise_for_rate_limit(response):
+    """
+    429レスポンスを RateLimitExceeded として送出（requests・httpx のレスポンスに対応）
+    
+    例外:
+        RateLimitExceeded: レスポンスが429の場合
+    """
+    if response.status_code == 429:
+        raise RateLimitExceeded(retry_after_seconds(response))
+
+def retry_after_seconds(response, default=60):
+    """
+    429レスポンスのヘッダーから再試行までの秒数を取得
+    
+    引数:
+        response (requests.Response): レスポンス
+        default (int): ヘッダーがない場合の秒数
+        
+    戻り値:
+        int: 再試行までの秒数
+    """
+    for header in ('Retry-After', 'Fitbit-Rate-Limit-Reset'):
+        value = response.headers.get(header)
+        if value is not None:
+            try:
+                return max(0, int(float(value)))
+            except ValueError:
+                pass
+    return default
+
+def get_fitbit_client():
+    """
+    アプリケーションで共有するFitbitクライアントを取得
+    
+    戻り値:
+        FitbitClient: クライアント
+    """
+    client = current_app.extensions.get('fitbit_client')
+    if client is None:
+        client = FitbitClient.from_config(current_app.config)
+        current_app.extensions['fitbit_client'] = client
+    return client
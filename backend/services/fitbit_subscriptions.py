@@ -0,0 +1,204 @@
+"""
+Fitbit Subscriptions API（Webhook）による体重データの取り込み
+
+連携済みユーザーごとに body コレクションを購読し、Fitbitから通知された
+（ユーザー, 日付）の組だけを1日分の同期ジョブ（kind='day'）として登録する。
+購読済みのユーザーは定期同期の間隔を FITBIT_SUBSCRIBED_SYNC_INTERVAL に延ばし、
+通知の取りこぼしに備えた整合性確認としてのみ期間の同期を行う。
+"""
+import base64
+import hashlib
+import hmac
+import secrets
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import insert, tuple_
+from models import db, FitbitSubscription, FitbitSyncJob
+
+# 体重ログが含まれるコレクション
+SUBSCRIPTION_COLLECTION = 'body'
+
+def verify_signature(body, signature, client_secret):
+    """
+    通知の X-Fitbit-Signature ヘッダーを検証
+    
+    署名はリクエスト本文の HMAC-SHA1（キーはクライアントシークレット + '&'）をBase64エンコードしたもの。
+    
+    引数:
+        body (bytes): リクエスト本文
+        signature (str): X-Fitbit-Signature ヘッダーの値
+        client_secret (str): Fitbitアプリのクライアントシークレット
+    
+    戻り値:
+        bool: 署名が正しければTrue
+    """
+    if not signature or not client_secret:
+        return False
+    digest = hmac.new(f'{client_secret}&'.encode(), body, hashlib.sha1).digest()
+    return hmac.compare_digest(base64.b64encode(digest).decode(), signature)
+
+def is_subscribed(user_id):
+    """ユーザーが購読済みかどうか"""
+    return db.session.query(FitbitSubscription.id).filter_by(user_id=user_id).first() is not None
+
+def sync_stale_before(user_id, now=None):
+    """
+    この日時より前に同期したユーザーのデータを古いとみなす日時
+    
+    引数:
+        user_id (str): ユーザー識別子
+        now (datetime): 現在日時（UTC）
+    
+    戻り値:
+        datetime: 購読済みなら FITBIT_SUBSCRIBED_SYNC_INTERVAL、それ以外は FITBIT_SYNC_INTERVAL だけ前の日時
+    """
+    now = now or datetime.utcnow()
+    interval = 'FITBIT_SUBSCRIBED_SYNC_INTERVAL' if is_subscribed(user_id) else 'FITBIT_SYNC_INTERVAL'
+    return now - timedelta(seconds=current_app.config[interval])
+
+def subscribe_user(user_id):
+    """
+    ユーザーの体重データの更新通知を購読（購読済みなら既存の購読を返す）
+    
+    引数:
+        user_id (str): ユーザー識別子
+    
+    戻り値:
+        FitbitSubscription: 購読
+    
+    例外:
+        PermissionError: Fitbitの認証情報がない、またはトークンの更新に失敗した場合
+        requests.exceptions.RequestException: Fitbit APIの呼び出しに失敗した場合
+    """
+    from .fitbit_client import get_fitbit_client
+    from .fitbit_tokens import get_valid_token
+    
+    subscription = FitbitSubscription.query.filter_by(user_id=user_id).first()
+    if subscription is not None:
+        return subscription
+    
+    token = get_valid_token(user_id)
+    if not token:
+        raise PermissionError('Not authenticated with Fitbit or token refresh failed')
+    
+    subscription = FitbitSubscription(
+        user_id=user_id,
+        subscription_id=secrets.token_hex(16),
+        collection_type=SUBSCRIPTION_COLLECTION,
+        subscriber_id=current_app.config['FITBIT_SUBSCRIBER_ID']
+    )
+    get_fitbit_client().create_subscription(
+        token.access_token, subscription.subscription_id, collection=subscription.collection_type,
+        subscriber_id=subscription.subscriber_id, user_key=user_id
+    )
+    db.session.add(subscription)
+    db.session.commit()
+    return subscription
+
+def unsubscribe_user(user_id):
+    """
+    ユーザーの購読を解除
+    
+    引数:
+        user_id (str): ユーザー識別子
+    
+    戻り値:
+        bool: 購読を解除した場合True、購読していなかった場合False
+    
+    例外:
+        PermissionError: Fitbitの認証情報がない、またはトークンの更新に失敗した場合
+        requests.exceptions.RequestException: Fitbit APIの呼び出しに失敗した場合
+    """
+    from .fitbit_client import get_fitbit_client
+    from .fitbit_tokens import get_valid_token
+    
+    subscription = FitbitSubscription.query.filter_by(user_id=user_id).first()
+    if subscription is None:
+        return False
+    
+    token = get_valid_token(user_id)
+    if not token:
+        raise PermissionError('Not authenticated with Fitbit or token refresh failed')
+    
+    get_fitbit_client().delete_subscription(
+        token.access_token, subscription.subscription_id, collection=subscription.collection_type,
+        subscriber_id=subscription.subscriber_id, user_key=user_id
+    )
+    db.session.delete(subscription)
+    db.session.commit()
+    return True
+
+def parse_notifications(payload):
+    """
+    Webhookの通知から（購読ID, 日付）の組を取得
+    
+    体重を含む body コレクション以外の通知と不正な要素は無視する。
+    
+    引数:
+        payload (list): 通知の本文（collectionType, date, ownerId, subscriptionId を含む要素のリスト）
+    
+    戻り値:
+        set: (購読ID, date) の集合
+    """
+    changes = set()
+    if not isinstance(payload, list):
+        return changes
+    
+    for notification in payload:
+        if not isinstance(notification, dict) or notification.get('collectionType') != SUBSCRIPTION_COLLECTION:
+            continue
+        try:
+            day = datetime.strptime(notification['date'], '%Y-%m-%d').date()
+        except (KeyError, TypeError, ValueError):
+            continue
+        subscription_id = notification.get('subscriptionId')
+        if isinstance(subscription_id, str) and subscription_id:
+            changes.add((subscription_id, day))
+    return changes
+
+def enqueue_notified_days(changes):
+    """
+    通知された（購読ID, 日付）の組ごとに1日分の同期ジョブを登録
+    
+    購読IDからユーザーへの変換と未実行の重複ジョブの確認はそれぞれ1回のクエリで行い、
+    新しいジョブは一括INSERTで登録する。
+    
+    引数:
+        changes (set): parse_notifications() の戻り値
+    
+    戻り値:
+        int: 登録したジョブ数
+    """
+    if not changes:
+        return 0
+    
+    users = dict(
+        db.session.query(FitbitSubscription.subscription_id, FitbitSubscription.user_id)
+        .filter(FitbitSubscription.subscription_id.in_({subscription_id for subscription_id, _ in changes}))
+    )
+    pairs = {(users[subscription_id], day) for subscription_id, day in changes if subscription_id in users}
+    if not pairs:
+        return 0
+    
+    # 同じ日の未実行ジョブがあれば登録しない（実行時にその日の全記録を取得するため）
+    queued = set(
+        db.session.query(FitbitSyncJob.user_id, FitbitSyncJob.from_date).filter(
+            FitbitSyncJob.kind == 'day',
+            FitbitSyncJob.status == 'pending',
+            tuple_(FitbitSyncJob.user_id, FitbitSyncJob.from_date).in_(pairs)
+        )
+    )
+    rows = [
+        {'user_id': user_id, 'kind': 'day', 'from_date': day, 'to_date': day, 'status': 'pending',
+         'attempts': 0, 'inserted': 0, 'updated': 0, 'skipped': 0, 'requested_at': datetime.utcnow()}
+        for user_id, day in sorted(pairs - queued)
+    ]
+    if rows:
+        db.session.execute(insert(FitbitSyncJob), rows)
+    db.session.commit()
+    
+    worker = current_app.extensions.get('fitbit_sync_worker')
+    if worker is not None and rows:
+        worker.notify()
+    
+    return len(rows)
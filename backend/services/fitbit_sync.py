@@ -0,0 +1,358 @@
+import logging
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import insert, select
+from models import db, FitbitWeight, FitbitSyncState
+from .weight_rollup import mark_rollups_dirty
+from .data_version import mark_data_changed
+from .dialect import upsert_insert
+
+logger = logging.getLogger(__name__)
+
+# 1回のクエリ・INSERTで処理するエントリ数
+DEFAULT_BATCH_SIZE = 500
+
+# 更新検出の対象となる列
+_SYNCED_FIELDS = ('weight', 'bmi', 'date', 'time', 'source')
+
+def parse_weight_entry(entry):
+    """
+    Fitbit APIの体重ログエントリをFitbitWeightの列の辞書に変換
+    
+    引数:
+        entry (dict): Fitbit APIのレスポンスに含まれる体重ログ
+        
+    戻り値:
+        dict または None: 列名をキーとする辞書（logIdがない場合はNone）
+    """
+    if entry.get('logId') is None:
+        return None
+    
+    # 日時の処理
+    log_date = datetime.strptime(entry.get('date', ''), '%Y-%m-%d').date()
+    log_time = None
+    if 'time' in entry:
+        try:
+            log_time = datetime.strptime(entry.get('time', ''), '%H:%M:%S').time()
+        except ValueError:
+            pass
+    
+    return {
+        'log_id': str(entry['logId']),
+        'weight': entry.get('weight'),
+        'bmi': entry.get('bmi'),
+        'date': log_date,
+        'time': log_time,
+        'source': entry.get('source')
+    }
+
+def upsert_weight_entries(user_id, entries, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Fitbitの体重ログをまとめてデータベースに保存（存在すれば更新）
+    
+    既存レコードの確認はバッチごとに1回の IN クエリで行い、
+    新規レコードはバッチ単位の一括INSERTで追加する（SQLite・PostgreSQLでは ON CONFLICT DO NOTHING により、
+    同時に同期した別のワーカーが先に追加したレコードは無視し、RETURNING で実際に追加した行のみを数える）。
+    Fitbit側で編集されたログは既存レコードを更新する。
+    既存レコードの照合は同じユーザーのレコードに限り、別のユーザーのレコードと logId が衝突した場合は
+    更新せずに conflicts として数える。
+    影響を受けた日の日次集計（FitbitWeightDaily）の再計算とデータバージョンの更新はコミット時に行われる。
+    
+    引数:
+        user_id (str): ユーザー識別子
+        entries (list): Fitbit APIの体重ログのリスト
+        batch_size (int): 1バッチあたりのエントリ数
+        
+    戻り値:
+        dict: inserted, updated, skipped, conflicts の件数
+    """
+    counts = {'inserted': 0, 'updated': 0, 'skipped': 0, 'conflicts': 0}
+    
+    # logIdで重複を除去（同じlogIdが複数ある場合は後のものを優先）
+    rows = {}
+    for entry in entries:
+        row = parse_weight_entry(entry)
+        if row is None:
+            counts['skipped'] += 1
+            continue
+        rows[row['log_id']] = row
+    
+    rows = list(rows.values())
+    
+    upsert = upsert_insert(db.session)
+    if upsert:
+        insert_stmt = (upsert(FitbitWeight).on_conflict_do_nothing(index_elements=['log_id'])
+                       .returning(FitbitWeight.log_id))
+    else:
+        insert_stmt = insert(FitbitWeight)
+    
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        
+        # バッチ内のlogIdを1回のクエリで照合
+        existing = {
+            record.log_id: record
+            for record in FitbitWeight.query.filter(
+                FitbitWeight.user_id == user_id,
+                FitbitWeight.log_id.in_([row['log_id'] for row in batch])
+            )
+        }
+        
+        new_rows = []
+        for row in batch:
+            record = existing.get(row['log_id'])
+            
+            if record is None:
+                new_rows.append(dict(row, user_id=user_id))
+                continue
+            
+            changed = False
+            for field in _SYNCED_FIELDS:
+                if getattr(record, field) != row[field]:
+                    setattr(record, field, row[field])
+                    changed = True
+            
+            if changed:
+                counts['updated'] += 1
+            else:
+                counts['skipped'] += 1
+        
+        if new_rows:
+            if upsert is None:
+                # ON CONFLICT に対応しない方言では、別のユーザーと衝突する行をINSERT前に除く
+                conflicts = _foreign_log_ids(user_id, [row['log_id'] for row in new_rows])
+                inserted_rows = _insert_new_rows(
+                    insert_stmt, [row for row in new_rows if row['log_id'] not in conflicts], returning=False
+                )
+            else:
+                inserted_rows = _insert_new_rows(insert_stmt, new_rows, returning=True)
+                inserted = {row['log_id'] for row in inserted_rows}
+                missing = [row['log_id'] for row in new_rows if row['log_id'] not in inserted]
+                conflicts = _foreign_log_ids(user_id, missing) if missing else set()
+            
+            if conflicts:
+                logger.warning('Fitbit weight logs of %s conflict with another user: %s',
+                               user_id, ', '.join(sorted(conflicts)))
+            # 別のワーカーが先に追加していた同じユーザーの行は追加済みとしてスキップ扱いにする
+            counts['inserted'] += len(inserted_rows)
+            counts['conflicts'] += len(conflicts)
+            counts['skipped'] += len(new_rows) - len(inserted_rows) - len(conflicts)
+            if inserted_rows:
+                # Core のINSERTはセッションイベントで検出されないため、日次集計の対象を明示的に登録
+                mark_rollups_dirty(db.session, user_id, {row['date'] for row in inserted_rows})
+                mark_data_changed(db.session, user_id)
+    
+    if counts['inserted'] or counts['updated']:
+        db.session.commit()
+    
+    return counts
+
+def _insert_new_rows(insert_stmt, rows, returning):
+    """
+    新規行を一括INSERTし、実際に追加された行を返す
+    
+    引数:
+        insert_stmt (Insert): INSERT文（returning=True の場合は log_id を RETURNING する）
+        rows (list): 追加する行の辞書のリスト
+        returning (bool): RETURNING で追加された行を判定するかどうか
+        
+    戻り値:
+        list: 追加された行の辞書のリスト
+    """
+    if not rows:
+        return []
+    result = db.session.execute(insert_stmt, rows)
+    if not returning:
+        return rows
+    inserted = set(result.scalars())
+    return [row for row in rows if row['log_id'] in inserted]
+
+def _foreign_log_ids(user_id, log_ids):
+    """
+    別のユーザーのレコードが使用している logId を取得
+    
+    引数:
+        user_id (str): ユーザー識別子
+        log_ids (list): 確認する logId のリスト
+        
+    戻り値:
+        set: 別のユーザーのレコードと衝突する logId
+    """
+    return set(db.session.execute(
+        select(FitbitWeight.log_id).where(FitbitWeight.log_id.in_(log_ids), FitbitWeight.user_id != user_id)
+    ).scalars())
+
+def get_sync_state(user_id):
+    """
+    ユーザーの同期状態を取得（存在しなければ作成）
+    
+    引数:
+        user_id (str): ユーザー識別子
+        
+    戻り値:
+        FitbitSyncState: 同期状態
+    """
+    state = FitbitSyncState.query.filter_by(user_id=user_id).first()
+    if state is None:
+        state = FitbitSyncState(user_id=user_id)
+        db.session.add(state)
+    return state
+
+def incremental_start_date(state, to_date, default_days, overlap_days):
+    """
+    定期同期の開始日を high-water mark から決める
+    
+    同期済みの最新の日付の overlap_days 日前から取得し直す（遅れて編集された記録を取り込むため）。
+    初回、または default_days 日以上同期していない場合は to_date の default_days 日前から取得する
+    （それより古い期間はバックフィルで取り込む）。
+    
+    引数:
+        state (FitbitSyncState): 同期状態（Noneなら初回）
+        to_date (date): 終了日
+        default_days (int): 最大の日数
+        overlap_days (int): high-water mark から遡る日数
+        
+    戻り値:
+        date: 開始日
+    """
+    earliest = to_date - timedelta(days=default_days)
+    if state is None or state.last_synced_date is None:
+        return earliest
+    return min(to_date, max(earliest, state.last_synced_date - timedelta(days=overlap_days)))
+
+def _advance_high_water_mark(state, from_date, to_date, weight_logs):
+    """同期した期間と取得したログで high-water mark を更新（同期済みの期間と連続する場合のみ日付を進める）"""
+    mark = state.last_synced_date
+    if mark is None or from_date <= mark + timedelta(days=1):
+        state.last_synced_date = max(mark, to_date) if mark else to_date
+    
+    log_ids = [int(entry['logId']) for entry in weight_logs if str(entry.get('logId', '')).isdigit()]
+    if log_ids:
+        state.last_log_id = max(log_ids + [state.last_log_id or 0])
+
+class SyncPlan(namedtuple('SyncPlan', ['user_id', 'access_token', 'from_date', 'to_date'])):
+    """
+    1回の同期で取得する期間と使用するアクセストークン
+    
+    属性:
+        user_id (str): ユーザー識別子
+        access_token (str): アクセストークン
+        from_date (date): 開始日
+        to_date (date): 終了日
+    """
+    
+    @property
+    def end_date(self):
+        """APIに渡す終了日（1日分は日単位のエンドポイントで取得するためNone）"""
+        return None if self.from_date == self.to_date else self.to_date
+
+def plan_sync(user_id, from_date=None, to_date=None, default_days=None):
+    """
+    同期する期間を決め、有効なアクセストークンを取得
+    
+    from_date を省略した定期同期では、同期状態の high-water mark（同期済みの最新の日付）の
+    FITBIT_SYNC_OVERLAP_DAYS 日前からだけを取得する。
+    
+    引数:
+        user_id (str): ユーザー識別子
+        from_date (date): 開始日（デフォルトは incremental_start_date() の戻り値）
+        to_date (date): 終了日（デフォルトは今日）
+        default_days (int): from_date を省略した場合の最大の日数（デフォルトは FITBIT_SYNC_DEFAULT_DAYS）
+        
+    戻り値:
+        SyncPlan: 同期の内容
+        
+    例外:
+        PermissionError: Fitbitの認証情報がない、またはトークンの更新に失敗した場合（同期状態に失敗を記録する）
+    """
+    from .fitbit_tokens import get_valid_token
+    
+    config = current_app.config
+    default_days = default_days or config['FITBIT_SYNC_DEFAULT_DAYS']
+    to_date = to_date or datetime.now().date()
+    state = get_sync_state(user_id)
+    from_date = from_date or incremental_start_date(state, to_date, default_days, config['FITBIT_SYNC_OVERLAP_DAYS'])
+    
+    try:
+        token = get_valid_token(user_id)
+        if not token:
+            raise PermissionError('Not authenticated with Fitbit or token refresh failed')
+    except Exception as e:
+        record_sync_failure(user_id, e)
+        raise
+    
+    return SyncPlan(user_id, token.access_token, from_date, to_date)
+
+def apply_sync(plan, weight_logs):
+    """
+    取得した体重ログを保存し、同期状態と high-water mark を更新
+    
+    引数:
+        plan (SyncPlan): plan_sync() の戻り値
+        weight_logs (list): 取得した体重ログのリスト
+        
+    戻り値:
+        dict: inserted, updated, skipped の件数
+    """
+    try:
+        counts = upsert_weight_entries(plan.user_id, weight_logs)
+    except Exception as e:
+        record_sync_failure(plan.user_id, e)
+        raise
+    
+    state = get_sync_state(plan.user_id)
+    state.last_attempt_at = state.last_synced_at = datetime.utcnow()
+    state.last_status = 'completed'
+    state.last_error = None
+    _advance_high_water_mark(state, plan.from_date, plan.to_date, weight_logs)
+    db.session.commit()
+    
+    return counts
+
+def record_sync_failure(user_id, error):
+    """
+    未コミットの変更を破棄し、同期状態に失敗を記録
+    
+    引数:
+        user_id (str): ユーザー識別子
+        error (Exception): 失敗の原因
+    """
+    db.session.rollback()
+    state = get_sync_state(user_id)
+    state.last_attempt_at = datetime.utcnow()
+    state.last_status = 'failed'
+    state.last_error = str(error)
+    db.session.commit()
+
+def sync_user_weights(user_id, from_date=None, to_date=None, default_days=None):
+    """
+    Fitbit APIから指定期間の体重ログを取得してデータベースに保存
+    
+    期間の決め方は plan_sync() を参照。
+    
+    引数:
+        user_id (str): ユーザー識別子
+        from_date (date): 開始日（デフォルトは incremental_start_date() の戻り値）
+        to_date (date): 終了日（デフォルトは今日）
+        default_days (int): from_date を省略した場合の最大の日数（デフォルトは FITBIT_SYNC_DEFAULT_DAYS）
+        
+    戻り値:
+        dict: inserted, updated, skipped の件数
+        
+    例外:
+        PermissionError: Fitbitの認証情報がない、またはトークンの更新に失敗した場合
+        requests.exceptions.RequestException: Fitbit APIの呼び出しに失敗した場合
+    """
+    from .fitbit_client import get_fitbit_client
+    
+    plan = plan_sync(user_id, from_date, to_date, default_days)
+    
+    try:
+        # 1日分（Webhookで通知された日や、当日に同期済みの場合の定期同期）は日単位のエンドポイントで取得
+        weight_logs = get_fitbit_client().get_weight_logs(plan.access_token, plan.from_date, plan.end_date, user_key=user_id)
+    except Exception as e:
+        record_sync_failure(user_id, e)
+        raise
+    
+    return apply_sync(plan, weight_logs)
@@ -0,0 +1,186 @@
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+import requests
+from flask import current_app
+from sqlalchemy import update
+from models import db, FitbitAuth
+from .fitbit_client import get_fitbit_client
+from .result_cache import CacheStats
+
+class CachedToken(namedtuple('CachedToken', ['access_token', 'refresh_token', 'expires_at', 'scope', 'token_type'])):
+    """
+    プロセス内にキャッシュするアクセストークン
+    
+    属性:
+        access_token (str): アクセストークン
+        refresh_token (str): リフレッシュトークン
+        expires_at (datetime): 有効期限（UTC）
+        scope (str): 許可されたスコープ
+        token_type (str): トークンタイプ
+    """
+    
+    @classmethod
+    def from_record(cls, record):
+        return cls(record.access_token, record.refresh_token, record.expires_at, record.scope, record.token_type)
+    
+    def expires_within(self, seconds):
+        """有効期限まで指定秒数未満かどうか"""
+        return datetime.utcnow() + timedelta(seconds=seconds) >= self.expires_at
+    
+    def is_expired(self):
+        """期限切れかどうか"""
+        return datetime.utcnow() > self.expires_at
+
+class TokenCache:
+    """
+    ユーザーごとのアクセストークンのプロセス内キャッシュ
+    
+    ユーザーごとのロックにより、同じユーザーのリフレッシュはプロセス内で
+    同時に1つだけ実行される（シングルフライト）。
+    """
+    
+    def __init__(self):
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+    
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        self.stats.incr('misses' if entry is None else 'hits')
+        return entry
+    
+    def put(self, user_id, record):
+        """認証レコードの内容をキャッシュに保存"""
+        entry = CachedToken.from_record(record)
+        self._entries[user_id] = entry
+        return entry
+    
+    def invalidate(self, user_id):
+        self._entries.pop(user_id, None)
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def lock_for(self, user_id):
+        """ユーザーのリフレッシュ用ロックを取得"""
+        with self._lock:
+            lock = self._locks.get(user_id)
+            if lock is None:
+                lock = threading.Lock()
+                self._locks[user_id] = lock
+            return lock
+
+def get_token_cache():
+    """
+    アプリケーションで共有するトークンキャッシュを取得
+    
+    戻り値:
+        TokenCache: トークンキャッシュ
+    """
+    cache = current_app.extensions.get('fitbit_token_cache')
+    if cache is None:
+        cache = TokenCache()
+        current_app.extensions['fitbit_token_cache'] = cache
+    return cache
+
+def refresh_access_token(auth_record):
+    """
+    リフレッシュトークンを使用してアクセストークンを更新
+    
+    更新は読み込んだ時点のリフレッシュトークンを条件とする比較交換（CAS）で書き込む。
+    他のプロセスが先に更新していた場合は、そのプロセスが保存したトークンを採用する。
+    
+    引数:
+        auth_record (FitbitAuth): 更新する認証レコード
+        
+    戻り値:
+        bool: 有効なトークンが得られたらTrue、失敗ならFalse
+    """
+    previous_refresh_token = auth_record.refresh_token
+    
+    try:
+        token_data = get_fitbit_client().request_token({
+            'grant_type': 'refresh_token',
+            'refresh_token': previous_refresh_token
+        })
+    except requests.exceptions.RequestException:
+        # 他のプロセスが同じリフレッシュトークンを先に使用した可能性がある
+        db.session.refresh(auth_record)
+        return auth_record.refresh_token != previous_refresh_token and not auth_record.is_token_expired()
+    
+    # トークンの有効期限を計算
+    expires_at = datetime.utcnow() + timedelta(seconds=token_data['expires_in'])
+    
+    result = db.session.execute(
+        update(FitbitAuth)
+        .where(FitbitAuth.id == auth_record.id, FitbitAuth.refresh_token == previous_refresh_token)
+        .values(
+            access_token=token_data['access_token'],
+            refresh_token=token_data['refresh_token'],
+            expires_at=expires_at,
+            scope=token_data['scope'],
+            token_type=token_data['token_type'],
+            updated_at=datetime.utcnow()
+        )
+    )
+    db.session.commit()
+    
+    # 他のプロセスの更新が先に書き込まれていた場合も、最新の内容を読み直す
+    db.session.refresh(auth_record)
+    return result.rowcount == 1 or not auth_record.is_token_expired()
+
+def get_valid_token(user_id):
+    """
+    有効なアクセストークンを取得（期限が近い場合は事前に更新）
+    
+    キャッシュが有効な場合はデータベースにアクセスしない。
+    更新が必要な場合はユーザーごとのロックで同時実行を1つに絞り、
+    データベースでは認証レコードを行ロック（対応するDBのみ）した上で更新する。
+    
+    引数:
+        user_id (str): ユーザー識別子
+        
+    戻り値:
+        CachedToken または None: 有効なトークン、または取得失敗時はNone
+    """
+    cache = get_token_cache()
+    margin = current_app.config['FITBIT_TOKEN_REFRESH_MARGIN']
+    
+    entry = cache.get(user_id)
+    if entry and not entry.expires_within(margin):
+        return entry
+    
+    with cache.lock_for(user_id):
+        # 待機中に他のスレッドが更新していればその結果を使う
+        entry = cache.get(user_id)
+        if entry and not entry.expires_within(margin):
+            return entry
+        
+        auth_record = FitbitAuth.query.filter_by(user_id=user_id) \
+            .with_for_update().populate_existing().first()
+        
+        if not auth_record:
+            db.session.rollback()
+            cache.invalidate(user_id)
+            return None
+        
+        entry = CachedToken.from_record(auth_record)
+        
+        # 他のプロセスが既に更新済みならリフレッシュ不要
+        if not entry.expires_within(margin):
+            db.session.rollback()
+            return cache.put(user_id, auth_record)
+        
+        if refresh_access_token(auth_record):
+            return cache.put(user_id, auth_record)
+        
+        db.session.rollback()
+        cache.invalidate(user_id)
+        
+        # 事前更新に失敗しても、期限内であれば現在のトークンを使う
+        return None if entry.is_expired() else entry
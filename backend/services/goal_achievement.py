@@ -0,0 +1,121 @@
+"""
+体重目標の自動達成判定
+
+新しい体重記録がコミットされるとき、日次集計の再計算の直後に同じトランザクション内で
+影響を受けたユーザーのアクティブな目標だけを再計算した日の記録と照合し、
+達成した目標の is_achieved と achieved_date を一括で更新する。
+1回の測定値の揺れで達成と判定しないよう、暦日 N 日間の移動平均で判定することもできる
+（GOAL_ACHIEVEMENT_SMOOTHING_DAYS）。
+"""
+from datetime import datetime, timedelta
+from itertools import groupby
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import select, update, and_, or_
+from models import FitbitWeightDaily, WeightGoal
+from .weight_analytics import DAILY_SERIES_COLUMNS, series_from_rows, rolling_means
+from .weight_rollup import add_rollup_refresh_listener
+from .data_version import mark_data_changed
+
+# IN句に渡すユーザーの最大数
+_CHUNK_SIZE = 500
+
+def goal_reached(goal, weights):
+    """
+    体重が目標に到達しているかを判定
+    
+    引数:
+        goal: start_weight と target_weight を持つ目標
+        weights (ndarray): 判定する体重
+        
+    戻り値:
+        ndarray: 到達している場合 True の配列（減量目標は目標以下、増量目標は目標以上。
+            目標体重が開始時の体重と同じ維持目標は方向がないため、自動では達成にしない）
+    """
+    if goal.target_weight < goal.start_weight:
+        return weights <= goal.target_weight
+    if goal.target_weight > goal.start_weight:
+        return weights >= goal.target_weight
+    return np.zeros(np.shape(weights), dtype=bool)
+
+def detect_achievements(session, changed, smoothing_days=1, today=None):
+    """
+    記録が変わった日について、ユーザーのアクティブな目標の達成を判定して一括更新
+    
+    引数:
+        session (Session): データベースセッション（日次集計は再計算済みであること）
+        changed (dict): ユーザー識別子 -> 記録が変わった日付の集合
+        smoothing_days (int): 判定に使う移動平均の暦日数（1なら日ごとの平均）
+        today (date): 基準日（これより後の日付の記録では判定しない。デフォルトは今日）
+        
+    戻り値:
+        list: 達成した目標の (goal_id, achieved_date) のリスト
+    """
+    today = today or datetime.now().date()
+    changed = {uid: {day for day in dates if day <= today} for uid, dates in changed.items()}
+    changed = {uid: dates for uid, dates in changed.items() if dates}
+    
+    achieved = []
+    user_ids = sorted(changed)
+    for start in range(0, len(user_ids), _CHUNK_SIZE):
+        chunk = user_ids[start:start + _CHUNK_SIZE]
+        achieved.extend(_detect_chunk(session, {uid: changed[uid] for uid in chunk}, smoothing_days))
+    
+    if achieved:
+        now = datetime.utcnow()
+        session.execute(update(WeightGoal), [
+            {'id': goal_id, 'is_achieved': True, 'achieved_date': day, 'updated_at': now}
+            for goal_id, day, _ in achieved
+        ])
+        for uid in {uid for _, _, uid in achieved}:
+            mark_data_changed(session, uid)
+    
+    return [(goal_id, day) for goal_id, day, _ in achieved]
+
+def _detect_chunk(session, changed, smoothing_days):
+    """ユーザーのまとまりについて達成した目標を (goal_id, date, user_id) で返す"""
+    goals = session.execute(
+        select(WeightGoal.id, WeightGoal.user_id, WeightGoal.start_date, WeightGoal.start_weight, WeightGoal.target_weight)
+        .where(WeightGoal.user_id.in_(list(changed)), WeightGoal.is_achieved.is_(False))
+        .order_by(WeightGoal.user_id, WeightGoal.id)
+    ).all()
+    if not goals:
+        return []
+    goals_by_user = {uid: list(user_goals) for uid, user_goals in groupby(goals, key=lambda goal: goal.user_id)}
+    
+    # 変更された日の範囲（移動平均に必要な前の日を含む）の日次集計を1回のクエリで読み込む
+    ranges = {uid: (min(changed[uid]), max(changed[uid])) for uid in goals_by_user}
+    rows = session.execute(
+        select(FitbitWeightDaily.user_id, *DAILY_SERIES_COLUMNS)
+        .where(or_(*(
+            and_(
+                FitbitWeightDaily.user_id == uid,
+                FitbitWeightDaily.date >= first - timedelta(days=smoothing_days - 1),
+                FitbitWeightDaily.date <= last
+            )
+            for uid, (first, last) in ranges.items()
+        )))
+        .order_by(FitbitWeightDaily.user_id, FitbitWeightDaily.date)
+    ).all()
+    
+    achieved = []
+    for uid, user_rows in groupby(rows, key=lambda row: row[0]):
+        series = series_from_rows([tuple(row[1:]) for row in user_rows])
+        weights = rolling_means(series, smoothing_days)
+        in_range = series.dates >= np.datetime64(ranges[uid][0], 'D')
+        
+        for goal in goals_by_user[uid]:
+            hits = np.flatnonzero(in_range & (series.dates >= np.datetime64(goal.start_date, 'D')) & goal_reached(goal, weights))
+            if len(hits):
+                achieved.append((goal.id, series.dates[hits[0]].item(), uid))
+    return achieved
+
+def _detect_on_refresh(session, changed):
+    """ロールアップ再計算後のフック（設定で無効化されている場合は何もしない）"""
+    if not has_app_context() or not current_app.config.get('GOAL_ACHIEVEMENT_DETECTION', True):
+        return
+    detect_achievements(session, changed, current_app.config.get('GOAL_ACHIEVEMENT_SMOOTHING_DAYS', 1))
+
+def register_goal_achievement_hooks():
+    """日次集計の再計算後に目標の達成判定を行うフックを登録（重複登録はしない）"""
+    add_rollup_refresh_listener(_detect_on_refresh)
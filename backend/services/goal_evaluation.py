@@ -0,0 +1,242 @@
+"""
+体重目標の一括評価
+
+ユーザーの日次集計を1回だけ読み込み、すべての目標の進捗・差分の要約・予測に使い回す。
+全ユーザーのアクティブな目標の評価（夜間ジョブなど）は、日次集計をユーザー・日付順に
+1回走査して行う。
+"""
+from datetime import datetime, timedelta
+from itertools import groupby
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+from models import db, FitbitWeight, FitbitWeightDaily, WeightGoal
+from .weight_analytics import DAILY_SERIES_COLUMNS, series_from_rows, load_daily_series
+from .weight_projection import project_weights
+
+# 1日に複数の体重記録がある場合の集約方法
+DAILY_WEIGHT_POLICIES = ('first', 'last', 'mean')
+
+def slice_series(series, from_date, to_date):
+    """
+    日次集計の列から指定期間の部分を取り出す（二分探索のため期間の長さによらず一定のコスト）
+    
+    引数:
+        series (DailySeries): 日付順の日次集計の列
+        from_date (date): 開始日
+        to_date (date): 終了日
+        
+    戻り値:
+        DailySeries: 指定期間の列
+    """
+    lo = np.searchsorted(series.dates, np.datetime64(from_date, 'D'), side='left')
+    hi = np.searchsorted(series.dates, np.datetime64(to_date, 'D'), side='right')
+    return type(series)(*(column[lo:hi] for column in series))
+
+def daily_actual_weights(series, policy='first'):
+    """
+    日次集計から日ごとの実測値を取り出す
+    
+    引数:
+        series (DailySeries): 日次集計の列
+        policy (str): first, last, mean のいずれか
+        
+    戻り値:
+        ndarray: 日ごとの体重
+    """
+    if policy == 'mean':
+        return np.round(series.mean_weight, 2)
+    if policy == 'last':
+        return series.last_weight
+    return series.first_weight
+
+def projected_completion_date(goal, projection, today):
+    """
+    予測の傾きから目標の達成予定日を計算
+    
+    引数:
+        goal (WeightGoal): 体重目標
+        projection (Projection): 予測結果
+        today (date): 基準日
+        
+    戻り値:
+        date または None: 目標に向かっていない場合はNone
+    """
+    slope = projection.slope
+    if (goal.target_weight > goal.start_weight and slope > 0) or \
+       (goal.target_weight < goal.start_weight and slope < 0):
+        days_to_goal = max((goal.target_weight - projection.level) / slope, 0)
+        return today + timedelta(days=round(days_to_goal))
+    return None
+
+def summarize_diff(goal, series, today, policy='first'):
+    """
+    目標の理想の推移と実測値の差分を要約
+    
+    引数:
+        goal (WeightGoal): 体重目標
+        series (DailySeries): 目標の開始日以降を含む日次集計の列
+        today (date): 基準日
+        policy (str): 1日に複数の記録がある場合の集約方法
+        
+    戻り値:
+        dict: days_elapsed, days_with_data, latest_date, latest_difference, mean_difference, on_track
+    """
+    end_date = min(today, goal.target_date)
+    window = slice_series(series, goal.start_date, end_date)
+    summary = {
+        'days_elapsed': max((end_date - goal.start_date).days + 1, 0),
+        'days_with_data': len(window),
+        'latest_date': None,
+        'latest_difference': None,
+        'mean_difference': None,
+        'on_track': None
+    }
+    if not len(window):
+        return summary
+    
+    total_days = (goal.target_date - goal.start_date).days
+    daily_target_change = (goal.target_weight - goal.start_weight) / total_days if total_days > 0 else 0
+    offsets = (window.dates - np.datetime64(goal.start_date, 'D')).astype(np.int64)
+    differences = daily_actual_weights(window, policy) - (goal.start_weight + daily_target_change * offsets)
+    
+    latest = float(differences[-1])
+    losing = goal.target_weight < goal.start_weight
+    summary.update({
+        'latest_date': str(window.dates[-1]),
+        'latest_difference': round(latest, 1),
+        'mean_difference': round(float(differences.mean()), 1),
+        'on_track': latest <= 0 if losing else latest >= 0
+    })
+    return summary
+
+def summarize_projection(goal, series, today, model, lookback):
+    """
+    直近の日次集計から目標日の体重と達成予定日を予測
+    
+    引数:
+        goal (WeightGoal): 体重目標
+        series (DailySeries): 直近 lookback 日を含む日次集計の列
+        today (date): 基準日
+        model (str): 予測モデル
+        lookback (int): 予測に使用する直近の日数
+        
+    戻り値:
+        dict: model, avg_change_per_day, estimated_weight, projected_target_weight,
+            projected_completion_date, insufficient_data（データ不足時は予測値がNone）
+    """
+    recent = slice_series(series, today - timedelta(days=lookback), today)
+    if len(recent) < 2:
+        return {
+            'model': None,
+            'avg_change_per_day': None,
+            'estimated_weight': None,
+            'projected_target_weight': None,
+            'projected_completion_date': None,
+            'insufficient_data': True
+        }
+    
+    horizon = max((goal.target_date - today).days, 1)
+    projection = project_weights(recent, today, horizon, model)
+    completion = projected_completion_date(goal, projection, today)
+    return {
+        'model': model,
+        'avg_change_per_day': projection.slope,
+        'estimated_weight': round(projection.level, 2),
+        'projected_target_weight': round(float(projection.mean[-1]), 1),
+        'projected_completion_date': completion.isoformat() if completion else None,
+        'insufficient_data': False
+    }
+
+def evaluate_goal(goal, series, latest_weight, today, model, lookback, policy='first'):
+    """
+    1つの目標の進捗・差分の要約・予測をまとめて評価
+    
+    戻り値:
+        dict: goal, diff, projection
+    """
+    return {
+        'goal': goal.to_dict(latest_weight),
+        'diff': summarize_diff(goal, series, today, policy),
+        'projection': summarize_projection(goal, series, today, model, lookback)
+    }
+
+def _evaluation_options(today, model, lookback):
+    config = current_app.config
+    return (
+        today or datetime.now().date(),
+        model or config['WEIGHT_PROJECTION_MODEL'],
+        lookback or config['WEIGHT_PROJECTION_LOOKBACK_DAYS']
+    )
+
+def evaluate_user_goals(user_id, goals, today=None, model=None, lookback=None, policy='first'):
+    """
+    ユーザーの目標をまとめて評価（日次集計の読み込みは1回）
+    
+    引数:
+        user_id (str): ユーザー識別子
+        goals (list): 評価する WeightGoal のリスト
+        today (date): 基準日（デフォルトは今日）
+        model (str): 予測モデル（デフォルトは WEIGHT_PROJECTION_MODEL）
+        lookback (int): 予測に使用する直近の日数（デフォルトは WEIGHT_PROJECTION_LOOKBACK_DAYS）
+        policy (str): 1日に複数の記録がある場合の集約方法
+        
+    戻り値:
+        list: evaluate_goal() の結果のリスト
+    """
+    if not goals:
+        return []
+    today, model, lookback = _evaluation_options(today, model, lookback)
+    
+    from_date = min(min(goal.start_date for goal in goals), today - timedelta(days=lookback))
+    series = load_daily_series(user_id, from_date, today)
+    latest_weight = FitbitWeight.latest_weight(user_id)
+    
+    return [evaluate_goal(goal, series, latest_weight, today, model, lookback, policy) for goal in goals]
+
+def evaluate_all_active_goals(today=None, model=None, lookback=None, policy='first', batch_size=5000):
+    """
+    全ユーザーのアクティブな目標を評価
+    
+    アクティブな目標を1回のクエリで取得し、日次集計をユーザー・日付順に1回走査する。
+    ユーザーの最新体重は走査した期間の最後の記録を使用する。
+    
+    引数:
+        today (date): 基準日（デフォルトは今日）
+        model (str): 予測モデル（デフォルトは WEIGHT_PROJECTION_MODEL）
+        lookback (int): 予測に使用する直近の日数（デフォルトは WEIGHT_PROJECTION_LOOKBACK_DAYS）
+        policy (str): 1日に複数の記録がある場合の集約方法
+        batch_size (int): 1回のフェッチで読み込む行数
+        
+    戻り値:
+        generator: (user_id, evaluate_goal() の結果のリスト) をユーザー順に返す
+    """
+    today, model, lookback = _evaluation_options(today, model, lookback)
+    
+    goals = WeightGoal.query.filter_by(is_achieved=False).order_by(WeightGoal.user_id, WeightGoal.target_date).all()
+    if not goals:
+        return
+    goals_by_user = {user_id: list(user_goals) for user_id, user_goals in groupby(goals, key=lambda g: g.user_id)}
+    from_date = min(min(goal.start_date for goal in goals), today - timedelta(days=lookback))
+    
+    def evaluate(user_id, rows):
+        series = series_from_rows(rows)
+        latest_weight = float(series.last_weight[-1]) if len(series) else None
+        return user_id, [
+            evaluate_goal(goal, series, latest_weight, today, model, lookback, policy)
+            for goal in goals_by_user.pop(user_id)
+        ]
+    
+    rows = db.session.execute(
+        select(FitbitWeightDaily.user_id, *DAILY_SERIES_COLUMNS)
+        .where(FitbitWeightDaily.date >= from_date, FitbitWeightDaily.date <= today)
+        .order_by(FitbitWeightDaily.user_id, FitbitWeightDaily.date)
+        .execution_options(yield_per=batch_size)
+    )
+    for user_id, user_rows in groupby(rows, key=lambda row: row[0]):
+        if user_id in goals_by_user:
+            yield evaluate(user_id, [tuple(row[1:]) for row in user_rows])
+    
+    # 期間内に記録のないユーザー
+    for user_id in sorted(goals_by_user):
+        yield evaluate(user_id, [])
@@ -0,0 +1,362 @@
+"""
+リクエストの計測とプロファイリング
+
+- ルート（URLルール・メソッド・ステータス）ごとのリクエスト数と応答時間のヒストグラム
+- リクエストごとのSQLクエリ数・クエリ時間（SQLAlchemy のエンジンイベントで計測）
+- render_prometheus() で上記とFitbit API呼び出し・キャッシュのヒット率をPrometheusのテキスト形式で出力
+- PROFILING_ENABLED の場合（開発環境のみ有効）、?profile=1 を付けたリクエストを cProfile で計測し、
+  応答の代わりに結果を返す（pyinstrument がインストールされていれば ?profile=pyinstrument も使用できる）。
+  プロファイリングは register_instrumentation() に渡した判定関数が許可したリクエストに限る
+
+計測値はプロセスごとに保持する（gunicorn の複数ワーカーでは各ワーカーの値になる）。
+"""
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from flask import Response, current_app, has_request_context, jsonify, request
+from sqlalchemy import event
+from models import db
+
+# 応答時間・クエリ時間のヒストグラムのバケット境界（秒）
+REQUEST_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# リクエストあたりのクエリ数のヒストグラムのバケット境界
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# request.environ に保存するリクエストごとの計測状態のキー
+_STARTED_KEY = 'weight_goal.request_started'
+_QUERIES_KEY = 'weight_goal.query_stats'
+_PROFILER_KEY = 'weight_goal.profiler'
+
+# ルールに一致しなかったリクエストのルート名（パスをそのままラベルにしない）
+UNMATCHED_ROUTE = '<unmatched>'
+
+class Histogram:
+    """
+    バケットごとの件数と合計値（ロックは呼び出し元で取得する）
+    
+    属性:
+        bounds (tuple): バケットの上限（昇順）
+        counts (list): バケットごとの件数（累積しない。最後は上限なし）
+        sum (float): 観測値の合計
+        count (int): 観測数
+    """
+    
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+    
+    def cumulative(self):
+        """Prometheus の le ラベルごとの累積件数のリスト（(上限, 件数)。最後の上限は '+Inf'）"""
+        result = []
+        total = 0
+        for bound, count in zip(self.bounds + ('+Inf',), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+class RequestMetrics:
+    """
+    ルートごとのリクエスト数・応答時間・クエリ数の計測値（スレッドセーフ）
+    
+    リクエストの外（バックグラウンドワーカーなど）で実行されたクエリは background_* に集計する。
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """計測値を初期化"""
+        with self._lock:
+            self.requests = {}
+            self.latency = {}
+            self.query_counts = {}
+            self.query_seconds = {}
+            self.background_queries = 0
+            self.background_query_seconds = 0.0
+    
+    def observe_request(self, route, method, status, seconds, queries, query_seconds):
+        """
+        リクエスト1件分を記録
+        
+        引数:
+            route (str): URLルール
+            method (str): HTTPメソッド
+            status (int): ステータスコード
+            seconds (float): 応答時間
+            queries (int): 実行したクエリ数
+            query_seconds (float): クエリの合計時間
+        """
+        key = (route, method)
+        with self._lock:
+            self.requests[(route, method, str(status))] = self.requests.get((route, method, str(status)), 0) + 1
+            if key not in self.latency:
+                self.latency[key] = Histogram(REQUEST_LATENCY_BUCKETS)
+                self.query_counts[key] = Histogram(QUERY_COUNT_BUCKETS)
+                self.query_seconds[key] = Histogram(REQUEST_LATENCY_BUCKETS)
+            self.latency[key].observe(seconds)
+            self.query_counts[key].observe(queries)
+            self.query_seconds[key].observe(query_seconds)
+    
+    def observe_background_query(self, seconds):
+        """リクエストの外で実行されたクエリ1件分を記録"""
+        with self._lock:
+            self.background_queries += 1
+            self.background_query_seconds += seconds
+    
+    def snapshot(self):
+        """
+        計測値のスナップショットを取得
+        
+        戻り値:
+            dict: requests（(route, method, status) → 件数）、
+                latency・query_counts・query_seconds（(route, method) → (累積件数, 合計, 観測数)）、
+                background_queries、background_query_seconds
+        """
+        with self._lock:
+            snapshot = {
+                name: {key: (histogram.cumulative(), histogram.sum, histogram.count) for key, histogram in values.items()}
+                for name, values in (
+                    ('latency', self.latency), ('query_counts', self.query_counts), ('query_seconds', self.query_seconds)
+                )
+            }
+            snapshot.update(
+                requests=dict(self.requests),
+                background_queries=self.background_queries,
+                background_query_seconds=self.background_query_seconds
+            )
+            return snapshot
+
+def get_request_metrics(app=None):
+    """
+    アプリケーションで共有するリクエストの計測値を取得
+    
+    戻り値:
+        RequestMetrics: 計測値
+    """
+    app = app or current_app
+    metrics = app.extensions.get('request_metrics')
+    if metrics is None:
+        metrics = app.extensions['request_metrics'] = RequestMetrics()
+    return metrics
+
+def _route_label():
+    return request.url_rule.rule if request.url_rule is not None else UNMATCHED_ROUTE
+
+def _register_query_events(app, engine):
+    """エンジンにクエリ数・時間を計測するイベントを登録（登録済みなら何もしない）"""
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('weight_goal.query_started', []).append(time.perf_counter())
+    
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('weight_goal.query_started')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        if has_request_context() and _QUERIES_KEY in request.environ:
+            stats = request.environ[_QUERIES_KEY]
+            stats[0] += 1
+            stats[1] += elapsed
+        else:
+            get_request_metrics(app).observe_background_query(elapsed)
+    
+    def handle_error(context):
+        started = context.connection.info.get('weight_goal.query_started') if context.connection is not None else None
+        if started:
+            started.pop()
+    
+    if getattr(engine, '_weight_goal_instrumented', False):
+        return
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    event.listen(engine, 'handle_error', handle_error)
+    engine._weight_goal_instrumented = True
+
+def _start_request(authorize_profile):
+    request.environ[_STARTED_KEY] = time.perf_counter()
+    request.environ[_QUERIES_KEY] = [0, 0.0]
+    
+    mode = request.args.get('profile')
+    if not mode or not current_app.config['PROFILING_ENABLED']:
+        return None
+    if authorize_profile is None or not authorize_profile():
+        return jsonify({'error': 'Profiling requires METRICS_TOKEN or an authenticated user'}), 401
+    
+    if mode == 'pyinstrument':
+        # pyinstrument は任意の依存関係（開発環境でのみインストールする）
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            return jsonify({'error': 'pyinstrument is not installed'}), 400
+        profiler = Profiler()
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    request.environ[_PROFILER_KEY] = profiler
+    return None
+
+def _finish_request(response):
+    started = request.environ.pop(_STARTED_KEY, None)
+    if started is None:
+        return response
+    
+    profiler = request.environ.pop(_PROFILER_KEY, None)
+    if profiler is not None and response.is_streamed:
+        # プロファイリングではストリーミング応答の本文の生成まで計測する
+        response.make_sequence()
+    
+    # （プロファイリング以外では、ストリーミング応答の本文の生成中のクエリは数えない）
+    queries, query_seconds = request.environ[_QUERIES_KEY]
+    elapsed = time.perf_counter() - started
+    if profiler is not None:
+        return _profile_response(profiler, response, elapsed, queries, query_seconds)
+    
+    if current_app.config['METRICS_ENABLED']:
+        get_request_metrics().observe_request(_route_label(), request.method, response.status_code,
+                                              elapsed, queries, query_seconds)
+    response.headers['Server-Timing'] = (
+        f'app;dur={elapsed * 1000:.1f}, db;dur={query_seconds * 1000:.1f};desc="{queries} queries"'
+    )
+    return response
+
+def _profile_response(profiler, response, elapsed, queries, query_seconds):
+    """プロファイラーを停止し、結果を応答として返す"""
+    summary = (f'{request.method} {request.full_path.rstrip("?")} -> {response.status_code}\n'
+               f'elapsed {elapsed * 1000:.1f} ms, {queries} queries in {query_seconds * 1000:.1f} ms\n')
+    
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        output = io.StringIO()
+        output.write(summary + '\n')
+        stats = pstats.Stats(profiler, stream=output)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(current_app.config['PROFILE_TOP_N'])
+        result = Response(output.getvalue(), mimetype='text/plain')
+    else:
+        profiler.stop()
+        result = Response(profiler.output_html(), mimetype='text/html')
+    
+    result.headers['X-Profile-Status'] = str(response.status_code)
+    result.headers['X-Profile-Queries'] = str(queries)
+    return result
+
+def register_instrumentation(app, authorize_profile=None):
+    """
+    リクエストの計測・プロファイリングのフックとクエリのエンジンイベントを登録
+    
+    引数:
+        app (Flask): Flaskアプリケーション
+        authorize_profile (callable): リクエストのプロファイリングを許可するかを返す関数
+            （リクエストコンテキスト内で呼び出す。Noneならプロファイリングを受け付けない）
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            _register_query_events(app, engine)
+    app.before_request(functools.partial(_start_request, authorize_profile))
+    app.after_request(_finish_request)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}' if labels else ''
+
+def _write_histogram(lines, name, help_text, values):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for (route, method), (buckets, total, count) in sorted(values.items()):
+        for bound, cumulative in buckets:
+            lines.append(f'{name}_bucket{_labels(route=route, method=method, le=bound)} {cumulative}')
+        lines.append(f'{name}_sum{_labels(route=route, method=method)} {total}')
+        lines.append(f'{name}_count{_labels(route=route, method=method)} {count}')
+
+def _write_metric(lines, name, metric_type, help_text, samples):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {metric_type}')
+    for labels, value in samples:
+        lines.append(f'{name}{_labels(**labels)} {value}')
+
+def _cache_snapshots(app):
+    """計測値を持つキャッシュの名前とスナップショット（作成済みのキャッシュのみ）"""
+    caches = (
+        ('result', app.extensions.get('result_cache')),
+        ('api_token', app.extensions.get('api_token_cache')),
+        ('fitbit_token', app.extensions.get('fitbit_token_cache'))
+    )
+    return [(name, cache.stats.snapshot(), len(cache)) for name, cache in caches if cache is not None]
+
+def render_prometheus(app=None):
+    """
+    計測値をPrometheusのテキスト形式で出力
+    
+    引数:
+        app (Flask): Flaskアプリケーション（デフォルトは current_app）
+    
+    戻り値:
+        str: テキスト形式の計測値
+    """
+    app = app or current_app._get_current_object()
+    snapshot = get_request_metrics(app).snapshot()
+    
+    lines = []
+    _write_metric(lines, 'weight_goal_http_requests_total', 'counter', 'HTTP requests by route, method and status.', [
+        ({'route': route, 'method': method, 'status': status}, count)
+        for (route, method, status), count in sorted(snapshot['requests'].items())
+    ])
+    _write_histogram(lines, 'weight_goal_http_request_duration_seconds', 'HTTP request latency.', snapshot['latency'])
+    _write_histogram(lines, 'weight_goal_http_request_db_queries', 'SQL queries executed per request.',
+                     snapshot['query_counts'])
+    _write_histogram(lines, 'weight_goal_http_request_db_seconds', 'Time spent in SQL queries per request.',
+                     snapshot['query_seconds'])
+    _write_metric(lines, 'weight_goal_db_background_queries_total', 'counter',
+                  'SQL queries executed outside requests.', [({}, snapshot['background_queries'])])
+    _write_metric(lines, 'weight_goal_db_background_query_seconds_total', 'counter',
+                  'Time spent in SQL queries outside requests.', [({}, snapshot['background_query_seconds'])])
+    
+    caches = _cache_snapshots(app)
+    for counter in ('hits', 'misses', 'evictions'):
+        _write_metric(lines, f'weight_goal_cache_{counter}_total', 'counter', f'Cache {counter} by cache.', [
+            ({'cache': name}, snapshot[counter]) for name, snapshot, _ in caches
+        ])
+    _write_metric(lines, 'weight_goal_cache_hit_ratio', 'gauge', 'Cache hit ratio since process start.', [
+        ({'cache': name}, snapshot['hit_ratio']) for name, snapshot, _ in caches if snapshot['hit_ratio'] is not None
+    ])
+    _write_metric(lines, 'weight_goal_cache_entries', 'gauge', 'Cached entries by cache.', [
+        ({'cache': name}, entries) for name, _, entries in caches
+    ])
+    
+    client = app.extensions.get('fitbit_client')
+    if client is not None:
+        fitbit = client.metrics.snapshot()
+        _write_metric(lines, 'weight_goal_fitbit_api_calls_total', 'counter', 'Fitbit API calls by status.', [
+            ({'status': status}, count) for status, count in sorted(fitbit['calls'].items())
+        ])
+        name = 'weight_goal_fitbit_api_duration_seconds'
+        lines.append(f'# HELP {name} Fitbit API call latency.')
+        lines.append(f'# TYPE {name} histogram')
+        for bucket in fitbit['latency']['histogram']:
+            lines.append(f'{name}_bucket{_labels(le="+Inf" if bucket["le"] == "inf" else bucket["le"])} {bucket["count"]}')
+        lines.append(f'{name}_sum {fitbit["latency"]["sum_seconds"]}')
+        lines.append(f'{name}_count {fitbit["total_calls"]}')
+        _write_metric(lines, 'weight_goal_fitbit_api_retries_total', 'counter', 'Fitbit API retries.',
+                      [({}, fitbit['retries'])])
+        _write_metric(lines, 'weight_goal_fitbit_api_throttle_waits_total', 'counter',
+                      'Fitbit API calls delayed by the client-side rate limiter.', [({}, fitbit['throttle']['waits'])])
+        _write_metric(lines, 'weight_goal_fitbit_api_throttle_wait_seconds_total', 'counter',
+                      'Time spent waiting for the client-side rate limiter.', [({}, fitbit['throttle']['wait_seconds'])])
+        _write_metric(lines, 'weight_goal_fitbit_api_throttle_rejections_total', 'counter',
+                      'Fitbit API calls rejected by the client-side rate limiter.',
+                      [({}, fitbit['throttle']['rejections'])])
+    
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,98 @@
+import threading
+import time
+
+class TokenBucket:
+    """
+    スレッドセーフなトークンバケット
+    
+    capacity 個までのトークンを保持し、refill_per_second の速度で補充する。
+    acquire() はトークンが得られるまで待機する。
+    
+    属性:
+        capacity (float): バケットの最大トークン数
+        refill_per_second (float): 1秒あたりの補充量
+    """
+    
+    def __init__(self, capacity, refill_per_second, clock=time.monotonic, sleep=time.sleep):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._window_reset_at = None
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+    
+    def _refill(self, now):
+        if self._window_reset_at is not None:
+            # サーバーの残り回数に同期中は、時間枠のリセットまで補充しない
+            if now >= self._window_reset_at:
+                self._tokens = self.capacity + min(0.0, self._tokens)
+                self._window_reset_at = None
+            self._updated = now
+            return
+        elapsed = max(0.0, now - self._updated)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_per_second)
+        self._updated = now
+    
+    def reserve(self, tokens=1):
+        """
+        トークンを予約し、利用可能になるまでの待ち時間を返す
+        
+        引数:
+            tokens (float): 消費するトークン数
+            
+        戻り値:
+            float: 待機すべき秒数（0ならすぐに利用可能）
+        """
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            if self._window_reset_at is not None:
+                return self._window_reset_at - self._updated
+            if self.refill_per_second <= 0:
+                return float('inf')
+            return -self._tokens / self.refill_per_second
+    
+    def release(self, tokens=1):
+        """
+        予約したトークンを返却（待機せずに処理を中止した場合に使用）
+        
+        引数:
+            tokens (float): 返却するトークン数
+        """
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + tokens)
+    
+    def sync(self, remaining, reset_seconds):
+        """
+        サーバーから通知された残り回数で状態を同期
+        
+        時間枠のリセットまでは補充を止め、リセット時に最大数まで補充する。
+        
+        引数:
+            remaining (float): 現在の時間枠で残っている呼び出し回数
+            reset_seconds (float): 時間枠がリセットされるまでの秒数
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._tokens = min(self.capacity, float(remaining))
+            self._window_reset_at = now + max(0.0, float(reset_seconds))
+    
+    def acquire(self, tokens=1):
+        """
+        トークンを取得（必要なら待機）
+        
+        引数:
+            tokens (float): 消費するトークン数
+            
+        戻り値:
+            float: 実際に待機した秒数
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
@@ -0,0 +1,264 @@
+"""
+計算結果のキャッシュ
+
+目標の差分・予測などの応答をキャッシュする。キーにはデータバージョンを含めるため、
+体重記録や目標が書き込まれると古い結果は参照されなくなる（複数ワーカー間でも一貫する）。
+さらにコミット後の通知で、変更された対象（ユーザー）のエントリを積極的に削除する。
+
+バックエンド:
+    memory: プロセス内のLRU（TTL付き）。デフォルト
+    sqlite: ローカルのSQLiteファイル。gunicornの複数ワーカーでキャッシュを共有する
+    none: キャッシュしない
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from .data_version import add_data_change_listener
+
+class CacheStats:
+    """
+    キャッシュのヒット・ミス・追い出しの件数（プロセスごと）
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+    
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._counts[name] += amount
+    
+    def snapshot(self):
+        """
+        計測値のスナップショットを取得
+        
+        戻り値:
+            dict: 各件数とヒット率
+        """
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts['hits'] + counts['misses']
+        counts['hit_ratio'] = round(counts['hits'] / lookups, 4) if lookups else None
+        return counts
+
+class MemoryResultCache:
+    """
+    プロセス内のLRUキャッシュ（TTL付き）
+    
+    引数:
+        max_entries (int): 最大エントリ数（超えた場合は最も古く参照されたものから削除）
+        ttl (float): エントリの有効秒数
+        clock (callable): 現在時刻（秒）を返す関数
+    """
+    backend = 'memory'
+    
+    def __init__(self, max_entries=1024, ttl=300, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+    
+    def get(self, key):
+        """
+        エントリを取得
+        
+        戻り値:
+            object または None: キャッシュされた値（ない場合・期限切れの場合はNone）
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= self._clock():
+                del self._entries[key]
+                self.stats.incr('expirations')
+                entry = None
+            if entry is None:
+                self.stats.incr('misses')
+                return None
+            self._entries.move_to_end(key)
+            self.stats.incr('hits')
+            return entry[1]
+    
+    def set(self, key, scope, value):
+        """
+        エントリを保存
+        
+        引数:
+            key (str): キー
+            scope (str): 無効化の単位（ユーザー識別子など）
+            value (object): 値
+        """
+        with self._lock:
+            self._entries[key] = (scope, value, self._clock() + self.ttl)
+            self._entries.move_to_end(key)
+            self.stats.incr('sets')
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.incr('evictions')
+    
+    def invalidate(self, scopes):
+        """
+        対象のエントリをすべて削除
+        
+        引数:
+            scopes (iterable): ユーザー識別子などの集合
+        """
+        scopes = set(scopes)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry[0] in scopes]
+            for key in stale:
+                del self._entries[key]
+        self.stats.incr('invalidations', len(stale))
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+
+class SQLiteResultCache:
+    """
+    ローカルのSQLiteファイルによる共有キャッシュ（同じホストの複数ワーカーで共有）
+    
+    値はバイト列として保存する。件数が上限を超えた場合は最も古く参照されたものから削除する。
+    
+    引数:
+        path (str): キャッシュファイルのパス
+        max_entries (int): 最大エントリ数
+        ttl (float): エントリの有効秒数
+        clock (callable): 現在時刻（秒）を返す関数
+    """
+    backend = 'sqlite'
+    
+    def __init__(self, path, max_entries=1024, ttl=300, clock=time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._local = threading.local()
+        self.stats = CacheStats()
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS result_cache ('
+                'key TEXT PRIMARY KEY, scope TEXT NOT NULL, value BLOB NOT NULL, '
+                'expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS idx_result_cache_scope ON result_cache (scope)')
+            connection.execute('CREATE INDEX IF NOT EXISTS idx_result_cache_accessed ON result_cache (accessed_at)')
+    
+    def _connect(self):
+        """スレッドごとの接続を取得"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+    
+    def get(self, key):
+        now = self._clock()
+        connection = self._connect()
+        row = connection.execute('SELECT value, expires_at FROM result_cache WHERE key = ?', (key,)).fetchone()
+        if row is not None and row[1] <= now:
+            connection.execute('DELETE FROM result_cache WHERE key = ?', (key,))
+            self.stats.incr('expirations')
+            row = None
+        if row is None:
+            self.stats.incr('misses')
+            return None
+        connection.execute('UPDATE result_cache SET accessed_at = ? WHERE key = ?', (now, key))
+        self.stats.incr('hits')
+        return bytes(row[0])
+    
+    def set(self, key, scope, value):
+        now = self._clock()
+        connection = self._connect()
+        connection.execute(
+            'INSERT OR REPLACE INTO result_cache (key, scope, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+            (key, scope, value, now + self.ttl, now)
+        )
+        self.stats.incr('sets')
+        
+        # 上限を超えた分を、期限切れ・参照の古いものから削除
+        excess = connection.execute('SELECT COUNT(*) FROM result_cache').fetchone()[0] - self.max_entries
+        if excess > 0:
+            expired = connection.execute('DELETE FROM result_cache WHERE expires_at <= ?', (now,)).rowcount
+            self.stats.incr('expirations', expired)
+            excess -= expired
+        if excess > 0:
+            connection.execute(
+                'DELETE FROM result_cache WHERE key IN '
+                '(SELECT key FROM result_cache ORDER BY accessed_at LIMIT ?)', (excess,)
+            )
+            self.stats.incr('evictions', excess)
+    
+    def invalidate(self, scopes):
+        scopes = list(scopes)
+        if not scopes:
+            return
+        placeholders = ','.join('?' * len(scopes))
+        removed = self._connect().execute(
+            f'DELETE FROM result_cache WHERE scope IN ({placeholders})', scopes
+        ).rowcount
+        self.stats.incr('invalidations', removed)
+    
+    def clear(self):
+        self._connect().execute('DELETE FROM result_cache')
+    
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM result_cache').fetchone()[0]
+
+def create_result_cache(config, instance_path=None):
+    """
+    設定からキャッシュを作成
+    
+    引数:
+        config (dict): アプリケーション設定
+        instance_path (str): RESULT_CACHE_PATH の相対パスの基準
+            （メインのSQLiteデータベースと同じく app.instance_path。Noneなら現在のディレクトリ）
+        
+    戻り値:
+        MemoryResultCache, SQLiteResultCache または None（無効の場合）
+    """
+    backend = config['RESULT_CACHE_BACKEND']
+    if backend == 'none':
+        return None
+    if backend == 'memory':
+        return MemoryResultCache(config['RESULT_CACHE_MAX_ENTRIES'], config['RESULT_CACHE_TTL'])
+    if backend == 'sqlite':
+        path = config['RESULT_CACHE_PATH']
+        if instance_path and not os.path.isabs(path):
+            path = os.path.join(instance_path, path)
+        return SQLiteResultCache(path, config['RESULT_CACHE_MAX_ENTRIES'], config['RESULT_CACHE_TTL'])
+    raise ValueError(f'Unknown RESULT_CACHE_BACKEND: {backend}')
+
+def get_result_cache():
+    """
+    アプリケーションで共有する結果キャッシュを取得
+    
+    戻り値:
+        MemoryResultCache, SQLiteResultCache または None（無効の場合）
+    """
+    if 'result_cache' not in current_app.extensions:
+        current_app.extensions['result_cache'] = create_result_cache(current_app.config,
+                                                                       current_app.instance_path)
+    return current_app.extensions['result_cache']
+
+def _invalidate_cached_results(scopes):
+    """データ変更のコミット後に対象のエントリを削除"""
+    cache = current_app.extensions.get('result_cache')
+    if cache is not None:
+        cache.invalidate(scopes)
+
+def register_result_cache_hooks():
+    """データ変更時に結果キャッシュを無効化する通知を登録"""
+    add_data_change_listener(_invalidate_cached_results)
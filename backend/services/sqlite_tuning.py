@@ -0,0 +1,85 @@
+"""
+SQLite接続のチューニング
+
+接続を作成するたびに engine の connect イベントで PRAGMA を設定する。
+WALモードでは読み取りと書き込みが互いをブロックしないため、
+複数ワーカーから同時にアクセスしても database is locked になりにくい。
+"""
+import re
+import weakref
+from sqlalchemy import event
+from models import db
+
+# 設定できるPRAGMAと値の形式
+SQLITE_PRAGMA_NAMES = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store')
+
+_VALUE_PATTERN = re.compile(r'^(-?\d+|[A-Za-z]+)$')
+
+# PRAGMAの設定を登録済みのエンジン
+_tuned_engines = weakref.WeakSet()
+
+def pragma_statements(pragmas):
+    """
+    PRAGMAの設定からSQL文を作成
+    
+    引数:
+        pragmas (dict): PRAGMA名 -> 値（Noneの項目は設定しない）
+        
+    戻り値:
+        list: PRAGMA文のリスト（journal_mode を最初に設定する）
+        
+    例外:
+        ValueError: 未知のPRAGMA名または不正な値の場合
+    """
+    statements = []
+    for name in SQLITE_PRAGMA_NAMES:
+        value = pragmas.get(name)
+        if value is None:
+            continue
+        if not _VALUE_PATTERN.match(str(value)):
+            raise ValueError(f'Invalid value for PRAGMA {name}: {value!r}')
+        statements.append(f'PRAGMA {name}={value}')
+    
+    unknown = set(pragmas) - set(SQLITE_PRAGMA_NAMES)
+    if unknown:
+        raise ValueError(f'Unknown SQLite PRAGMA: {", ".join(sorted(unknown))}')
+    return statements
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """
+    エンジンの新しい接続ごとにPRAGMAを設定する（SQLite以外と登録済みのエンジンは何もしない）
+    
+    引数:
+        engine (Engine): SQLAlchemyエンジン
+        pragmas (dict): PRAGMA名 -> 値
+        
+    戻り値:
+        bool: 登録した場合 True
+    """
+    if engine.dialect.name != 'sqlite' or engine in _tuned_engines:
+        return False
+    statements = pragma_statements(pragmas)
+    
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+    
+    _tuned_engines.add(engine)
+    return True
+
+def register_sqlite_pragmas(app):
+    """
+    アプリケーションのSQLiteエンジンに SQLITE_PRAGMAS の設定を登録
+    
+    引数:
+        app (Flask): Flaskアプリケーション
+    """
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    with app.app_context():
+        for engine in db.engines.values():
+            apply_sqlite_pragmas(engine, pragmas)
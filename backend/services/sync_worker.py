@@ -0,0 +1,342 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update, and_, or_
+from models import db, FitbitAuth, FitbitSubscription, FitbitSyncJob, FitbitSyncState
+from .fitbit_client import RateLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+def enqueue_sync(user_id, kind='sync', from_date=None, to_date=None):
+    """
+    同期ジョブを登録（同じ内容の未実行ジョブがあればそれを返す）
+    
+    引数:
+        user_id (str): ユーザー識別子
+        kind (str): ジョブの種類（sync, day, backfill）
+        from_date (date): 同期する期間の開始日
+        to_date (date): 同期する期間の終了日
+        
+    戻り値:
+        FitbitSyncJob: 登録された（または既存の）ジョブ
+    """
+    job = FitbitSyncJob.query.filter_by(
+        user_id=user_id, kind=kind, from_date=from_date, to_date=to_date, status='pending'
+    ).first()
+    
+    if job is None:
+        job = FitbitSyncJob(user_id=user_id, kind=kind, from_date=from_date, to_date=to_date)
+        db.session.add(job)
+        db.session.commit()
+    
+    worker = current_app.extensions.get('fitbit_sync_worker')
+    if worker is not None:
+        worker.notify()
+    
+    return job
+
+def schedule_periodic_syncs(now=None):
+    """
+    同期間隔を過ぎた連携済みユーザーの同期ジョブを登録
+    
+    Webhookを購読しているユーザーの同期間隔は FITBIT_SUBSCRIBED_SYNC_INTERVAL とする。
+    
+    実行中のまま一定時間が経過したジョブ（ワーカーの異常終了など）は再実行待ちに戻す。
+    
+    引数:
+        now (datetime): 現在日時（UTC）
+        
+    戻り値:
+        int: 登録したジョブ数
+    """
+    now = now or datetime.utcnow()
+    config = current_app.config
+    
+    # 放置された実行中ジョブを再実行待ちに戻す
+    db.session.execute(
+        update(FitbitSyncJob)
+        .where(
+            FitbitSyncJob.status == 'running',
+            FitbitSyncJob.started_at < now - timedelta(seconds=config['FITBIT_SYNC_JOB_TIMEOUT'])
+        )
+        .values(status='pending')
+    )
+    
+    stale_before = now - timedelta(seconds=config['FITBIT_SYNC_INTERVAL'])
+    # Webhookを購読しているユーザーは通知で同期されるため、取りこぼしの確認として間隔を延ばす
+    subscribed_stale_before = now - timedelta(seconds=config['FITBIT_SUBSCRIBED_SYNC_INTERVAL'])
+    
+    # 未完了の同期ジョブがあるユーザーは対象外
+    queued = db.select(FitbitSyncJob.user_id).where(
+        FitbitSyncJob.kind == 'sync',
+        FitbitSyncJob.status.in_(('pending', 'running'))
+    )
+    
+    user_ids = [
+        user_id for (user_id,) in db.session.query(FitbitAuth.user_id)
+        .outerjoin(FitbitSyncState, FitbitSyncState.user_id == FitbitAuth.user_id)
+        .outerjoin(FitbitSubscription, FitbitSubscription.user_id == FitbitAuth.user_id)
+        .filter(
+            or_(
+                FitbitSyncState.last_attempt_at.is_(None),
+                and_(FitbitSubscription.id.is_(None), FitbitSyncState.last_attempt_at < stale_before),
+                and_(FitbitSubscription.id.isnot(None), FitbitSyncState.last_attempt_at < subscribed_stale_before)
+            ),
+            FitbitAuth.user_id.notin_(queued)
+        )
+    ]
+    
+    for user_id in user_ids:
+        db.session.add(FitbitSyncJob(user_id=user_id, kind='sync'))
+    db.session.commit()
+    
+    return len(user_ids)
+
+def claim_next_job(now=None):
+    """
+    実行可能な最も古いジョブを取得して実行中にする
+    
+    複数のワーカー・プロセスが同時に呼び出しても、
+    条件付きUPDATEにより1つのジョブは1つのワーカーだけが取得する。
+    
+    戻り値:
+        FitbitSyncJob または None: 取得したジョブ
+    """
+    now = now or datetime.utcnow()
+    
+    while True:
+        job = FitbitSyncJob.query.filter(
+            FitbitSyncJob.status == 'pending',
+            or_(FitbitSyncJob.run_after.is_(None), FitbitSyncJob.run_after <= now)
+        ).order_by(FitbitSyncJob.requested_at, FitbitSyncJob.id).first()
+        
+        if job is None:
+            return None
+        
+        result = db.session.execute(
+            update(FitbitSyncJob)
+            .where(FitbitSyncJob.id == job.id, FitbitSyncJob.status == 'pending')
+            .values(status='running', started_at=now, attempts=FitbitSyncJob.attempts + 1)
+        )
+        db.session.commit()
+        
+        if result.rowcount == 1:
+            db.session.refresh(job)
+            return job
+
+def _finish_job(job_id, counts=None, error=None):
+    """
+    ジョブの結果を記録
+    
+    レート制限に達したジョブはリセット後に再実行するため再実行待ちに戻し、
+    それ以外の失敗は failed とする。
+    
+    引数:
+        job_id (int): ジョブID
+        counts (dict): 成功した場合の inserted, updated, skipped の件数
+        error (Exception): 失敗した場合の原因
+    """
+    if error is not None:
+        if not isinstance(error, RateLimitExceeded):
+            logger.warning('Fitbit sync job %s failed: %s', job_id, error)
+        db.session.rollback()
+    
+    job = db.session.get(FitbitSyncJob, job_id)
+    job.error = None if error is None else str(error)
+    
+    if isinstance(error, RateLimitExceeded):
+        # レート制限のリセット後に再実行
+        job.status = 'pending'
+        job.run_after = datetime.utcnow() + timedelta(seconds=error.retry_after)
+    elif error is not None:
+        job.status = 'failed'
+        job.finished_at = datetime.utcnow()
+    else:
+        job.status = 'completed'
+        job.inserted = counts['inserted']
+        job.updated = counts['updated']
+        job.skipped = counts['skipped']
+        job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+def run_job(job):
+    """
+    ジョブを実行し、結果を記録
+    
+    引数:
+        job (FitbitSyncJob): 実行するジョブ
+    """
+    from .fitbit_sync import sync_user_weights
+    from .fitbit_backfill import run_backfill
+    from .fitbit_tokens import get_valid_token
+    
+    job_id = job.id
+    
+    try:
+        if job.kind == 'backfill':
+            token = get_valid_token(job.user_id)
+            if not token:
+                raise PermissionError('Not authenticated with Fitbit or token refresh failed')
+            record = run_backfill(job.user_id, token.access_token)
+            if record is not None and record.status == 'paused':
+                raise RateLimitExceeded(max(0, int((record.retry_after - datetime.utcnow()).total_seconds())))
+            if record is not None and record.status == 'failed':
+                raise RuntimeError(record.error)
+            counts = {
+                'inserted': record.inserted if record else 0,
+                'updated': record.updated if record else 0,
+                'skipped': record.skipped if record else 0
+            }
+        else:
+            counts = sync_user_weights(job.user_id, job.from_date, job.to_date)
+    except Exception as e:
+        _finish_job(job_id, error=e)
+        return
+    
+    _finish_job(job_id, counts)
+
+def run_jobs_concurrently(jobs):
+    """
+    期間・1日分の同期ジョブをまとめて実行
+    
+    トークンの取得とデータベースへの保存はジョブごとに順に行い、
+    その間のFitbit APIの呼び出しだけを1つのイベントループで同時に実行する。
+    
+    引数:
+        jobs (list): 実行中にした FitbitSyncJob のリスト（kind は sync または day）
+    """
+    from .fitbit_async import fetch_weight_logs_concurrently
+    from .fitbit_sync import plan_sync, apply_sync, record_sync_failure
+    
+    plans = {}
+    for job in jobs:
+        job_id = job.id
+        try:
+            plans[job_id] = plan_sync(job.user_id, job.from_date, job.to_date)
+        except Exception as e:
+            _finish_job(job_id, error=e)
+    
+    results = fetch_weight_logs_concurrently([
+        (job_id, plan.access_token, plan.from_date, plan.end_date, plan.user_id)
+        for job_id, plan in plans.items()
+    ])
+    
+    for job_id, plan in plans.items():
+        result = results[job_id]
+        if isinstance(result, Exception):
+            record_sync_failure(plan.user_id, result)
+            _finish_job(job_id, error=result)
+            continue
+        try:
+            counts = apply_sync(plan, result)
+        except Exception as e:
+            _finish_job(job_id, error=e)
+            continue
+        _finish_job(job_id, counts)
+
+def run_pending_jobs(limit=None):
+    """
+    実行可能なジョブを順に処理
+    
+    FITBIT_ASYNC_IO が有効な場合は、期間・1日分の同期ジョブを FITBIT_SYNC_BATCH_SIZE 件ずつ取得し、
+    run_jobs_concurrently() でFitbit APIの呼び出しを同時に実行する。
+    
+    引数:
+        limit (int): 処理するジョブの最大数（Noneなら実行可能なジョブがなくなるまで）
+        
+    戻り値:
+        int: 処理したジョブ数
+    """
+    config = current_app.config
+    batch_size = config['FITBIT_SYNC_BATCH_SIZE'] if config['FITBIT_ASYNC_IO'] else 1
+    
+    processed = 0
+    while limit is None or processed < limit:
+        batch = []
+        job = None
+        while len(batch) < batch_size and (limit is None or processed + len(batch) < limit):
+            job = claim_next_job()
+            if job is None:
+                break
+            if job.kind == 'backfill' or batch_size == 1:
+                run_job(job)
+                processed += 1
+            else:
+                batch.append(job)
+        
+        if batch:
+            run_jobs_concurrently(batch)
+            processed += len(batch)
+        if job is None:
+            break
+    return processed
+
+class SyncWorker:
+    """
+    Fitbitデータ同期のバックグラウンドワーカー
+    
+    デーモンスレッドで定期的に同期ジョブを登録・実行する。
+    リクエストからジョブが登録されると notify() により待機を中断してすぐに処理する。
+    """
+    
+    def __init__(self, app, poll_interval=None):
+        self.app = app
+        self.poll_interval = poll_interval or app.config['FITBIT_SYNC_POLL_INTERVAL']
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='fitbit-sync-worker', daemon=True)
+            self._thread.start()
+    
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def notify(self):
+        """待機中のワーカーを起こす"""
+        self._wakeup.set()
+    
+    def run_once(self):
+        """定期同期の登録と実行可能なジョブの処理を1回行う"""
+        with self.app.app_context():
+            try:
+                schedule_periodic_syncs()
+                run_pending_jobs()
+            except Exception:
+                logger.exception('Fitbit sync worker iteration failed')
+                db.session.rollback()
+            finally:
+                db.session.remove()
+    
+    def _run(self):
+        while not self._stopped.is_set():
+            self.run_once()
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+def start_sync_worker(app):
+    """
+    設定で有効な場合にバックグラウンドワーカーを起動
+    
+    引数:
+        app (Flask): Flaskアプリケーション
+        
+    戻り値:
+        SyncWorker または None: 起動したワーカー
+    """
+    if not app.config['FITBIT_SYNC_WORKER_ENABLED']:
+        return None
+    
+    worker = app.extensions.get('fitbit_sync_worker')
+    if worker is None:
+        worker = SyncWorker(app)
+        app.extensions['fitbit_sync_worker'] = worker
+    worker.start()
+    return worker
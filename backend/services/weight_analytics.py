@@ -0,0 +1,285 @@
+"""
+体重データのベクトル化された分析
+
+日次集計（FitbitWeightDaily）を列のみのクエリで読み込み、NumPy配列として
+要約統計・最小二乗法によるトレンド・移動平均・週次/月次集計を計算する。
+日次集計は記録数と合計を持つため、日単位の計算は生の記録から計算した結果と一致する。
+"""
+from collections import namedtuple
+import numpy as np
+from sqlalchemy import select
+from models import db, FitbitWeightDaily
+
+# analysis エンドポイントで指定できる追加指標
+ANALYSIS_METRICS = ('trend', 'rolling', 'weekly', 'monthly')
+
+# 移動平均の期間（日数）
+ROLLING_WINDOWS = (7, 30)
+
+class DailySeries(namedtuple('DailySeries', [
+    'dates', 'count', 'sum_weight', 'min_weight', 'max_weight', 'first_weight', 'last_weight'
+])):
+    """
+    日付順に並んだ日次集計の列（各要素は同じ長さのNumPy配列）
+    
+    属性:
+        dates (ndarray): 記録日（datetime64[D]）
+        count (ndarray): 記録数
+        sum_weight (ndarray): 体重の合計
+        min_weight (ndarray): 最小体重
+        max_weight (ndarray): 最大体重
+        first_weight (ndarray): その日の最初の体重
+        last_weight (ndarray): その日の最後の体重
+    """
+    __slots__ = ()
+    
+    def __len__(self):
+        return len(self.dates)
+    
+    @property
+    def mean_weight(self):
+        """日ごとの平均体重"""
+        return self.sum_weight / self.count
+
+def parse_metrics(value):
+    """
+    metrics パラメータ（カンマ区切り）を解析
+    
+    引数:
+        value (str): 指標名のカンマ区切り文字列（all で全指標）
+        
+    戻り値:
+        tuple: 指標名のタプル
+        
+    例外:
+        ValueError: 不明な指標名が含まれる場合
+    """
+    if not value:
+        return ()
+    names = [name.strip().lower() for name in value.split(',') if name.strip()]
+    if 'all' in names:
+        return ANALYSIS_METRICS
+    unknown = [name for name in names if name not in ANALYSIS_METRICS]
+    if unknown:
+        raise ValueError(f'Unknown metrics: {", ".join(unknown)}. Use any of: {", ".join(ANALYSIS_METRICS)}, all')
+    return tuple(name for name in ANALYSIS_METRICS if name in names)
+
+# DailySeries の各列に対応する FitbitWeightDaily の列
+DAILY_SERIES_COLUMNS = (
+    FitbitWeightDaily.date, FitbitWeightDaily.count, FitbitWeightDaily.sum_weight, FitbitWeightDaily.min_weight,
+    FitbitWeightDaily.max_weight, FitbitWeightDaily.first_weight, FitbitWeightDaily.last_weight
+)
+
+def series_from_rows(rows):
+    """
+    DAILY_SERIES_COLUMNS の順に並んだ行から DailySeries を作成
+    
+    引数:
+        rows (list): 日付順に並んだ行
+        
+    戻り値:
+        DailySeries: 日次集計の列
+    """
+    values = list(zip(*rows)) or [()] * len(DailySeries._fields)
+    return DailySeries(
+        dates=np.array(values[0], dtype='datetime64[D]'),
+        count=np.array(values[1], dtype=np.int64),
+        **{name: np.array(column, dtype=np.float64) for name, column in zip(DailySeries._fields[2:], values[2:])}
+    )
+
+def load_daily_series(user_id, from_date, to_date):
+    """
+    指定期間の日次集計をNumPy配列として読み込む
+    
+    引数:
+        user_id (str): ユーザー識別子
+        from_date (date または str): 開始日
+        to_date (date または str): 終了日
+        
+    戻り値:
+        DailySeries: 日次集計の列
+    """
+    rows = db.session.execute(
+        select(*DAILY_SERIES_COLUMNS).where(
+            FitbitWeightDaily.user_id == user_id,
+            FitbitWeightDaily.date >= from_date,
+            FitbitWeightDaily.date <= to_date
+        ).order_by(FitbitWeightDaily.date)
+    ).all()
+    return series_from_rows(rows)
+
+def summarize(series):
+    """
+    要約統計を計算
+    
+    引数:
+        series (DailySeries): 日次集計の列（1日以上）
+        
+    戻り値:
+        dict: count, min_weight, max_weight, avg_weight, start_weight, end_weight, change
+    """
+    count = int(series.count.sum())
+    start_weight = float(series.first_weight[0])
+    end_weight = float(series.last_weight[-1])
+    return {
+        'count': count,
+        'min_weight': float(series.min_weight.min()),
+        'max_weight': float(series.max_weight.max()),
+        'avg_weight': float(series.sum_weight.sum() / count),
+        'start_weight': start_weight,
+        'end_weight': end_weight,
+        'change': end_weight - start_weight if count > 1 else 0
+    }
+
+def daily_chart(series):
+    """
+    日ごとの平均体重の推移
+    
+    戻り値:
+        list: date, weight, count を含む辞書のリスト
+    """
+    means = np.round(series.mean_weight, 2).tolist()
+    return [
+        {'date': day, 'weight': mean, 'count': count}
+        for day, mean, count in zip(np.datetime_as_string(series.dates).tolist(), means, series.count.tolist())
+    ]
+
+def trend(series):
+    """
+    最小二乗法による体重の傾きを計算
+    
+    各記録を記録日で回帰した場合と同じ結果になるよう、日ごとの平均体重を記録数で重み付けする。
+    
+    戻り値:
+        dict: slope_per_day, slope_per_week, intercept（最初の日の回帰値）, days
+            記録が1日分しかない場合、傾きは None
+    """
+    x = (series.dates - series.dates[0]).astype(np.float64)
+    y = series.mean_weight
+    w = series.count.astype(np.float64)
+    
+    x_mean = np.average(x, weights=w)
+    y_mean = np.average(y, weights=w)
+    denominator = np.sum(w * (x - x_mean) ** 2)
+    
+    if denominator == 0:
+        return {'slope_per_day': None, 'slope_per_week': None, 'intercept': round(float(y_mean), 2), 'days': len(series)}
+    
+    slope = float(np.sum(w * (x - x_mean) * (y - y_mean)) / denominator)
+    return {
+        'slope_per_day': round(slope, 4),
+        'slope_per_week': round(slope * 7, 4),
+        'intercept': round(float(y_mean - slope * x_mean), 2),
+        'days': len(series)
+    }
+
+def rolling_means(series, window):
+    """
+    記録のある日ごとに、その日までの暦日 window 日間の記録数で重み付けした平均を計算
+    
+    引数:
+        series (DailySeries): 日次集計の列
+        window (int): 移動平均の日数
+        
+    戻り値:
+        ndarray: 日ごとの移動平均
+    """
+    if not len(series):
+        return np.zeros(0)
+    offsets = (series.dates - series.dates[0]).astype(np.int64)
+    
+    # 記録のない日を0で埋めた累積和から、任意の期間の合計を差分で求める
+    dense_sum = np.zeros(offsets[-1] + 1)
+    dense_count = np.zeros(offsets[-1] + 1)
+    dense_sum[offsets] = series.sum_weight
+    dense_count[offsets] = series.count
+    cum_sum = np.concatenate(([0.0], np.cumsum(dense_sum)))
+    cum_count = np.concatenate(([0.0], np.cumsum(dense_count)))
+    
+    ends = offsets + 1
+    starts = np.maximum(ends - window, 0)
+    return (cum_sum[ends] - cum_sum[starts]) / (cum_count[ends] - cum_count[starts])
+
+def rolling_averages(series, windows=ROLLING_WINDOWS):
+    """
+    記録のある日ごとに、その日までの暦日 N 日間の移動平均を計算
+    
+    引数:
+        series (DailySeries): 日次集計の列
+        windows (tuple): 移動平均の日数
+        
+    戻り値:
+        list: date と mean_<N>d を含む辞書のリスト
+    """
+    result = {'date': np.datetime_as_string(series.dates).tolist()}
+    for window in windows:
+        result[f'mean_{window}d'] = np.round(rolling_means(series, window), 2).tolist()
+    
+    keys = list(result)
+    return [dict(zip(keys, values)) for values in zip(*result.values())]
+
+def _aggregate_periods(series, keys):
+    """ソート済みの期間キーごとに日次集計をまとめる"""
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    ends = np.concatenate((starts[1:], [len(keys)])) - 1
+    
+    count = np.add.reduceat(series.count, starts)
+    mean = np.add.reduceat(series.sum_weight, starts) / count
+    first = series.first_weight[starts]
+    last = series.last_weight[ends]
+    
+    columns = {
+        'period_start': np.datetime_as_string(keys[starts].astype('datetime64[D]')).tolist(),
+        'count': count.tolist(),
+        'mean_weight': np.round(mean, 2).tolist(),
+        'min_weight': np.minimum.reduceat(series.min_weight, starts).tolist(),
+        'max_weight': np.maximum.reduceat(series.max_weight, starts).tolist(),
+        'change': np.round(last - first, 2).tolist()
+    }
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+def weekly_aggregates(series):
+    """
+    週ごと（月曜始まり）の集計
+    
+    戻り値:
+        list: period_start, count, mean_weight, min_weight, max_weight, change を含む辞書のリスト
+    """
+    day_numbers = series.dates.astype(np.int64)
+    # 1970-01-01 は木曜日のため、+3 した値の7の剰余が月曜日からの日数になる
+    week_starts = (day_numbers - (day_numbers + 3) % 7).astype('datetime64[D]')
+    return _aggregate_periods(series, week_starts)
+
+def monthly_aggregates(series):
+    """
+    月ごとの集計
+    
+    戻り値:
+        list: period_start, count, mean_weight, min_weight, max_weight, change を含む辞書のリスト
+    """
+    return _aggregate_periods(series, series.dates.astype('datetime64[M]'))
+
+_METRIC_FUNCTIONS = {
+    'trend': trend,
+    'rolling': rolling_averages,
+    'weekly': weekly_aggregates,
+    'monthly': monthly_aggregates
+}
+
+def analyze_series(series, metrics=()):
+    """
+    日次集計の列から分析結果を作成
+    
+    引数:
+        series (DailySeries): 日次集計の列（1日以上）
+        metrics (tuple): 追加で計算する指標名
+        
+    戻り値:
+        dict: 要約統計と chart_data、指定した場合は metrics
+    """
+    analysis = summarize(series)
+    analysis['chart_data'] = daily_chart(series)
+    if metrics:
+        analysis['metrics'] = {name: _METRIC_FUNCTIONS[name](series) for name in metrics}
+    return analysis
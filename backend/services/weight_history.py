@@ -0,0 +1,170 @@
+"""
+体重履歴の取得（キーセットページネーションとストリーミング）
+
+体重データは (date, time, id) の順に並べ、カーソルには直前のページの最後の記録の
+キーを格納する。OFFSETを使わないため、何ページ目でもインデックスを辿るコストは一定になる。
+"""
+import base64
+import json
+from datetime import date, time
+from sqlalchemy import and_, or_
+from models import FitbitWeight
+
+# ストリーミング時に1回のフェッチで読み込む行数
+STREAM_BATCH_SIZE = 1000
+
+def encode_cursor(entry):
+    """
+    記録のソートキーを不透明なカーソル文字列に変換
+    
+    引数:
+        entry (FitbitWeight): ページの最後の記録
+        
+    戻り値:
+        str: URLセーフなカーソル
+    """
+    key = [entry.date.isoformat(), entry.time.isoformat() if entry.time else None, entry.id]
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    カーソル文字列をソートキーに変換
+    
+    引数:
+        cursor (str): encode_cursor() で作成したカーソル
+        
+    戻り値:
+        tuple: (date, time または None, id)
+        
+    例外:
+        ValueError: カーソルの形式が不正な場合
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        day, clock, entry_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (
+            date.fromisoformat(day),
+            time.fromisoformat(clock) if clock is not None else None,
+            int(entry_id)
+        )
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+def weight_history_query(user_id, from_date, to_date, cursor=None):
+    """
+    期間内の体重データを (date, time, id) 順に取得するクエリを作成
+    
+    time が NULL の記録はその日の最初に並ぶ。
+    
+    引数:
+        user_id (str): ユーザー識別子
+        from_date (date): 開始日
+        to_date (date): 終了日
+        cursor (str): 前のページのカーソル（指定した場合はその次の記録から）
+        
+    戻り値:
+        Query: FitbitWeight のクエリ
+        
+    例外:
+        ValueError: カーソルの形式が不正な場合
+    """
+    query = FitbitWeight.query.filter(
+        FitbitWeight.user_id == user_id,
+        FitbitWeight.date >= from_date,
+        FitbitWeight.date <= to_date
+    )
+    
+    if cursor:
+        day, clock, entry_id = decode_cursor(cursor)
+        if clock is None:
+            same_day = or_(
+                FitbitWeight.time.isnot(None),
+                and_(FitbitWeight.time.is_(None), FitbitWeight.id > entry_id)
+            )
+        else:
+            same_day = or_(
+                FitbitWeight.time > clock,
+                and_(FitbitWeight.time == clock, FitbitWeight.id > entry_id)
+            )
+        query = query.filter(or_(
+            FitbitWeight.date > day,
+            and_(FitbitWeight.date == day, same_day)
+        ))
+    
+    return query.order_by(FitbitWeight.date, FitbitWeight.time.asc().nullsfirst(), FitbitWeight.id)
+
+def fetch_weight_page(query, limit):
+    """
+    クエリから1ページ分の記録を取得
+    
+    引数:
+        query (Query): weight_history_query() のクエリ
+        limit (int): 1ページの件数
+        
+    戻り値:
+        tuple: (記録のリスト, 次のページのカーソル または None)
+    """
+    # 1件多く取得して次のページの有無を判定
+    entries = query.limit(limit + 1).all()
+    if len(entries) <= limit:
+        return entries, None
+    entries = entries[:limit]
+    return entries, encode_cursor(entries[-1])
+
+def iter_weight_dicts(query, batch_size=STREAM_BATCH_SIZE):
+    """
+    クエリの結果をサーバーサイドカーソルで少しずつ読み込み、辞書として順に返す
+    
+    引数:
+        query (Query): weight_history_query() のクエリ
+        batch_size (int): 1回のフェッチで読み込む行数
+        
+    戻り値:
+        generator: FitbitWeight.to_dict() の辞書
+    """
+    for entry in query.yield_per(batch_size):
+        yield entry.to_dict()
+
+def _join_chunks(parts, size=STREAM_BATCH_SIZE):
+    """細かい断片をまとめて出力し、書き込み回数を減らす"""
+    buffer = []
+    for part in parts:
+        buffer.append(part)
+        if len(buffer) >= size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+def stream_ndjson(rows):
+    """
+    辞書を1行1件のJSON（NDJSON）として順に出力
+    
+    引数:
+        rows (iterable): 出力する辞書
+        
+    戻り値:
+        generator: NDJSONの断片
+    """
+    return _join_chunks(json.dumps(row, separators=(',', ':')) + '\n' for row in rows)
+
+def stream_json_object(rows, key, extra):
+    """
+    辞書の列を配列として含むJSONオブジェクトを少しずつ出力
+    
+    引数:
+        rows (iterable): 配列として出力する辞書
+        key (str): 配列のキー
+        extra (dict): 配列以外のキーと値
+        
+    戻り値:
+        generator: JSONの断片
+    """
+    def parts():
+        yield '{' + ''.join(f'{json.dumps(k)}:{json.dumps(v)},' for k, v in extra.items()) + json.dumps(key) + ':['
+        separator = ''
+        for row in rows:
+            yield separator + json.dumps(row, separators=(',', ':'))
+            separator = ','
+        yield ']}'
+    return _join_chunks(parts())
@@ -0,0 +1,158 @@
+"""
+体重の予測モデル
+
+直近の日次集計（FitbitWeightDaily）から傾向を推定し、予測期間全体を1回のベクトル演算で生成する。
+各日の値は平均体重を使い、予測の信頼区間（デフォルト95%）も計算する。
+
+モデル:
+    average: 期間の最初と最後の記録の差から求めた平均変化（従来の方法。信頼区間なし）
+    linear: 記録数で重み付けした最小二乗法による直線
+    theil_sen: 2点間の傾きの中央値による直線（外れ値に強い）
+    ewma: 指数加重移動平均（傾きなし）
+    holt: Holtの線形指数平滑法（水準と傾きを逐次更新）
+"""
+from collections import namedtuple
+import numpy as np
+
+PROJECTION_MODELS = ('average', 'linear', 'theil_sen', 'ewma', 'holt')
+
+# 平滑化の係数（ewma, holt の水準と holt の傾き）
+SMOOTHING_LEVEL = 0.3
+SMOOTHING_TREND = 0.1
+
+# 95%信頼区間に対応する正規分布の分位点
+CONFIDENCE_Z = 1.96
+
+# 中央絶対偏差を標準偏差に換算する係数
+_MAD_TO_SIGMA = 1.4826
+
+class Projection(namedtuple('Projection', ['model', 'level', 'slope', 'offsets', 'mean', 'lower', 'upper'])):
+    """
+    予測結果
+    
+    属性:
+        model (str): モデル名
+        level (float): 基準日（今日）の推定体重
+        slope (float): 1日あたりの変化量
+        offsets (ndarray): 基準日からの日数（1..予測日数）
+        mean (ndarray): 予測体重
+        lower (ndarray または None): 信頼区間の下限
+        upper (ndarray または None): 信頼区間の上限
+    """
+    __slots__ = ()
+
+def _line_band(x, sigma):
+    """直線モデルの予測区間の標準誤差を返す関数"""
+    n = len(x)
+    x_mean = x.mean()
+    sxx = np.sum((x - x_mean) ** 2)
+    def stderr(h):
+        return sigma * np.sqrt(1 + 1 / n + (h - x_mean) ** 2 / sxx)
+    return stderr
+
+def _fit_average(x, y, w, series):
+    days = x[-1] - x[0]
+    slope = float(series.last_weight[-1] - series.first_weight[0]) / days
+    return float(series.last_weight[-1]), slope, None
+
+def _fit_linear(x, y, w, series):
+    x_mean = np.average(x, weights=w)
+    y_mean = np.average(y, weights=w)
+    slope = float(np.sum(w * (x - x_mean) * (y - y_mean)) / np.sum(w * (x - x_mean) ** 2))
+    intercept = float(y_mean - slope * x_mean)
+    residuals = y - (intercept + slope * x)
+    sigma = float(np.sqrt(np.sum(residuals ** 2) / (len(x) - 2))) if len(x) > 2 else 0.0
+    return intercept, slope, _line_band(x, sigma)
+
+def _fit_theil_sen(x, y, w, series):
+    i, j = np.triu_indices(len(x), k=1)
+    slope = float(np.median((y[j] - y[i]) / (x[j] - x[i])))
+    intercept = float(np.median(y - slope * x))
+    residuals = y - (intercept + slope * x)
+    sigma = float(_MAD_TO_SIGMA * np.median(np.abs(residuals - np.median(residuals))))
+    return intercept, slope, _line_band(x, sigma)
+
+def _smooth(x, y, alpha, beta):
+    """
+    記録のある日ごとに水準（と傾き）を更新し、1期先予測の誤差を求める
+    
+    記録のない日がある場合は、その日数分だけ傾きを進めてから更新する。
+    """
+    level, trend = float(y[0]), 0.0
+    errors = []
+    for previous, current, value in zip(x[:-1], x[1:], y[1:]):
+        gap = current - previous
+        forecast = level + gap * trend
+        errors.append(value - forecast)
+        new_level = alpha * value + (1 - alpha) * forecast
+        if beta:
+            trend = beta * (new_level - level) / gap + (1 - beta) * trend
+        level = new_level
+    sigma = float(np.sqrt(np.mean(np.square(errors)))) if errors else 0.0
+    return level, trend, sigma
+
+def _fit_ewma(x, y, w, series):
+    alpha = SMOOTHING_LEVEL
+    level, _, sigma = _smooth(x, y, alpha, 0.0)
+    gap = -x[-1]
+    def stderr(h):
+        return sigma * np.sqrt(1 + (h + gap - 1) * alpha ** 2)
+    return level, 0.0, stderr
+
+def _fit_holt(x, y, w, series):
+    alpha, beta = SMOOTHING_LEVEL, SMOOTHING_TREND
+    level, trend, sigma = _smooth(x, y, alpha, beta)
+    gap = -x[-1]
+    def stderr(h):
+        # 予測誤差の分散: sigma^2 * (1 + Σ_{j=1}^{k-1} alpha^2 (1 + j beta)^2)（k は最後の記録からの日数）
+        steps = (h + gap).astype(np.int64)
+        terms = np.concatenate(([0.0], np.cumsum((alpha * (1 + np.arange(1, steps.max()) * beta)) ** 2)))
+        return sigma * np.sqrt(1 + terms[steps - 1])
+    # 今日の値（最後の記録から今日までの傾きを反映）
+    return level + trend * gap, trend, stderr
+
+_FITTERS = {
+    'average': _fit_average,
+    'linear': _fit_linear,
+    'theil_sen': _fit_theil_sen,
+    'ewma': _fit_ewma,
+    'holt': _fit_holt
+}
+
+def project_weights(series, today, horizon, model='linear', z=CONFIDENCE_Z):
+    """
+    日次集計から将来の体重を予測
+    
+    引数:
+        series (DailySeries): 直近の日次集計（2日分以上）
+        today (date): 予測の基準日
+        horizon (int): 予測する日数
+        model (str): PROJECTION_MODELS のいずれか
+        z (float): 信頼区間の分位点
+        
+    戻り値:
+        Projection: 予測結果
+        
+    例外:
+        ValueError: 不明なモデル、または記録が2日分未満の場合
+    """
+    if model not in _FITTERS:
+        raise ValueError(f'Unknown projection model: {model}')
+    if len(series) < 2:
+        raise ValueError('At least two days of weight data are required')
+    
+    x = (series.dates - np.datetime64(today, 'D')).astype(np.float64)
+    y = series.mean_weight
+    w = series.count.astype(np.float64)
+    
+    level, slope, stderr = _FITTERS[model](x, y, w, series)
+    offsets = np.arange(1, horizon + 1)
+    mean = level + slope * offsets
+    
+    if stderr is None:
+        lower = upper = None
+    else:
+        band = z * stderr(offsets.astype(np.float64))
+        lower, upper = mean - band, mean + band
+    
+    return Projection(model, level, slope, offsets, mean, lower, upper)
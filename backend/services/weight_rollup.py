@@ -0,0 +1,251 @@
+"""
+日次体重ロールアップ（FitbitWeightDaily）の維持
+
+FitbitWeight への書き込みで影響を受けた (ユーザー, 日付) をセッションに記録し、
+コミット直前に該当日だけを生の記録から再集計する。
+ORM経由の追加・更新・削除はセッションイベントで自動的に検出し、
+Core の一括INSERT/DELETEを使う場合は mark_rollups_dirty() で明示的に登録する。
+再計算の後には add_rollup_refresh_listener() で登録した関数を同じトランザクション内で呼び出す。
+"""
+from collections import defaultdict
+from itertools import groupby
+from sqlalchemy import event, select, delete, insert, inspect
+from sqlalchemy.orm import Session
+from models import db, FitbitWeight, FitbitWeightDaily
+
+# 再集計が必要な (user_id, date) を保持するセッション情報のキー
+_PENDING_KEY = 'weight_rollup_pending'
+
+# IN句に渡す日付の最大数
+_CHUNK_SIZE = 500
+
+# 一括INSERTの行数
+_INSERT_BATCH_SIZE = 1000
+
+# コミット直前のロールアップ再計算の後に呼ぶ関数のリスト
+_refresh_listeners = []
+
+def aggregate_day(readings):
+    """
+    1日分の記録を集計
+    
+    引数:
+        readings (list): 時刻順に並んだ (time, weight, bmi) のリスト
+        
+    戻り値:
+        dict: FitbitWeightDaily の列の辞書
+    """
+    weights = [weight for _, weight, _ in readings]
+    bmis = [bmi for _, _, bmi in readings if bmi is not None]
+    return {
+        'count': len(weights),
+        'min_weight': min(weights),
+        'max_weight': max(weights),
+        'sum_weight': sum(weights),
+        'first_weight': weights[0],
+        'first_time': readings[0][0],
+        'last_weight': weights[-1],
+        'last_time': readings[-1][0],
+        'bmi_sum': sum(bmis),
+        'bmi_count': len(bmis)
+    }
+
+def _raw_readings_query():
+    return select(
+        FitbitWeight.user_id, FitbitWeight.date, FitbitWeight.time, FitbitWeight.weight, FitbitWeight.bmi
+    ).order_by(FitbitWeight.user_id, FitbitWeight.date, FitbitWeight.time, FitbitWeight.id)
+
+def _iter_daily_aggregates(rows):
+    """ユーザー・日付・時刻順の記録から (user_id, date, 集計) を順に生成"""
+    for (user_id, day), group in groupby(rows, key=lambda row: (row[0], row[1])):
+        yield user_id, day, aggregate_day([(row[2], row[3], row[4]) for row in group])
+
+def add_rollup_refresh_listener(listener):
+    """
+    コミット直前のロールアップ再計算の後に呼ばれる関数を登録（重複登録はしない）
+    
+    引数:
+        listener (callable): (session, ユーザー識別子 -> 再計算した日付の集合 の辞書) を受け取る関数。
+            コミットと同じトランザクション内で呼ばれる
+    """
+    if listener not in _refresh_listeners:
+        _refresh_listeners.append(listener)
+
+def mark_rollups_dirty(session, user_id, dates):
+    """
+    再集計が必要な日をセッションに登録（コミット時に再集計される）
+    
+    引数:
+        session (Session): データベースセッション
+        user_id (str): ユーザー識別子
+        dates (iterable): 影響を受けた日付
+    """
+    session.info.setdefault(_PENDING_KEY, set()).update((user_id, day) for day in dates)
+
+def refresh_daily_rollups(executor, user_id, dates):
+    """
+    指定した日のロールアップを生の記録から再計算
+    
+    引数:
+        executor (Session または Connection): SQLの実行先
+        user_id (str): ユーザー識別子
+        dates (iterable): 再計算する日付
+        
+    戻り値:
+        int: 書き込んだロールアップ行数
+    """
+    dates = sorted(set(dates))
+    written = 0
+    
+    for start in range(0, len(dates), _CHUNK_SIZE):
+        chunk = dates[start:start + _CHUNK_SIZE]
+        rows = executor.execute(
+            _raw_readings_query().where(FitbitWeight.user_id == user_id, FitbitWeight.date.in_(chunk))
+        ).all()
+        
+        executor.execute(
+            delete(FitbitWeightDaily).where(FitbitWeightDaily.user_id == user_id, FitbitWeightDaily.date.in_(chunk))
+        )
+        
+        values = [dict(aggregates, user_id=uid, date=day) for uid, day, aggregates in _iter_daily_aggregates(rows)]
+        if values:
+            executor.execute(insert(FitbitWeightDaily), values)
+            written += len(values)
+    
+    return written
+
+def rebuild_rollups(executor=None, user_id=None):
+    """
+    ロールアップを生の記録から作り直す
+    
+    引数:
+        executor (Session または Connection): SQLの実行先（デフォルトは db.session）
+        user_id (str): 対象ユーザー（Noneなら全ユーザー）
+        
+    戻り値:
+        int: 作成したロールアップ行数
+    """
+    executor = executor or db.session
+    
+    delete_stmt = delete(FitbitWeightDaily)
+    query = _raw_readings_query()
+    if user_id is not None:
+        delete_stmt = delete_stmt.where(FitbitWeightDaily.user_id == user_id)
+        query = query.where(FitbitWeight.user_id == user_id)
+    
+    executor.execute(delete_stmt)
+    
+    # 生の記録を逐次読み込みながら集計して一括INSERT
+    rows = executor.execute(query.execution_options(yield_per=5000))
+    written = 0
+    batch = []
+    for uid, day, aggregates in _iter_daily_aggregates(rows):
+        batch.append(dict(aggregates, user_id=uid, date=day))
+        if len(batch) >= _INSERT_BATCH_SIZE:
+            executor.execute(insert(FitbitWeightDaily), batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        executor.execute(insert(FitbitWeightDaily), batch)
+        written += len(batch)
+    
+    return written
+
+def check_rollups(executor=None, user_id=None, tolerance=1e-6):
+    """
+    ロールアップと生の記録の整合性を確認
+    
+    引数:
+        executor (Session または Connection): SQLの実行先（デフォルトは db.session）
+        user_id (str): 対象ユーザー（Noneなら全ユーザー）
+        tolerance (float): 浮動小数点の比較誤差
+        
+    戻り値:
+        list: 不整合の一覧（各要素は user_id, date, problem を含む辞書）
+    """
+    executor = executor or db.session
+    
+    table = FitbitWeightDaily.__table__
+    stored_query = select(table)
+    query = _raw_readings_query()
+    if user_id is not None:
+        stored_query = stored_query.where(table.c.user_id == user_id)
+        query = query.where(FitbitWeight.user_id == user_id)
+    
+    columns = [c.name for c in table.columns if c.name not in ('id', 'user_id', 'date', 'updated_at')]
+    stored = {
+        (row.user_id, row.date): {name: getattr(row, name) for name in columns}
+        for row in executor.execute(stored_query)
+    }
+    
+    problems = []
+    rows = executor.execute(query.execution_options(yield_per=5000))
+    for uid, day, expected in _iter_daily_aggregates(rows):
+        actual = stored.pop((uid, day), None)
+        if actual is None:
+            problems.append({'user_id': uid, 'date': day.isoformat(), 'problem': 'missing'})
+            continue
+        for name, value in expected.items():
+            other = actual[name]
+            if isinstance(value, float) and other is not None:
+                mismatch = abs(value - other) > tolerance
+            else:
+                mismatch = value != other
+            if mismatch:
+                problems.append({
+                    'user_id': uid, 'date': day.isoformat(), 'problem': 'mismatch',
+                    'column': name, 'expected': value, 'actual': other
+                })
+    
+    for uid, day in stored:
+        problems.append({'user_id': uid, 'date': day.isoformat(), 'problem': 'orphan'})
+    
+    return problems
+
+def _collect_changed_readings(session, flush_context):
+    """フラッシュされたFitbitWeightの変更から再集計が必要な日を登録"""
+    pending = defaultdict(set)
+    
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, FitbitWeight):
+            continue
+        state = inspect(obj)
+        user_ids = set(state.attrs.user_id.history.deleted or []) | {obj.user_id}
+        dates = set(state.attrs.date.history.deleted or []) | {obj.date}
+        for uid in user_ids:
+            pending[uid].update(d for d in dates if d is not None)
+    
+    for uid, dates in pending.items():
+        mark_rollups_dirty(session, uid, dates)
+
+def _refresh_pending_rollups(session):
+    """コミット直前に登録済みの日のロールアップを再計算"""
+    session.flush()
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    
+    by_user = defaultdict(set)
+    for uid, day in pending:
+        by_user[uid].add(day)
+    for uid, dates in by_user.items():
+        refresh_daily_rollups(session, uid, dates)
+    
+    for listener in _refresh_listeners:
+        listener(session, dict(by_user))
+
+def _discard_pending_rollups(session):
+    session.info.pop(_PENDING_KEY, None)
+
+def register_rollup_hooks(session_class=Session):
+    """
+    セッションイベントにロールアップ維持のフックを登録（重複登録はしない）
+    
+    引数:
+        session_class: イベントを登録するセッションクラス
+    """
+    if event.contains(session_class, 'after_flush', _collect_changed_readings):
+        return
+    event.listen(session_class, 'after_flush', _collect_changed_readings)
+    event.listen(session_class, 'before_commit', _refresh_pending_rollups)
+    event.listen(session_class, 'after_rollback', _discard_pending_rollups)
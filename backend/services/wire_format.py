@@ -0,0 +1,175 @@
+"""
+グラフ用の列指向（columnar）・バイナリ形式へのエンコード
+
+format=columnar:
+    日付を1970-01-01からの経過日数（epoch day）の整数配列、値を列ごとの数値配列で返すJSON。
+    delta=true の場合、日付は先頭からの差分、値は 1/scale 単位の整数の差分になる
+    （欠測値は null のまま、差分は直前の欠測でない値との差）。
+
+format=binary:
+    リトルエンディアンのパック済み配列（Content-Type: application/octet-stream）
+        ヘッダー   '<4sBBHI' magic b'WGTC', version, flags(bit0: 日付の差分), 列数, 行数
+        列名       列ごとに u8 の長さ + UTF-8 の名前
+        日付       int32 × 行数（flags の bit0 が立っている場合は差分）
+        値         列ごとに float32 × 行数（欠測値は NaN）
+"""
+import struct
+import numpy as np
+
+# 対応する出力形式
+WIRE_FORMATS = ('json', 'columnar', 'binary')
+
+# バイナリ形式のマジックナンバーとバージョン
+BINARY_MAGIC = b'WGTC'
+BINARY_VERSION = 1
+BINARY_MIMETYPE = 'application/octet-stream'
+_HEADER = struct.Struct('<4sBBHI')
+_FLAG_DELTA = 0x01
+
+# 差分エンコード時の固定小数点の倍率（0.01kg単位）
+DELTA_SCALE = 100
+
+def parse_wire_format(args):
+    """
+    format・delta クエリパラメータを解析
+    
+    引数:
+        args (MultiDict): リクエストのクエリパラメータ
+        
+    戻り値:
+        tuple: (形式, 差分エンコードするか)
+        
+    例外:
+        ValueError: 不明な形式が指定された場合
+    """
+    wire_format = args.get('format', 'json').lower()
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError(f'Invalid format. Use one of: {", ".join(WIRE_FORMATS)}')
+    return wire_format, args.get('delta', 'false').lower() == 'true'
+
+def epoch_days(dates):
+    """
+    日付のリストを1970-01-01からの経過日数の配列に変換
+    
+    引数:
+        dates (list): date のリスト
+        
+    戻り値:
+        ndarray: int32 の配列
+    """
+    return np.array(dates, dtype='datetime64[D]').astype(np.int32)
+
+def _as_float_array(values):
+    """None を NaN として float64 の配列に変換"""
+    return np.array(values, dtype=np.float64)
+
+def _delta_days(days):
+    return np.diff(days, prepend=0).astype(np.int32)
+
+def _delta_fixed_point(values, scale):
+    """欠測でない値を固定小数点の整数にして、直前の値との差分を求める"""
+    present = ~np.isnan(values)
+    fixed = np.round(values[present] * scale).astype(np.int64)
+    deltas = np.diff(fixed, prepend=0)
+    result = [None] * len(values)
+    for position, delta in zip(np.flatnonzero(present).tolist(), deltas.tolist()):
+        result[position] = delta
+    return result
+
+def _to_json_list(values, decimals):
+    rounded = np.round(values, decimals)
+    if not np.isnan(rounded).any():
+        return rounded.tolist()
+    return [None if np.isnan(value) else value for value in rounded.tolist()]
+
+def columnar_payload(dates, columns, delta=False, decimals=2, scale=DELTA_SCALE):
+    """
+    列指向のJSONペイロードを作成
+    
+    引数:
+        dates (list): 各行の日付（date のリスト）
+        columns (dict): 列名 -> 値のリスト（None は欠測）
+        delta (bool): 差分エンコードするか
+        decimals (int): 値の小数点以下の桁数
+        scale (int): 差分エンコード時の固定小数点の倍率
+        
+    戻り値:
+        dict: format, epoch, count, delta, dates, columns（差分エンコード時は scale も含む）
+    """
+    days = epoch_days(dates)
+    arrays = {name: _as_float_array(values) for name, values in columns.items()}
+    
+    payload = {
+        'format': 'columnar',
+        'epoch': '1970-01-01',
+        'count': len(days),
+        'delta': delta
+    }
+    if delta:
+        payload['scale'] = scale
+        payload['dates'] = _delta_days(days).tolist()
+        payload['columns'] = {name: _delta_fixed_point(values, scale) for name, values in arrays.items()}
+    else:
+        payload['dates'] = days.tolist()
+        payload['columns'] = {name: _to_json_list(values, decimals) for name, values in arrays.items()}
+    return payload
+
+def pack_binary(dates, columns, delta=False):
+    """
+    列をリトルエンディアンのバイナリ形式にパック
+    
+    引数:
+        dates (list): 各行の日付（date のリスト）
+        columns (dict): 列名 -> 値のリスト（None は欠測）
+        delta (bool): 日付を差分エンコードするか
+        
+    戻り値:
+        bytes: モジュールのドキュメントに記載した形式のバイト列
+    """
+    days = epoch_days(dates)
+    if delta:
+        days = _delta_days(days)
+    
+    parts = [_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, _FLAG_DELTA if delta else 0, len(columns), len(days))]
+    for name in columns:
+        encoded = name.encode('utf-8')
+        parts.append(struct.pack('<B', len(encoded)) + encoded)
+    parts.append(days.astype('<i4').tobytes())
+    for values in columns.values():
+        parts.append(_as_float_array(values).astype('<f4').tobytes())
+    return b''.join(parts)
+
+def unpack_binary(data):
+    """
+    pack_binary() で作成したバイト列を復元（テスト・クライアント実装の参考用）
+    
+    引数:
+        data (bytes): バイナリ形式のデータ
+        
+    戻り値:
+        tuple: (epoch day の配列（差分は復元済み）, 列名 -> float32 配列の辞書)
+        
+    例外:
+        ValueError: 形式が不正な場合
+    """
+    magic, version, flags, column_count, count = _HEADER.unpack_from(data)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError('Unsupported binary format')
+    
+    offset = _HEADER.size
+    names = []
+    for _ in range(column_count):
+        length = data[offset]
+        names.append(data[offset + 1:offset + 1 + length].decode('utf-8'))
+        offset += 1 + length
+    
+    days = np.frombuffer(data, dtype='<i4', count=count, offset=offset)
+    offset += 4 * count
+    if flags & _FLAG_DELTA:
+        days = np.cumsum(days).astype(np.int32)
+    
+    columns = {}
+    for name in names:
+        columns[name] = np.frombuffer(data, dtype='<f4', count=count, offset=offset)
+        offset += 4 * count
+    return days, columns
@@ -0,0 +1,15 @@
+import os
+import pytest
+
+# テストはインメモリSQLiteで実行する（app のインポート前に設定する必要がある）
+# TEST_DATABASE_URL を指定した場合はそのデータベース（PostgreSQLなど）で実行する
+if os.environ.get('TEST_DATABASE_URL'):
+    os.environ['DATABASE_URL'] = os.environ['TEST_DATABASE_URL']
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+@pytest.fixture(autouse=True)
+def _reset_result_cache():
+    """テストごとにデータベースを作り直すため、結果キャッシュもテストごとに破棄する"""
+    yield
+    from app import app
+    app.extensions.pop('result_cache', None)
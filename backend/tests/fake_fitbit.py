@@ -0,0 +1,271 @@
+"""
+テスト用のローカルFitbit APIサーバー
+
+体重ログAPIとトークンエンドポイントを最小限に再現する。
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import httpx
+import requests
+
+_RANGE_PATH = re.compile(r'^/1/user/-/body/log/weight/date/(\d{4}-\d{2}-\d{2})/(\d{4}-\d{2}-\d{2})\.json$')
+_DAY_PATH = re.compile(r'^/1/user/-/body/log/weight/date/(\d{4}-\d{2}-\d{2})\.json$')
+_SUBSCRIPTION_PATH = re.compile(r'^/1/user/-/(\w+)/apiSubscriptions/([^/]+)\.json$')
+
+class _HTTPServer(ThreadingHTTPServer):
+    # 多数の同時接続を受け付ける（既定の5では接続が破棄され、再送まで1秒待つ）
+    request_queue_size = 1024
+    daemon_threads = True
+
+def make_weight_logs(from_date, days, start_log_id=1, start_weight=80.0):
+    """
+    Fitbit APIの形式で1日1件の体重ログを作成する
+    
+    引数:
+        from_date (date): 最初の記録日
+        days (int): 日数
+        start_log_id (int): 最初のlogId
+        start_weight (float): 最初の体重
+        
+    戻り値:
+        list: 体重ログのリスト
+    """
+    return [
+        {
+            'logId': start_log_id + i,
+            'weight': round(start_weight - i * 0.05, 2),
+            'bmi': 24.0,
+            'date': (from_date + timedelta(days=i)).isoformat(),
+            'time': '07:00:00',
+            'source': 'Aria'
+        }
+        for i in range(days)
+    ]
+
+class FakeFitbitServer:
+    """
+    ローカルで起動するFitbit APIのテストダブル
+    
+    属性:
+        weights (list): 返却する体重ログ
+        requests (list): 受信したリクエストの (メソッド, パス) のリスト
+        responses (list): 次のリクエストから順に返す (ステータス, ヘッダー) の上書き
+        subscriptions (dict): 登録された購読ID → コレクション
+        latency (float): 各レスポンスの遅延秒数
+    
+    HTTPサーバーとして起動するほか、mock_transport() でイベントループ内で応答させることもできる。
+    """
+    
+    def __init__(self, weights=None, latency=0.0):
+        self.weights = list(weights or [])
+        self.requests = []
+        self.responses = []
+        self.subscriptions = {}
+        self.latency = latency
+        self.rate_limit = 150
+        self._lock = threading.Lock()
+        self._server = _HTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+    
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+    
+    def __enter__(self):
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+    
+    def weight_requests(self):
+        """受信した体重ログAPIへのリクエストのパス一覧"""
+        return [path for method, path in self.requests if '/body/log/weight/' in path]
+    
+    def _respond(self, method, path, body):
+        with self._lock:
+            self.requests.append((method, path))
+            override = self.responses.pop(0) if self.responses else None
+            self.rate_limit = max(0, self.rate_limit - 1)
+            remaining = self.rate_limit
+        
+        headers = {
+            'Fitbit-Rate-Limit-Limit': '150',
+            'Fitbit-Rate-Limit-Remaining': str(remaining),
+            'Fitbit-Rate-Limit-Reset': '3600'
+        }
+        
+        if override is not None:
+            status, extra_headers = override
+            headers.update(extra_headers)
+            return status, headers, {'errors': [{'message': f'fake error {status}'}]}
+        
+        if method == 'POST' and path == '/oauth2/token':
+            return 200, headers, {
+                'access_token': f'access-{len(self.requests)}',
+                'refresh_token': f'refresh-{len(self.requests)}',
+                'expires_in': 28800,
+                'scope': 'weight',
+                'token_type': 'Bearer',
+                'user_id': 'FAKE01'
+            }
+        
+        match = _RANGE_PATH.match(path)
+        if method == 'GET' and match:
+            start, end = match.groups()
+            return 200, headers, {'weight': [w for w in self.weights if start <= w['date'] <= end]}
+        
+        match = _DAY_PATH.match(path)
+        if method == 'GET' and match:
+            day = match.group(1)
+            return 200, headers, {'weight': [w for w in self.weights if w['date'] == day]}
+        
+        match = _SUBSCRIPTION_PATH.match(path)
+        if match:
+            collection, subscription_id = match.groups()
+            if method == 'POST':
+                with self._lock:
+                    existed = subscription_id in self.subscriptions
+                    self.subscriptions[subscription_id] = collection
+                return (200 if existed else 201), headers, {
+                    'collectionType': collection, 'ownerId': 'FAKE01', 'ownerType': 'user',
+                    'subscriberId': '1', 'subscriptionId': subscription_id
+                }
+            if method == 'DELETE':
+                with self._lock:
+                    removed = self.subscriptions.pop(subscription_id, None)
+                return (204, headers, None) if removed else (404, headers, {'errors': [{'message': 'not found'}]})
+        
+        return 404, headers, {'errors': [{'message': 'not found'}]}
+    
+    def mock_transport(self):
+        """
+        ソケットを使わずにこのテストダブルが応答する httpx のトランスポート（AsyncFitbitClient 用）
+        
+        遅延は asyncio.sleep で再現するため、多数の同時リクエストを1つのイベントループで処理できる。
+        """
+        async def handler(request):
+            status, headers, payload = self._respond(request.method, request.url.path, request.content)
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if payload is None:
+                return httpx.Response(status, headers=headers)
+            return httpx.Response(status, headers=headers, json=payload)
+        
+        return httpx.MockTransport(handler)
+    
+    def _handler_class(self):
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # ヘッダーと本文を1回で送信する（分けて送るとNagleアルゴリズムと遅延ACKで応答が遅れる）
+            wbufsize = -1
+            
+            def _handle(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                status, headers, payload = server._respond(method, urlparse(self.path).path, body)
+                if server.latency:
+                    time.sleep(server.latency)
+                data = json.dumps(payload).encode() if payload is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def do_GET(self):
+                self._handle('GET')
+            
+            def do_POST(self):
+                self._handle('POST')
+            
+            def do_DELETE(self):
+                self._handle('DELETE')
+            
+            def log_message(self, *args):
+                pass
+        
+        return Handler
+
+def create_auth(db, user_id='default_user', access_token='valid-token', expires_in=28800):
+    """テスト用のFitbit認証情報を保存する"""
+    from models import FitbitAuth
+    from services import get_token_cache
+    
+    get_token_cache().invalidate(user_id)
+    auth = FitbitAuth(
+        user_id=user_id,
+        access_token=access_token,
+        refresh_token='refresh-token',
+        expires_at=datetime.utcnow() + timedelta(seconds=expires_in),
+        scope='weight',
+        token_type='Bearer'
+    )
+    db.session.add(auth)
+    db.session.commit()
+    return auth
+
+class FakeNotificationSender:
+    """
+    Fitbit Subscriptions API の更新通知を送信するテストダブル
+    
+    通知本文に X-Fitbit-Signature（クライアントシークレットによるHMAC-SHA1）を付けて
+    Flaskのテストクライアント、または実際に起動したサーバーのURLへPOSTする。
+    
+    属性:
+        sent (int): 送信した通知の要素数
+    """
+    
+    def __init__(self, client_secret, target, path='/api/fitbit/webhook'):
+        self.client_secret = client_secret
+        self.target = target
+        self.path = path
+        self.sent = 0
+    
+    @staticmethod
+    def payload(changes, collection='body'):
+        """（購読ID, 日付）の組のリストから通知本文を作成"""
+        return [
+            {'collectionType': collection, 'date': day.isoformat(), 'ownerId': 'FAKE01',
+             'ownerType': 'user', 'subscriptionId': subscription_id}
+            for subscription_id, day in changes
+        ]
+    
+    def sign(self, body):
+        digest = hmac.new(f'{self.client_secret}&'.encode(), body, hashlib.sha1).digest()
+        return base64.b64encode(digest).decode()
+    
+    def send(self, changes, collection='body', signature=None):
+        """
+        通知を送信
+        
+        引数:
+            changes (list): (購読ID, date) のリスト
+            collection (str): コレクション
+            signature (str): 署名（省略時は正しい署名）
+        
+        戻り値:
+            int: 応答のステータスコード
+        """
+        body = json.dumps(self.payload(changes, collection)).encode()
+        headers = {'Content-Type': 'application/json', 'X-Fitbit-Signature': signature or self.sign(body)}
+        self.sent += len(changes)
+        
+        if isinstance(self.target, str):
+            return requests.post(f'{self.target}{self.path}', data=body, headers=headers, timeout=10).status_code
+        return self.target.post(self.path, data=body, headers=headers).status_code
@@ -0,0 +1,29 @@
+from app import app, db, create_app, reset_after_fork
+from services import get_fitbit_client, get_result_cache
+
+def test_create_app_without_initialize_skips_schema_creation(monkeypatch):
+    """initialize=False の場合はスキーマ作成などの初期化を行わないテスト（gunicorn のワーカー向け）"""
+    import app as app_module
+    calls = []
+    monkeypatch.setattr(app_module, 'initialize_app', calls.append)
+    
+    other = create_app(initialize=False)
+    assert calls == []
+    
+    create_app()
+    assert len(calls) == 1 and calls[0] is not other
+
+def test_reset_after_fork_recreates_per_process_state():
+    """フォーク後のリセットで接続とクライアントを作り直すテスト"""
+    with app.app_context():
+        client = get_fitbit_client()
+        get_result_cache()
+        db.create_all()
+        
+        reset_after_fork(app)
+        
+        assert 'result_cache' not in app.extensions
+        assert get_fitbit_client() is not client
+        # 破棄後も新しい接続でクエリできる
+        assert db.session.execute(db.text('SELECT 1')).scalar() == 1
+        db.drop_all()
@@ -0,0 +1,170 @@
+import pytest
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import app, db
+from models import FitbitAuth
+from services import issue_api_token
+from tests.fake_fitbit import FakeFitbitServer
+
+@pytest.fixture
+def client():
+    """テスト用のクライアントを作成する"""
+    app.config['TESTING'] = True
+    original = dict(app.config)
+    app.extensions.pop('api_token_cache', None)
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.session.remove()
+            db.drop_all()
+    
+    app.config.update(original)
+    app.extensions.pop('api_token_cache', None)
+
+def _bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+def _create_goal(client, headers=None, target_weight=70.0):
+    target_date = (datetime.now().date() + timedelta(days=30)).isoformat()
+    response = client.post('/api/fit/goal', headers=headers, json={
+        'target_weight': target_weight, 'target_date': target_date, 'start_weight': 80.0
+    })
+    assert response.status_code == 201
+    return json.loads(response.data)['id']
+
+def test_bearer_token_scopes_requests_to_user(client):
+    """ベアラートークンの所有ユーザーのデータだけを扱い、ETagもユーザーごとに異なるテスト"""
+    alice, _ = issue_api_token('alice')
+    bob, _ = issue_api_token('bob')
+    alice_goal = _create_goal(client, _bearer(alice), 70.0)
+    bob_goal = _create_goal(client, _bearer(bob), 65.0)
+    
+    alice_response = client.get('/api/fit/goal', headers=_bearer(alice))
+    bob_response = client.get('/api/fit/goal', headers=_bearer(bob))
+    assert [g['id'] for g in json.loads(alice_response.data)] == [alice_goal]
+    assert [g['id'] for g in json.loads(bob_response.data)] == [bob_goal]
+    assert alice_response.headers['ETag'] != bob_response.headers['ETag']
+    
+    # 他のユーザーの目標は取得・削除できない
+    assert client.get(f'/api/fit/goal/{bob_goal}', headers=_bearer(alice)).status_code != 200
+    assert client.delete(f'/api/fit/goal/{bob_goal}', headers=_bearer(alice)).status_code != 200
+    assert client.get(f'/api/fit/goal/{bob_goal}', headers=_bearer(bob)).status_code == 200
+    # 認証情報のないリクエストは既定ユーザーとして扱う
+    assert json.loads(client.get('/api/fit/goal').data) == []
+
+def test_result_cache_is_per_user(client):
+    """結果キャッシュは同じパスでもユーザーごとに分かれるテスト"""
+    alice, _ = issue_api_token('alice')
+    bob, _ = issue_api_token('bob')
+    _create_goal(client, _bearer(alice), 70.0)
+    
+    first = client.get('/api/fit/goal/evaluation', headers=_bearer(alice))
+    second = client.get('/api/fit/goal/evaluation', headers=_bearer(alice))
+    other = client.get('/api/fit/goal/evaluation', headers=_bearer(bob))
+    
+    assert first.headers['X-Result-Cache'] == 'miss'
+    assert second.headers['X-Result-Cache'] == 'hit'
+    assert other.headers['X-Result-Cache'] == 'miss'
+    assert len(json.loads(second.data)) == 1
+    assert json.loads(other.data) == []
+
+def test_token_lookup_is_cached_and_revocation_applies(client):
+    """トークンの検証結果はキャッシュされ、失効はすぐに反映されるテスト"""
+    token, record = issue_api_token('alice')
+    assert client.get('/api/auth/me', headers=_bearer(token)).status_code == 200
+    
+    statements = []
+    def record_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record_statement)
+    try:
+        response = client.get('/api/auth/me', headers=_bearer(token))
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record_statement)
+    
+    assert json.loads(response.data) == {'user_id': 'alice', 'auth_method': 'token'}
+    assert not any('api_token' in statement for statement in statements)
+    
+    assert client.delete(f'/api/auth/tokens/{record.id}', headers=_bearer(token)).status_code == 200
+    assert client.get('/api/auth/me', headers=_bearer(token)).status_code == 401
+
+def test_invalid_or_missing_credentials_are_rejected(client):
+    """無効なトークンは既定ユーザーにフォールバックせず、既定ユーザーがなければ認証必須になるテスト"""
+    assert client.get('/api/fit/goal', headers=_bearer('unknown')).status_code == 401
+    assert client.get('/api/fit/goal', headers={'Authorization': 'Basic abc'}).status_code == 401
+    
+    expired, record = issue_api_token('alice', expires_in=60)
+    record.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert client.get('/api/fit/goal', headers=_bearer(expired)).status_code == 401
+    
+    app.config['AUTH_DEFAULT_USER'] = ''
+    for path in ('/api/fit/goal', '/api/fitbit/status', '/api/data', '/api/auth/me'):
+        response = client.get(path)
+        assert response.status_code == 401
+        assert json.loads(response.data) == {'error': 'Authentication required'}
+    
+    # Fitbitからのリダイレクトは認証なしで受け付ける（ステートで検証する）
+    assert client.get('/api/fitbit/callback?state=x&code=y').status_code == 400
+
+def test_default_user_cannot_issue_tokens(client):
+    """既定ユーザー（AUTH_DEFAULT_USER）としての認証ではAPIトークンを発行できないテスト"""
+    response = client.post('/api/auth/tokens', json={'name': 'cli'})
+    assert response.status_code == 401
+    assert json.loads(response.data) == {'error': 'A session or API token is required to issue tokens'}
+    
+    token, _ = issue_api_token('default_user')
+    assert client.post('/api/auth/tokens', headers=_bearer(token), json={'name': 'cli'}).status_code == 201
+
+def test_session_login(client):
+    """トークンでセッションにログインすると、以降はクッキーで認証されるテスト"""
+    app.config['AUTH_DEFAULT_USER'] = ''
+    token, _ = issue_api_token('alice')
+    
+    assert client.post('/api/auth/session', json={'token': 'wrong'}).status_code == 401
+    response = client.post('/api/auth/session', json={'token': token})
+    assert json.loads(response.data) == {'user_id': 'alice'}
+    
+    assert json.loads(client.get('/api/auth/me').data) == {'user_id': 'alice', 'auth_method': 'session'}
+    _create_goal(client)
+    
+    issued = client.post('/api/auth/tokens', json={'name': 'cli', 'expires_in': 3600})
+    assert issued.status_code == 201
+    assert json.loads(issued.data)['token']
+    assert [t['name'] for t in json.loads(client.get('/api/auth/tokens').data)] == [None, 'cli']
+    
+    client.delete('/api/auth/session')
+    assert client.get('/api/fit/goal').status_code == 401
+
+def test_fitbit_callback_stores_tokens_for_initiating_user():
+    """Fitbit認証フローを開始したユーザーの認証情報として保存するテスト"""
+    app.config['TESTING'] = True
+    original = dict(app.config)
+    
+    with FakeFitbitServer() as server:
+        app.config['FITBIT_TOKEN_URL'] = f'{server.base_url}/oauth2/token'
+        app.extensions.pop('fitbit_client', None)
+        app.extensions.pop('fitbit_token_cache', None)
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                token, _ = issue_api_token('alice')
+                client.post('/api/auth/session', json={'token': token})
+                
+                assert client.get('/api/fitbit/auth').status_code == 302
+                with client.session_transaction() as session:
+                    state = session['fitbit_oauth_state']
+                
+                response = client.get(f'/api/fitbit/callback?state={state}&code=abc')
+                assert response.status_code == 302
+                assert [auth.user_id for auth in FitbitAuth.query.all()] == ['alice']
+                
+                db.session.remove()
+                db.drop_all()
+    
+    app.config.update(original)
+    app.extensions.pop('fitbit_client', None)
+    app.extensions.pop('fitbit_token_cache', None)
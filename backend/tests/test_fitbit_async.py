@@ -0,0 +1,103 @@
+import pytest
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+import requests
+from app import app, db
+from models import FitbitSyncJob, FitbitSyncState, FitbitWeight
+from services import AsyncFitbitClient, RateLimitExceeded, enqueue_sync, get_fitbit_client, run_pending_jobs
+from tests.fake_fitbit import FakeFitbitServer, make_weight_logs, create_auth
+
+@pytest.fixture
+def fitbit():
+    """ローカルのFitbit APIサーバーに向けたテスト用クライアントを作成する"""
+    app.config['TESTING'] = True
+    original = dict(app.config)
+    today = datetime.now().date()
+    
+    with FakeFitbitServer(make_weight_logs(today - timedelta(days=9), 10)) as server:
+        app.config['FITBIT_API_BASE_URL'] = server.base_url
+        app.config['FITBIT_BACKOFF_BASE'] = 0.01
+        server.rate_limit = 10 ** 6
+        app.extensions.pop('fitbit_client', None)
+        app.extensions.pop('fitbit_token_cache', None)
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                yield client, server
+                db.session.remove()
+                db.drop_all()
+    
+    app.config.update(original)
+    app.extensions.pop('fitbit_client', None)
+    app.extensions.pop('fitbit_async_transport', None)
+
+def test_async_client_retries_and_shares_metrics(fitbit):
+    """非同期クライアントが5xxをリトライし、429と失敗を同期版と同じ例外・計測値で扱うテスト"""
+    _, server = fitbit
+    sync_client = get_fitbit_client()
+    
+    async def fetch(responses):
+        server.responses = responses
+        async with AsyncFitbitClient(sync_client, max_concurrency=2) as client:
+            return await client.get_weight_logs('token', datetime.now().date() - timedelta(days=9), datetime.now().date(),
+                                                user_key='alice')
+    
+    assert len(asyncio.run(fetch([(503, {})]))) == 10
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        asyncio.run(fetch([(429, {'Retry-After': '120'})]))
+    assert excinfo.value.retry_after == 120
+    with pytest.raises(requests.exceptions.HTTPError):
+        asyncio.run(fetch([(401, {})]))
+    
+    metrics = sync_client.metrics.snapshot()
+    assert metrics['calls'] == {'200': 1, '503': 1, '429': 1, '401': 1}
+    assert metrics['retries'] == 1
+
+def test_worker_fetches_batched_jobs_concurrently(fitbit):
+    """同期ジョブの取得を1つのイベントループで同時に実行し、保存はジョブごとに行うテスト"""
+    _, server = fitbit
+    server.latency = 0.2
+    app.extensions['fitbit_async_transport'] = server.mock_transport()
+    
+    users = [f'user-{n}' for n in range(20)]
+    for user_id in users:
+        create_auth(db, user_id=user_id)
+        enqueue_sync(user_id)
+    # 認証情報のないユーザーのジョブは他のジョブを止めずに失敗する
+    enqueue_sync('unknown')
+    
+    started = time.perf_counter()
+    assert run_pending_jobs() == 21
+    elapsed = time.perf_counter() - started
+    
+    assert elapsed < len(users) * server.latency / 2
+    assert len(server.weight_requests()) == 20
+    jobs = {job.user_id: job for job in FitbitSyncJob.query.all()}
+    assert jobs['unknown'].status == 'failed'
+    assert all(jobs[user_id].status == 'completed' for user_id in users)
+    assert FitbitSyncState.query.filter_by(last_status='completed').count() == 20
+    # テストダブルは全ユーザーに同じlogIdを返すため、保存されるのは最初のユーザーの記録のみ
+    assert sum(job.inserted for job in jobs.values()) == FitbitWeight.query.count() == 10
+
+def test_sync_endpoint_wait_mode(fitbit):
+    """wait=true の同期リクエストがリクエスト内で同期し、件数と同期状態を返すテスト"""
+    client, server = fitbit
+    create_auth(db)
+    
+    response = client.post('/api/fitbit/sync?wait=true', json={})
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['counts']['inserted'] == 10
+    assert data['state']['last_status'] == 'completed'
+    assert FitbitSyncJob.query.count() == 0
+    
+    server.responses = [(429, {'Retry-After': '120'})]
+    response = client.post('/api/fitbit/sync?wait=true', json={})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '120'
+    assert FitbitSyncState.query.one().last_status == 'failed'
+    
+    # wait を指定しない場合はジョブを登録する
+    assert client.post('/api/fitbit/sync', json={}).status_code == 202
@@ -0,0 +1,102 @@
+import pytest
+import json
+from datetime import date
+from app import app, db
+from models import FitbitWeight, FitbitBackfill, FitbitSyncJob
+from services import split_date_range, run_pending_jobs
+from tests.fake_fitbit import FakeFitbitServer, make_weight_logs, create_auth
+
+@pytest.fixture(params=[True, False], ids=['async', 'threaded'])
+def fitbit(request):
+    """ローカルのFitbit APIサーバーに向けたテスト用クライアントを作成する（非同期・スレッドの両方の取得方法）"""
+    app.config['TESTING'] = True
+    original = dict(app.config)
+    app.config['FITBIT_ASYNC_IO'] = request.param
+    
+    with FakeFitbitServer(make_weight_logs(date(2023, 1, 1), 100)) as server:
+        app.config['FITBIT_API_BASE_URL'] = server.base_url
+        app.config['FITBIT_BACKFILL_CALLS_PER_HOUR'] = 360000
+        app.extensions.pop('fitbit_client', None)
+        app.extensions.pop('fitbit_token_cache', None)
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                create_auth(db)
+                yield client, server
+                db.session.remove()
+                db.drop_all()
+    
+    app.config.update(original)
+    app.extensions.pop('fitbit_client', None)
+
+def test_split_date_range():
+    """期間のウィンドウ分割テスト"""
+    windows = split_date_range(date(2023, 1, 1), date(2023, 3, 5), window_days=31)
+    
+    assert windows == [
+        (date(2023, 1, 1), date(2023, 1, 31)),
+        (date(2023, 2, 1), date(2023, 3, 3)),
+        (date(2023, 3, 4), date(2023, 3, 5))
+    ]
+
+def test_backfill_fetches_all_windows(fitbit):
+    """全期間をウィンドウに分割して取り込むテスト"""
+    client, server = fitbit
+    
+    response = client.post('/api/fitbit/weight/backfill', json={'from_date': '2023-01-01', 'to_date': '2023-04-10'})
+    assert response.status_code == 202
+    assert json.loads(response.data)['backfill']['status'] == 'pending'
+    assert server.weight_requests() == []
+    
+    run_pending_jobs()
+    
+    response = client.get('/api/fitbit/weight/backfill')
+    data = json.loads(response.data)
+    assert data['backfill']['status'] == 'completed'
+    assert data['backfill']['windows_completed'] == 4
+    assert data['backfill']['inserted'] == 100
+    assert len(server.weight_requests()) == 4
+    assert FitbitWeight.query.count() == 100
+
+def test_backfill_resumes_after_rate_limit(fitbit):
+    """レート制限で中断したバックフィルがチェックポイントから再開するテスト"""
+    client, server = fitbit
+    app.config['FITBIT_BACKFILL_MAX_WORKERS'] = 1
+    app.config['FITBIT_MAX_RETRIES'] = 0
+    # 3回目のリクエストだけレート制限を返す（Noneは通常のレスポンス）
+    server.responses = [None, None, (429, {'Fitbit-Rate-Limit-Reset': '0'})]
+    
+    client.post('/api/fitbit/weight/backfill', json={'from_date': '2023-01-01', 'to_date': '2023-04-10'})
+    run_pending_jobs(limit=1)
+    
+    data = json.loads(client.get('/api/fitbit/weight/backfill').data)
+    assert data['backfill']['status'] == 'paused'
+    assert data['backfill']['next_date'] == '2023-03-04'
+    assert FitbitWeight.query.count() == 62
+    assert FitbitSyncJob.query.one().status == 'pending'
+    
+    # 再実行待ちのジョブがチェックポイントから再開する
+    run_pending_jobs()
+    
+    data = json.loads(client.get('/api/fitbit/weight/backfill').data)
+    assert data['backfill']['status'] == 'completed'
+    assert FitbitWeight.query.count() == 100
+    assert FitbitBackfill.query.one().inserted == 100
+    assert FitbitSyncJob.query.one().status == 'completed'
+    # 取得済みのウィンドウは再取得しない
+    assert len(server.weight_requests()) == 5
+
+def test_backfill_fails_on_malformed_log_and_keeps_checkpoint(fitbit):
+    """取得・保存中の通信エラー以外の例外でもバックフィルが失敗として記録され、チェックポイントが残るテスト"""
+    client, server = fitbit
+    app.config['FITBIT_BACKFILL_MAX_WORKERS'] = 1
+    # 3つ目のウィンドウに日付の不正な体重ログを含める
+    server.weights.append({'logId': 999, 'weight': 70.0, 'date': '2023-03-10T', 'time': '07:00:00'})
+    
+    client.post('/api/fitbit/weight/backfill', json={'from_date': '2023-01-01', 'to_date': '2023-04-10'})
+    run_pending_jobs()
+    
+    data = json.loads(client.get('/api/fitbit/weight/backfill').data)
+    assert data['backfill']['status'] == 'failed'
+    assert data['backfill']['next_date'] == '2023-03-04'
+    assert FitbitWeight.query.count() == 62
@@ -0,0 +1,75 @@
+import pytest
+import requests
+from datetime import date
+from services import FitbitClient, RateLimitExceeded
+from tests.fake_fitbit import FakeFitbitServer, make_weight_logs
+
+@pytest.fixture
+def server():
+    """ローカルのFitbit APIサーバーを起動する"""
+    with FakeFitbitServer(make_weight_logs(date(2024, 1, 1), 10)) as server:
+        yield server
+
+def _client(server, sleeps, **kwargs):
+    """待機を記録するだけのクライアントを作成する"""
+    return FitbitClient(
+        base_url=server.base_url,
+        token_url=f'{server.base_url}/oauth2/token',
+        client_id='id',
+        client_secret='secret',
+        sleep=sleeps.append,
+        **kwargs
+    )
+
+def test_retries_server_errors_with_backoff(server):
+    """5xxと429をバックオフ付きでリトライするテスト"""
+    sleeps = []
+    client = _client(server, sleeps, backoff_base=1, backoff_max=30)
+    server.responses = [(503, {}), (429, {'Fitbit-Rate-Limit-Reset': '2'})]
+    
+    logs = client.get_weight_logs('token', date(2024, 1, 1), date(2024, 1, 5), user_key='u1')
+    
+    assert len(logs) == 5
+    assert len(server.weight_requests()) == 3
+    assert 0.5 <= sleeps[0] <= 1.0
+    assert sleeps[1] >= 2
+    snapshot = client.metrics.snapshot()
+    assert snapshot['calls'] == {'503': 1, '429': 1, '200': 1}
+    assert snapshot['retries'] == 2
+
+def test_gives_up_after_max_retries(server):
+    """リトライ上限に達した場合はエラーを返すテスト"""
+    sleeps = []
+    client = _client(server, sleeps, max_retries=1)
+    server.responses = [(500, {}), (500, {})]
+    
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.get_weight_logs('token', date(2024, 1, 1), user_key='u1')
+    
+    assert len(server.weight_requests()) == 2
+
+def test_does_not_retry_token_requests_on_server_error(server):
+    """トークン取得は5xxでリトライしないテスト（リフレッシュトークンの二重使用を防ぐ）"""
+    client = _client(server, [])
+    server.responses = [(500, {})]
+    
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.request_token({'grant_type': 'refresh_token', 'refresh_token': 'r'})
+    
+    assert len(server.requests) == 1
+
+def test_throttles_from_rate_limit_headers(server):
+    """レート制限ヘッダーの残り回数が0の場合は呼び出さずに拒否するテスト"""
+    client = _client(server, [], max_throttle_wait=10)
+    server.rate_limit = 1
+    
+    client.get_weight_logs('token', date(2024, 1, 1), user_key='u1')
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        client.get_weight_logs('token', date(2024, 1, 2), user_key='u1')
+    
+    assert excinfo.value.retry_after == 3600
+    assert len(server.weight_requests()) == 1
+    assert client.metrics.snapshot()['throttle']['rejections'] == 1
+    
+    # 他のユーザーの呼び出し枠には影響しない
+    client.get_weight_logs('token', date(2024, 1, 2), user_key='u2')
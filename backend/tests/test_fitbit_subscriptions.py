@@ -0,0 +1,112 @@
+import pytest
+import json
+from datetime import datetime, timedelta
+from app import app, db
+from models import FitbitSubscription, FitbitSyncJob, FitbitWeight
+from services import run_pending_jobs, schedule_periodic_syncs, subscribe_user
+from tests.fake_fitbit import FakeFitbitServer, FakeNotificationSender, make_weight_logs, create_auth
+
+CLIENT_SECRET = 'test-client-secret'
+
+@pytest.fixture
+def fitbit():
+    """ローカルのFitbit APIサーバーと通知の送信元を用意する"""
+    app.config['TESTING'] = True
+    original = dict(app.config)
+    today = datetime.now().date()
+    
+    with FakeFitbitServer(make_weight_logs(today - timedelta(days=9), 10)) as server:
+        app.config['FITBIT_API_BASE_URL'] = server.base_url
+        app.config['FITBIT_CLIENT_SECRET'] = CLIENT_SECRET
+        app.config['FITBIT_SUBSCRIBER_VERIFICATION_CODE'] = 'verify-me'
+        app.extensions.pop('fitbit_client', None)
+        app.extensions.pop('fitbit_token_cache', None)
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                yield client, server, FakeNotificationSender(CLIENT_SECRET, client)
+                db.session.remove()
+                db.drop_all()
+    
+    app.config.update(original)
+    app.extensions.pop('fitbit_client', None)
+
+def _day(days_ago):
+    return datetime.now().date() - timedelta(days=days_ago)
+
+def test_subscriber_verification(fitbit):
+    """確認コードが一致する場合だけ204を返すテスト"""
+    client, server, sender = fitbit
+    
+    assert client.get('/api/fitbit/webhook?verify=verify-me').status_code == 204
+    assert client.get('/api/fitbit/webhook?verify=wrong').status_code == 404
+    assert client.get('/api/fitbit/webhook').status_code == 404
+
+def test_subscription_endpoints(fitbit):
+    """購読の登録は1回だけFitbitに登録し、解除で削除するテスト"""
+    client, server, sender = fitbit
+    
+    assert client.post('/api/fitbit/subscription').status_code == 401
+    
+    create_auth(db)
+    response = client.post('/api/fitbit/subscription')
+    assert response.status_code == 201
+    subscription_id = json.loads(response.data)['subscription']['subscription_id']
+    assert server.subscriptions == {subscription_id: 'body'}
+    
+    assert client.post('/api/fitbit/subscription').status_code == 201
+    assert len([path for method, path in server.requests if 'apiSubscriptions' in path]) == 1
+    assert json.loads(client.get('/api/fitbit/subscription').data)['subscription']['subscription_id'] == subscription_id
+    
+    assert client.delete('/api/fitbit/subscription').status_code == 200
+    assert server.subscriptions == {}
+    assert FitbitSubscription.query.count() == 0
+    assert client.delete('/api/fitbit/subscription').status_code == 404
+
+def test_notification_syncs_only_notified_days(fitbit):
+    """通知された（ユーザー, 日付）の組だけをジョブにし、その日だけを取得するテスト"""
+    client, server, sender = fitbit
+    create_auth(db, user_id='user-a')
+    create_auth(db, user_id='user-b')
+    subscription_a = subscribe_user('user-a').subscription_id
+    subscription_b = subscribe_user('user-b').subscription_id
+    
+    # 署名が不正な通知は拒否する
+    assert sender.send([(subscription_a, _day(1))], signature='invalid') == 404
+    assert FitbitSyncJob.query.count() == 0
+    
+    changes = [(subscription_a, _day(1)), (subscription_a, _day(3)), (subscription_b, _day(1)), ('unknown', _day(2))]
+    assert sender.send(changes) == 204
+    # 同じ日の未実行ジョブがあれば重複して登録しない
+    assert sender.send([(subscription_a, _day(1))]) == 204
+    # 体重以外のコレクションは無視する
+    assert sender.send([(subscription_b, _day(5))], collection='activities') == 204
+    
+    jobs = FitbitSyncJob.query.order_by(FitbitSyncJob.user_id, FitbitSyncJob.from_date).all()
+    assert [(job.user_id, job.kind, job.from_date, job.to_date) for job in jobs] == [
+        ('user-a', 'day', _day(3), _day(3)), ('user-a', 'day', _day(1), _day(1)), ('user-b', 'day', _day(1), _day(1))
+    ]
+    
+    assert run_pending_jobs() == 3
+    assert sorted(server.weight_requests()) == sorted([
+        f'/1/user/-/body/log/weight/date/{_day(3).isoformat()}.json',
+        f'/1/user/-/body/log/weight/date/{_day(1).isoformat()}.json',
+        f'/1/user/-/body/log/weight/date/{_day(1).isoformat()}.json'
+    ])
+    assert {job.status for job in FitbitSyncJob.query} == {'completed'}
+    assert sorted(w.date for w in FitbitWeight.query.filter_by(user_id='user-a')) == [_day(3), _day(1)]
+
+def test_subscribed_users_are_polled_less_often(fitbit):
+    """購読済みのユーザーは FITBIT_SUBSCRIBED_SYNC_INTERVAL が経過するまで定期同期しないテスト"""
+    client, server, sender = fitbit
+    create_auth(db, user_id='user-a')
+    create_auth(db, user_id='user-b')
+    subscribe_user('user-a')
+    
+    assert schedule_periodic_syncs() == 2
+    assert run_pending_jobs() == 2
+    
+    assert schedule_periodic_syncs(now=datetime.utcnow() + timedelta(hours=1)) == 1
+    assert FitbitSyncJob.query.filter_by(status='pending').one().user_id == 'user-b'
+    run_pending_jobs()
+    assert schedule_periodic_syncs(now=datetime.utcnow() + timedelta(days=2)) == 2
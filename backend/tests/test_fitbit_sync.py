@@ -0,0 +1,126 @@
+import pytest
+from datetime import date, time
+from app import app, db
+from models import FitbitWeight
+from services import upsert_weight_entries
+
+@pytest.fixture
+def app_context():
+    """テスト用のアプリケーションコンテキストを作成する"""
+    app.config['TESTING'] = True
+    
+    with app.app_context():
+        db.create_all()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+def _entry(log_id, weight, day='2024-01-01', clock='07:00:00'):
+    """Fitbit APIの体重ログ形式のエントリを作成する"""
+    return {
+        'logId': log_id,
+        'weight': weight,
+        'bmi': 24.0,
+        'date': day,
+        'time': clock,
+        'source': 'API'
+    }
+
+def test_upsert_inserts_new_entries(app_context):
+    """新規エントリの一括保存テスト"""
+    entries = [_entry(i, 70 + i, day=f'2024-01-0{i}') for i in range(1, 4)]
+    
+    result = upsert_weight_entries('default_user', entries)
+    
+    assert result == {'inserted': 3, 'updated': 0, 'skipped': 0, 'conflicts': 0}
+    stored = FitbitWeight.query.order_by(FitbitWeight.date).all()
+    assert [w.weight for w in stored] == [71, 72, 73]
+    assert stored[0].date == date(2024, 1, 1)
+    assert stored[0].time == time(7, 0, 0)
+    assert stored[0].user_id == 'default_user'
+
+def test_upsert_updates_edited_and_skips_unchanged(app_context):
+    """編集されたログの更新と未変更ログのスキップテスト"""
+    upsert_weight_entries('default_user', [_entry(1, 70.0), _entry(2, 71.0, day='2024-01-02')])
+    
+    result = upsert_weight_entries('default_user', [
+        _entry(1, 70.0),
+        _entry(2, 70.5, day='2024-01-02'),
+        _entry(3, 69.0, day='2024-01-03'),
+        {'weight': 68.0, 'date': '2024-01-04'}
+    ])
+    
+    assert result == {'inserted': 1, 'updated': 1, 'skipped': 2, 'conflicts': 0}
+    assert FitbitWeight.query.filter_by(log_id='2').one().weight == 70.5
+    assert FitbitWeight.query.count() == 3
+
+def test_upsert_resolves_existing_logs_per_batch(app_context):
+    """既存ログの照合がバッチごとに1クエリで行われることのテスト"""
+    from sqlalchemy import event
+    
+    entries = [_entry(i, 70.0) for i in range(10)]
+    upsert_weight_entries('default_user', entries[:5])
+    
+    statements = []
+    def count_selects(conn, cursor, statement, *args):
+        # 日次集計の再計算のクエリは除いて、logIdの照合クエリのみを数える
+        if statement.lstrip().upper().startswith('SELECT') and 'fitbit_weight.log_id IN' in statement:
+            statements.append(statement)
+    
+    event.listen(db.engine, 'before_cursor_execute', count_selects)
+    try:
+        result = upsert_weight_entries('default_user', entries, batch_size=5)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_selects)
+    
+    assert result == {'inserted': 5, 'updated': 0, 'skipped': 5, 'conflicts': 0}
+    assert len(statements) == 2
+
+def test_concurrently_inserted_log_is_ignored(app_context):
+    """別のワーカーが先に追加した logId と衝突しても一意制約エラーにならないテスト"""
+    from services import upsert_insert
+    
+    upsert_weight_entries('default_user', [_entry(1, 70.0)])
+    upsert = upsert_insert(db.session)
+    row = {'user_id': 'default_user', 'log_id': '1', 'weight': 71.0, 'date': date(2024, 1, 1)}
+    
+    db.session.execute(upsert(FitbitWeight).on_conflict_do_nothing(index_elements=['log_id']), [row])
+    db.session.commit()
+    
+    assert [w.weight for w in FitbitWeight.query.all()] == [70.0]
+
+def test_rows_inserted_by_another_worker_are_not_counted(app_context):
+    """照合後に別のワーカーが追加した logId は追加件数・データバージョンに含めないテスト"""
+    from sqlalchemy import event
+    from services import get_data_version
+    
+    upsert_weight_entries('default_user', [_entry(1, 70.0)])
+    version = get_data_version('default_user')
+    
+    raced = []
+    def insert_first(conn, cursor, statement, *args):
+        # 既存ログの照合とINSERTの間に別のワーカーが同じ logId を追加した状況を再現
+        if not raced and statement.lstrip().upper().startswith('INSERT INTO FITBIT_WEIGHT'):
+            raced.append(statement)
+            cursor.execute("INSERT INTO fitbit_weight (user_id, log_id, weight, date) "
+                           "VALUES ('default_user', '2', 71.0, '2024-01-02')")
+    
+    event.listen(db.engine, 'before_cursor_execute', insert_first)
+    try:
+        result = upsert_weight_entries('default_user', [_entry(2, 71.0, day='2024-01-02')])
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', insert_first)
+    
+    assert result == {'inserted': 0, 'updated': 0, 'skipped': 1, 'conflicts': 0}
+    assert get_data_version('default_user') == version
+
+def test_log_id_owned_by_another_user_is_a_conflict(app_context):
+    """別のユーザーのレコードと logId が衝突した場合に更新せず conflicts として数えるテスト"""
+    upsert_weight_entries('alice', [_entry(1, 70.0)])
+    
+    result = upsert_weight_entries('bob', [_entry(1, 90.0), _entry(2, 91.0, day='2024-01-02')])
+    
+    assert result == {'inserted': 1, 'updated': 0, 'skipped': 0, 'conflicts': 1}
+    record = FitbitWeight.query.filter_by(log_id='1').one()
+    assert (record.user_id, record.weight) == ('alice', 70.0)
+    assert FitbitWeight.query.filter_by(user_id='bob').count() == 1
@@ -0,0 +1,88 @@
+import pytest
+import json
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import app, db
+from models import FitbitAuth
+from services import get_valid_token, get_token_cache
+from tests.fake_fitbit import FakeFitbitServer, create_auth
+
+@pytest.fixture
+def server():
+    """ローカルのFitbit APIサーバーに向けたアプリケーションコンテキストを作成する"""
+    app.config['TESTING'] = True
+    original = dict(app.config)
+    
+    with FakeFitbitServer(latency=0.05) as server:
+        app.config['FITBIT_TOKEN_URL'] = f'{server.base_url}/oauth2/token'
+        app.extensions.pop('fitbit_client', None)
+        app.extensions.pop('fitbit_token_cache', None)
+        with app.app_context():
+            db.create_all()
+            yield server
+            db.session.remove()
+            db.drop_all()
+    
+    app.config.update(original)
+    app.extensions.pop('fitbit_client', None)
+
+def _token_requests(server):
+    return [path for method, path in server.requests if path == '/oauth2/token']
+
+def test_valid_token_is_served_from_cache(server):
+    """有効なトークンはデータベースにアクセスせずに返すテスト"""
+    create_auth(db, access_token='cached-token')
+    get_valid_token('default_user')
+    
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+    
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        with app.test_client() as client:
+            response = client.get('/api/fitbit/status')
+        token = get_valid_token('default_user')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    
+    assert json.loads(response.data)['is_authenticated'] is True
+    assert token.access_token == 'cached-token'
+    assert statements == []
+
+def test_expiring_token_is_refreshed_once_under_concurrency(server):
+    """期限が近いトークンを同時に要求しても更新は1回だけ行われるテスト"""
+    create_auth(db, access_token='old-token', expires_in=60)
+    results = []
+    
+    def worker():
+        with app.app_context():
+            results.append(get_valid_token('default_user').access_token)
+    
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(_token_requests(server)) == 1
+    assert len(set(results)) == 1 and results[0] != 'old-token'
+    assert FitbitAuth.query.one().access_token == results[0]
+
+def test_refresh_by_another_process_is_reused(server):
+    """他のプロセスが更新済みのトークンはリフレッシュせずに再利用するテスト"""
+    create_auth(db, access_token='other-process-token')
+    
+    # このプロセスのキャッシュには期限間近の古いトークンが残っている状態を再現
+    cache = get_token_cache()
+    stale = get_valid_token('default_user')
+    cache._entries['default_user'] = stale._replace(
+        access_token='stale-token',
+        expires_at=datetime.utcnow() + timedelta(seconds=30)
+    )
+    
+    token = get_valid_token('default_user')
+    
+    assert token.access_token == 'other-process-token'
+    assert _token_requests(server) == []
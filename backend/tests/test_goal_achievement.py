@@ -0,0 +1,108 @@
+import pytest
+import json
+from datetime import datetime, timedelta
+from app import app, db
+from models import WeightGoal, FitbitWeight
+from services import upsert_weight_entries
+
+@pytest.fixture
+def client():
+    """テスト用のクライアントを作成する"""
+    app.config['TESTING'] = True
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.session.remove()
+            db.drop_all()
+            app.config['GOAL_ACHIEVEMENT_SMOOTHING_DAYS'] = 1
+            app.config['GOAL_ACHIEVEMENT_DETECTION'] = True
+
+def _day(days_ago):
+    return datetime.now().date() - timedelta(days=days_ago)
+
+def _add_goal(user_id, target_weight, start_weight=80.0, start_days_ago=30):
+    goal = WeightGoal(
+        user_id=user_id,
+        target_weight=target_weight,
+        target_date=_day(-60),
+        start_weight=start_weight,
+        start_date=_day(start_days_ago)
+    )
+    db.session.add(goal)
+    db.session.commit()
+    return goal.id
+
+def _sync(user_id, weights):
+    """days_ago -> 体重 の辞書から1日1件の記録を同期する"""
+    upsert_weight_entries(user_id, [
+        {'logId': f'{user_id}-{days_ago}', 'weight': weight, 'date': _day(days_ago).isoformat(), 'time': '07:00:00'}
+        for days_ago, weight in weights.items()
+    ])
+    db.session.commit()
+
+def test_sync_marks_goal_achieved(client):
+    """同期で目標に到達した記録が入ると、最初に到達した日で達成済みになるテスト"""
+    goal_id = _add_goal('default_user', 75.0)
+    later_goal_id = _add_goal('default_user', 76.0, start_days_ago=2)
+    other_goal_id = _add_goal('other_user', 75.0)
+    
+    _sync('default_user', {10: 76.0, 8: 75.5})
+    assert db.session.get(WeightGoal, goal_id).is_achieved is False
+    
+    _sync('default_user', {5: 74.9, 4: 75.2, 3: 74.5})
+    
+    goal = db.session.get(WeightGoal, goal_id)
+    assert goal.is_achieved is True
+    assert goal.achieved_date == _day(5)
+    # 開始日より前の記録では判定しない
+    assert db.session.get(WeightGoal, later_goal_id).is_achieved is False
+    # 他のユーザーの目標は対象外
+    assert db.session.get(WeightGoal, other_goal_id).is_achieved is False
+    
+    active = json.loads(client.get('/api/fit/goal?active_only=true').data)
+    assert [g['id'] for g in active] == [later_goal_id]
+
+def test_gain_goal_and_manual_entry(client):
+    """増量目標がORM経由の手動記録でも達成になるテスト"""
+    goal_id = _add_goal('default_user', 62.0, start_weight=60.0)
+    
+    db.session.add(FitbitWeight(user_id='default_user', weight=62.3, date=_day(1)))
+    db.session.commit()
+    
+    goal = db.session.get(WeightGoal, goal_id)
+    assert goal.is_achieved is True
+    assert goal.achieved_date == _day(1)
+
+def test_maintenance_goal_is_not_auto_achieved(client):
+    """目標体重が開始時の体重と同じ維持目標は、上下どちらの記録でも自動で達成にならないテスト"""
+    goal_id = _add_goal('default_user', 70.0, start_weight=70.0)
+    
+    _sync('default_user', {3: 70.0, 2: 70.4, 1: 69.6})
+    
+    goal = db.session.get(WeightGoal, goal_id)
+    assert goal.is_achieved is False
+    assert goal.achieved_date is None
+
+def test_smoothing_ignores_single_fluke(client):
+    """移動平均で判定する場合は1回だけの外れ値では達成にならないテスト"""
+    app.config['GOAL_ACHIEVEMENT_SMOOTHING_DAYS'] = 3
+    goal_id = _add_goal('default_user', 75.0)
+    
+    _sync('default_user', {6: 76.5, 5: 74.0, 4: 76.5})
+    assert db.session.get(WeightGoal, goal_id).is_achieved is False
+    
+    _sync('default_user', {3: 74.8, 2: 74.6, 1: 74.5})
+    goal = db.session.get(WeightGoal, goal_id)
+    assert goal.is_achieved is True
+    assert goal.achieved_date == _day(1)
+
+def test_detection_can_be_disabled(client):
+    """設定で無効にした場合は達成の判定を行わないテスト"""
+    app.config['GOAL_ACHIEVEMENT_DETECTION'] = False
+    goal_id = _add_goal('default_user', 75.0)
+    
+    _sync('default_user', {1: 74.0})
+    
+    assert db.session.get(WeightGoal, goal_id).is_achieved is False
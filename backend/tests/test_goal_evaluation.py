@@ -0,0 +1,143 @@
+import pytest
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import app, db
+from models import WeightGoal
+from services import upsert_weight_entries, evaluate_all_active_goals
+
+@pytest.fixture
+def client():
+    """テスト用のクライアントを作成する"""
+    app.config['TESTING'] = True
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.session.remove()
+            db.drop_all()
+
+def _seed(user_id, days, start_weight=80.0, change=-0.1):
+    """今日までの days 日分の1日1件の体重データを追加する"""
+    today = datetime.now().date()
+    upsert_weight_entries(user_id, [
+        {
+            'logId': f'{user_id}-{i}', 'weight': round(start_weight + change * i, 2),
+            'date': (today - timedelta(days=days - 1 - i)).isoformat(), 'time': '07:00:00'
+        }
+        for i in range(days)
+    ])
+    db.session.commit()
+
+def _add_goal(user_id, target_weight, start_weight=80.0, start_days_ago=29, target_in_days=60, is_achieved=False):
+    today = datetime.now().date()
+    goal = WeightGoal(
+        user_id=user_id,
+        target_weight=target_weight,
+        target_date=today + timedelta(days=target_in_days),
+        start_weight=start_weight,
+        start_date=today - timedelta(days=start_days_ago)
+    )
+    goal.is_achieved = is_achieved
+    db.session.add(goal)
+    db.session.commit()
+    return goal.id
+
+def _count_statements(client, url):
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return response, statements
+
+def test_goal_evaluation_matches_diff_and_projection(client):
+    """一括評価の結果が個別の差分・予測エンドポイントと一致するテスト"""
+    _seed('default_user', 30)
+    goal_id = _add_goal('default_user', 70.0)
+    
+    response = client.get('/api/fit/goal/evaluation?model=linear&lookback=28')
+    assert response.status_code == 200
+    [evaluation] = json.loads(response.data)
+    
+    diff = json.loads(client.get(f'/api/fit/weight/diff?goal_id={goal_id}').data)
+    projection = json.loads(client.get(f'/api/fit/weight/projection?goal_id={goal_id}&model=linear&lookback=28').data)
+    
+    recorded = [day for day in diff['daily_weight_diffs'] if day['difference'] is not None]
+    assert evaluation['goal'] == diff['goal']
+    assert evaluation['diff']['days_with_data'] == len(recorded)
+    assert evaluation['diff']['latest_date'] == recorded[-1]['date']
+    assert evaluation['diff']['latest_difference'] == recorded[-1]['difference']
+    assert evaluation['diff']['on_track'] == (recorded[-1]['difference'] <= 0)
+    
+    assert evaluation['projection']['model'] == 'linear'
+    assert evaluation['projection']['avg_change_per_day'] == pytest.approx(projection['avg_change_per_day'])
+    assert evaluation['projection']['estimated_weight'] == projection['estimated_weight']
+    assert evaluation['projection']['projected_completion_date'] == projection['projected_completion_date']
+
+def test_goal_evaluation_query_count_is_constant(client):
+    """目標の数によらず一括評価のクエリ数が一定であるテスト"""
+    _seed('default_user', 30)
+    _add_goal('default_user', 70.0)
+    app.extensions.pop('result_cache', None)
+    response, one_goal = _count_statements(client, '/api/fit/goal/evaluation')
+    assert response.status_code == 200
+    
+    for i in range(5):
+        _add_goal('default_user', 72.0 + i, target_in_days=30 + i)
+    app.extensions.pop('result_cache', None)
+    response, six_goals = _count_statements(client, '/api/fit/goal/evaluation')
+    
+    assert len(json.loads(response.data)) == 6
+    assert len(six_goals) == len(one_goal)
+
+def test_goal_evaluation_insufficient_data_and_validation(client):
+    """データがない場合は予測なしで返し、不正なパラメータは400を返すテスト"""
+    _add_goal('default_user', 70.0)
+    
+    [evaluation] = json.loads(client.get('/api/fit/goal/evaluation').data)
+    assert evaluation['diff']['days_with_data'] == 0
+    assert evaluation['diff']['on_track'] is None
+    assert evaluation['projection']['insufficient_data'] is True
+    
+    assert client.get('/api/fit/goal/evaluation?model=spline').status_code == 400
+    assert client.get('/api/fit/goal/evaluation?lookback=1').status_code == 400
+    assert client.get('/api/fit/goal/evaluation?daily_policy=median').status_code == 400
+
+def test_evaluate_all_active_goals_single_scan(client):
+    """全ユーザーのアクティブな目標を日次集計の1回の走査で評価するテスト"""
+    _seed('alice', 30)
+    _seed('bob', 30, start_weight=60.0, change=0.1)
+    alice_goal = _add_goal('alice', 75.0)
+    _add_goal('alice', 72.0, is_achieved=True)
+    bob_goal = _add_goal('bob', 65.0, start_weight=60.0)
+    carol_goal = _add_goal('carol', 50.0, start_weight=55.0)
+    
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        results = dict(evaluate_all_active_goals(model='linear', lookback=28))
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    
+    assert sorted(results) == ['alice', 'bob', 'carol']
+    assert [e['goal']['id'] for e in results['alice']] == [alice_goal]
+    assert [e['goal']['id'] for e in results['bob']] == [bob_goal]
+    assert [e['goal']['id'] for e in results['carol']] == [carol_goal]
+    
+    assert results['alice'][0]['diff']['on_track'] is True
+    assert results['alice'][0]['projection']['avg_change_per_day'] == pytest.approx(-0.1)
+    assert results['bob'][0]['projection']['avg_change_per_day'] == pytest.approx(0.1)
+    assert results['carol'][0]['projection']['insufficient_data'] is True
+    assert results['carol'][0]['goal']['progress_percentage'] == 0
+    
+    # 目標の取得と日次集計の走査のみ
+    assert len(statements) == 2
@@ -0,0 +1,116 @@
+import pytest
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import app, db
+from models import FitbitWeight, WeightGoal
+from services import upsert_weight_entries, get_data_version, DATA_SCOPE
+
+@pytest.fixture
+def client():
+    """テスト用のクライアントを作成する"""
+    app.config['TESTING'] = True
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.session.remove()
+            db.drop_all()
+
+def _create_goal(client, target_weight=70.0):
+    target_date = (datetime.now().date() + timedelta(days=30)).isoformat()
+    response = client.post('/api/fit/goal', json={
+        'target_weight': target_weight, 'target_date': target_date, 'start_weight': 80.0
+    })
+    assert response.status_code == 201
+    return json.loads(response.data)['id']
+
+def test_not_modified_skips_view(client):
+    """ETagが一致する場合はビュー関数を実行せずに304を返すテスト"""
+    _create_goal(client)
+    
+    first = client.get('/api/fit/goal')
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    etag = first.headers['ETag']
+    
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        second = client.get('/api/fit/goal', headers={'If-None-Match': etag})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    
+    assert second.status_code == 304
+    assert second.data == b''
+    assert second.headers['ETag'] == etag
+    # バージョンの取得のみ
+    assert len(statements) == 1 and 'data_version' in statements[0]
+
+def test_etag_depends_on_query_parameters(client):
+    """クエリパラメータが異なればETagも異なるテスト"""
+    _create_goal(client)
+    
+    assert client.get('/api/fit/goal').headers['ETag'] != client.get('/api/fit/goal?active_only=true').headers['ETag']
+
+def test_goal_writes_invalidate(client):
+    """目標の作成・更新・削除でETagが変わるテスト"""
+    goal_id = _create_goal(client)
+    etag = client.get('/api/fit/goal').headers['ETag']
+    
+    client.put(f'/api/fit/goal/{goal_id}', json={'target_weight': 68.0})
+    response = client.get('/api/fit/goal', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert json.loads(response.data)[0]['target_weight'] == 68.0
+    
+    etag = response.headers['ETag']
+    client.delete(f'/api/fit/goal/{goal_id}')
+    assert client.get('/api/fit/goal', headers={'If-None-Match': etag}).status_code == 200
+
+def test_weight_sync_invalidates_analysis(client):
+    """同期による体重データの追加・更新で分析のETagが変わるテスト"""
+    entry = {'logId': 1, 'weight': 70.0, 'date': datetime.now().date().isoformat(), 'time': '07:00:00'}
+    upsert_weight_entries('default_user', [entry])
+    
+    first = client.get('/api/fitbit/weight/analysis')
+    assert first.headers['Cache-Control'].startswith('private, max-age=60')
+    etag = first.headers['ETag']
+    assert client.get('/api/fitbit/weight/analysis', headers={'If-None-Match': etag}).status_code == 304
+    
+    # 変更のない同期ではバージョンは変わらない
+    upsert_weight_entries('default_user', [entry])
+    assert client.get('/api/fitbit/weight/analysis', headers={'If-None-Match': etag}).status_code == 304
+    
+    upsert_weight_entries('default_user', [dict(entry, weight=69.5)])
+    response = client.get('/api/fitbit/weight/analysis', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert json.loads(response.data)['analysis']['end_weight'] == 69.5
+
+def test_versions_are_scoped(client):
+    """Data とユーザーのバージョンが独立しており、ロールバックでは変わらないテスト"""
+    _create_goal(client)
+    user_version = get_data_version('default_user')
+    
+    client.post('/api/data', json={'name': 'a', 'value': 1, 'category': 'c'})
+    assert get_data_version(DATA_SCOPE) == 1
+    assert get_data_version('default_user') == user_version
+    
+    db.session.add(FitbitWeight(user_id='default_user', weight=70.0, date=datetime.now().date()))
+    db.session.flush()
+    db.session.rollback()
+    assert get_data_version('default_user') == user_version
+    
+    db.session.add(WeightGoal(user_id='other_user', target_weight=60, target_date=datetime.now().date(),
+                              start_weight=65, start_date=datetime.now().date()))
+    db.session.commit()
+    assert get_data_version('other_user') == 1
+    assert get_data_version('default_user') == user_version
+
+def test_errors_are_not_cached(client):
+    """エラー応答にはETagを付けないテスト"""
+    response = client.get('/api/fit/weight/diff')
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
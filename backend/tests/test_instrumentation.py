@@ -0,0 +1,107 @@
+import pytest
+from datetime import datetime, timedelta, time
+from app import app, db
+from models import FitbitWeight, WeightGoal
+from services import get_request_metrics, issue_api_token
+
+@pytest.fixture
+def client():
+    """計測値を初期化したテスト用のクライアントを作成する"""
+    app.config['TESTING'] = True
+    original = dict(app.config)
+    app.extensions.pop('request_metrics', None)
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.session.remove()
+            db.drop_all()
+    
+    app.config.update(original)
+    app.extensions.pop('request_metrics', None)
+
+def _goal_with_weights():
+    today = datetime.now().date()
+    goal = WeightGoal(user_id='default_user', target_weight=70.0, target_date=today + timedelta(days=30),
+                      start_weight=80.0, start_date=today - timedelta(days=3))
+    db.session.add(goal)
+    for i in range(3):
+        db.session.add(FitbitWeight(user_id='default_user', weight=80 - i, date=today - timedelta(days=3 - i),
+                                    time=time(7), log_id=str(i)))
+    db.session.commit()
+    return goal
+
+def test_metrics_record_routes_queries_and_cache(client):
+    """ルートごとの応答時間・クエリ数・キャッシュのヒット率を /metrics で出力するテスト"""
+    goal = _goal_with_weights()
+    url = f'/api/fit/weight/diff?goal_id={goal.id}'
+    
+    first = client.get(url)
+    second = client.get(url)
+    assert first.status_code == second.status_code == 200
+    assert 'db;dur=' in first.headers['Server-Timing']
+    
+    snapshot = get_request_metrics().snapshot()
+    assert snapshot['requests'][('/api/fit/weight/diff', 'GET', '200')] == 2
+    _, total, count = snapshot['query_counts'][('/api/fit/weight/diff', 'GET')]
+    assert count == 2 and total > 0
+    # 2回目は結果キャッシュから返すため、初回よりクエリが少ない
+    queries = [int(r.headers['Server-Timing'].split('desc="')[1].split()[0]) for r in (first, second)]
+    assert queries[1] < queries[0]
+    
+    body = client.get('/metrics').data.decode()
+    assert 'weight_goal_http_request_duration_seconds_count{route="/api/fit/weight/diff",method="GET"} 2' in body
+    assert 'weight_goal_http_request_db_queries_bucket{route="/api/fit/weight/diff",method="GET",le="+Inf"} 2' in body
+    assert 'weight_goal_cache_hits_total{cache="result"} 1' in body
+    assert 'weight_goal_cache_misses_total{cache="result"} 1' in body
+    # 存在しないURLはルートごとに分けない
+    client.get('/no/such/path')
+    assert ('<unmatched>', 'GET', '404') in get_request_metrics().snapshot()['requests']
+
+def test_metrics_token_and_disable(client):
+    """METRICS_TOKEN の認証と、METRICS_ENABLED・トークン未設定の本番環境での無効化のテスト"""
+    app.config['METRICS_TOKEN'] = 'secret'
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    
+    app.config['METRICS_ENABLED'] = False
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 404
+    
+    # 本番環境ではトークンが未設定なら公開しない
+    app.config.update(METRICS_ENABLED=True, METRICS_REQUIRE_TOKEN=True, METRICS_TOKEN=None)
+    assert client.get('/metrics').status_code == 404
+
+def test_profile_mode(client):
+    """認証されたリクエストの ?profile=1 でプロファイルを返し、無効時は通常の応答を返すテスト"""
+    goal = _goal_with_weights()
+    url = f'/api/fit/weight/diff?goal_id={goal.id}&profile=1'
+    token, _ = issue_api_token('default_user')
+    headers = {'Authorization': f'Bearer {token}'}
+    
+    # 既定ユーザー（AUTH_DEFAULT_USER）へのフォールバックではプロファイリングしない
+    response = client.get(url)
+    assert response.status_code == 401
+    assert 'X-Profile-Status' not in response.headers
+    get_request_metrics().reset()
+    
+    # METRICS_TOKEN でもプロファイリングできる
+    app.config['METRICS_TOKEN'] = 'secret'
+    assert client.get(url, headers={'Authorization': 'Bearer secret'}).headers['X-Profile-Status'] == '401'
+    
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert response.headers['X-Profile-Status'] == '200'
+    assert int(response.headers['X-Profile-Queries']) > 0
+    assert 'get_weight_diff' in response.data.decode()
+    # プロファイリングした応答は計測値に含めない
+    assert get_request_metrics().snapshot()['requests'] == {}
+    
+    app.config['PROFILING_ENABLED'] = False
+    response = client.get(url, headers=headers)
+    assert response.is_json
+    assert 'X-Profile-Status' not in response.headers
@@ -0,0 +1,52 @@
+from sqlalchemy import create_engine, inspect
+from models import db, FitbitWeight, run_migrations
+
+def test_migrations_add_indexes_to_existing_database(tmp_path):
+    """インデックス追加前に作成されたデータベースにインデックスが追加されるテスト"""
+    engine = create_engine(f'sqlite:///{tmp_path / "legacy.db"}')
+    
+    # インデックスのない旧スキーマを再現
+    with engine.begin() as connection:
+        FitbitWeight.__table__.create(connection)
+        for index in FitbitWeight.__table__.indexes:
+            index.drop(connection)
+    assert inspect(engine).get_indexes('fitbit_weight') == []
+    
+    applied = run_migrations(engine)
+    
+    indexes = {index['name']: index['column_names'] for index in inspect(engine).get_indexes('fitbit_weight')}
+    assert indexes['idx_fitbit_weight_user_date_time'] == ['user_id', 'date', 'time', 'weight']
+    assert 1 in applied
+    
+    # 適用済みのマイグレーションは再実行しない
+    assert run_migrations(engine) == []
+
+def test_latest_weight_query_uses_covering_index(tmp_path):
+    """最新体重の取得が複合インデックスのみで完結するテスト"""
+    engine = create_engine(f'sqlite:///{tmp_path / "plan.db"}')
+    FitbitWeight.__table__.create(engine)
+    
+    with engine.connect() as connection:
+        plan = connection.exec_driver_sql(
+            'EXPLAIN QUERY PLAN SELECT weight FROM fitbit_weight WHERE user_id = ? '
+            'ORDER BY date DESC, time DESC LIMIT 1', ('u1',)
+        ).fetchall()
+    
+    detail = ' '.join(row[-1] for row in plan)
+    assert 'COVERING INDEX idx_fitbit_weight_user_date_time' in detail
+    assert 'TEMP B-TREE' not in detail
+
+def test_migrations_add_sync_high_water_mark_columns(tmp_path):
+    """high-water mark の列がない同期状態テーブルに列が追加されるテスト"""
+    engine = create_engine(f'sqlite:///{tmp_path / "legacy.db"}')
+    db.metadata.create_all(engine, tables=[t for t in db.metadata.sorted_tables if t.name != 'fitbit_sync_state'])
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            'CREATE TABLE fitbit_sync_state (id INTEGER PRIMARY KEY, user_id VARCHAR(100) NOT NULL UNIQUE, '
+            'last_synced_at DATETIME, last_attempt_at DATETIME, last_status VARCHAR(20), last_error TEXT)'
+        )
+    
+    assert 3 in run_migrations(engine)
+    
+    columns = {column['name'] for column in inspect(engine).get_columns('fitbit_sync_state')}
+    assert {'last_synced_date', 'last_log_id'} <= columns
@@ -0,0 +1,112 @@
+import pytest
+import json
+from datetime import datetime, timedelta, time
+from app import app, db
+from models import FitbitWeight, WeightGoal
+from services import MemoryResultCache, SQLiteResultCache, create_result_cache, upsert_weight_entries
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def client():
+    """テスト用のクライアントを作成する"""
+    app.config['TESTING'] = True
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.session.remove()
+            db.drop_all()
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def cache(request, tmp_path):
+    clock = FakeClock()
+    if request.param == 'memory':
+        backend = MemoryResultCache(max_entries=2, ttl=60, clock=clock)
+    else:
+        backend = SQLiteResultCache(str(tmp_path / 'cache.db'), max_entries=2, ttl=60, clock=clock)
+    return backend, clock
+
+def test_cache_lru_ttl_and_invalidation(cache):
+    """LRUの追い出し・TTL・対象ごとの無効化のテスト"""
+    cache, clock = cache
+    cache.set('a', 'u1', b'1')
+    clock.now += 1
+    cache.set('b', 'u2', b'2')
+    clock.now += 1
+    assert cache.get('a') == b'1'
+    clock.now += 1
+    
+    # 最も古く参照された b が追い出される
+    cache.set('c', 'u1', b'3')
+    assert cache.get('b') is None
+    assert len(cache) == 2
+    
+    cache.invalidate({'u1'})
+    assert cache.get('a') is None and cache.get('c') is None
+    
+    cache.set('d', 'u2', b'4')
+    clock.now += 61
+    assert cache.get('d') is None
+    
+    stats = cache.stats.snapshot()
+    assert stats['hits'] == 1
+    assert stats['evictions'] == 1
+    assert stats['invalidations'] == 2
+    assert stats['expirations'] == 1
+
+def test_sqlite_cache_path_is_relative_to_instance_path(tmp_path, monkeypatch):
+    """SQLiteキャッシュの相対パスが起動ディレクトリではなくインスタンスフォルダ基準になるテスト"""
+    monkeypatch.chdir(tmp_path)
+    config = dict(app.config, RESULT_CACHE_BACKEND='sqlite', RESULT_CACHE_PATH='instance/result_cache.db')
+    
+    cache = create_result_cache(config, str(tmp_path / 'app_instance'))
+    assert cache.path == str(tmp_path / 'app_instance' / 'instance' / 'result_cache.db')
+    
+    absolute = str(tmp_path / 'cache.db')
+    assert create_result_cache(dict(config, RESULT_CACHE_PATH=absolute), str(tmp_path)).path == absolute
+
+def _goal_with_weights():
+    today = datetime.now().date()
+    goal = WeightGoal(user_id='default_user', target_weight=70.0, target_date=today + timedelta(days=30),
+                      start_weight=80.0, start_date=today - timedelta(days=3))
+    db.session.add(goal)
+    for i in range(3):
+        db.session.add(FitbitWeight(user_id='default_user', weight=80 - i, date=today - timedelta(days=3 - i),
+                                    time=time(7), log_id=str(i)))
+    db.session.commit()
+    return goal
+
+def test_diff_and_projection_are_cached_until_write(client):
+    """差分・予測の結果がキャッシュされ、体重・目標の書き込みで無効化されるテスト"""
+    goal = _goal_with_weights()
+    
+    for url in (f'/api/fit/weight/diff?goal_id={goal.id}', f'/api/fit/weight/projection?goal_id={goal.id}'):
+        first = client.get(url)
+        second = client.get(url)
+        assert first.headers['X-Result-Cache'] == 'miss'
+        assert second.headers['X-Result-Cache'] == 'hit'
+        assert second.data == first.data
+    
+    # 同期で体重が追加されると再計算される
+    upsert_weight_entries('default_user', [{'logId': 99, 'weight': 76.0, 'date': datetime.now().date().isoformat()}])
+    response = client.get(f'/api/fit/weight/diff?goal_id={goal.id}')
+    assert response.headers['X-Result-Cache'] == 'miss'
+    assert json.loads(response.data)['current_weight'] == 76.0
+    
+    # 目標の編集でも再計算される
+    client.put(f'/api/fit/goal/{goal.id}', json={'target_weight': 72.0})
+    response = client.get(f'/api/fit/weight/diff?goal_id={goal.id}')
+    assert response.headers['X-Result-Cache'] == 'miss'
+    assert json.loads(response.data)['goal']['target_weight'] == 72.0
+    
+    metrics = json.loads(client.get('/api/fit/cache/metrics').data)
+    assert metrics['backend'] == 'memory'
+    assert metrics['hits'] == 2
+    assert metrics['invalidations'] >= 2
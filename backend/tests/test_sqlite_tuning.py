@@ -0,0 +1,36 @@
+import pytest
+from sqlalchemy import create_engine, text
+from config import Config, engine_options
+from services import pragma_statements, apply_sqlite_pragmas
+
+def test_pragmas_are_applied_to_every_connection(tmp_path):
+    """新しい接続ごとにWALモードなどのPRAGMAが設定されるテスト"""
+    engine = create_engine(f'sqlite:///{tmp_path / "tuned.db"}', **engine_options('sqlite:///tuned.db', 2, 0, 60))
+    assert apply_sqlite_pragmas(engine, Config.SQLITE_PRAGMAS) is True
+    # 同じエンジンには重複して登録しない
+    assert apply_sqlite_pragmas(engine, Config.SQLITE_PRAGMAS) is False
+    
+    with engine.connect() as first, engine.connect() as second:
+        for connection in (first, second):
+            assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert connection.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+            assert connection.execute(text('PRAGMA busy_timeout')).scalar() == Config.SQLITE_PRAGMAS['busy_timeout']
+            assert connection.execute(text('PRAGMA temp_store')).scalar() == 2  # MEMORY
+    engine.dispose()
+
+def test_pragma_statements_validation():
+    """Noneの項目は省略し、未知のPRAGMAや不正な値はエラーになるテスト"""
+    assert pragma_statements({'synchronous': 'NORMAL', 'journal_mode': 'WAL', 'mmap_size': None}) == [
+        'PRAGMA journal_mode=WAL', 'PRAGMA synchronous=NORMAL'
+    ]
+    with pytest.raises(ValueError):
+        pragma_statements({'journal_mode': 'WAL; DROP TABLE data'})
+    with pytest.raises(ValueError):
+        pragma_statements({'writable_schema': 1})
+
+def test_engine_options_for_memory_database():
+    """インメモリSQLiteではプールサイズを指定しないテスト"""
+    assert engine_options('sqlite:///:memory:', 5, 10, 1800) == {'pool_pre_ping': True}
+    assert engine_options('sqlite:////app/instance/app.db', 5, 10, 1800) == {
+        'pool_pre_ping': True, 'pool_size': 5, 'max_overflow': 10, 'pool_recycle': 1800
+    }
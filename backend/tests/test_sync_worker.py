@@ -0,0 +1,106 @@
+import pytest
+import json
+from datetime import datetime, timedelta
+from app import app, db
+from models import FitbitSyncJob, FitbitSyncState
+from services import run_pending_jobs, schedule_periodic_syncs, sync_user_weights
+from tests.fake_fitbit import FakeFitbitServer, make_weight_logs, create_auth
+
+@pytest.fixture
+def fitbit():
+    """ローカルのFitbit APIサーバーに向けたテスト用クライアントを作成する"""
+    app.config['TESTING'] = True
+    original = dict(app.config)
+    today = datetime.now().date()
+    
+    with FakeFitbitServer(make_weight_logs(today - timedelta(days=9), 10)) as server:
+        app.config['FITBIT_API_BASE_URL'] = server.base_url
+        app.extensions.pop('fitbit_client', None)
+        app.extensions.pop('fitbit_token_cache', None)
+        with app.test_client() as client:
+            with app.app_context():
+                db.create_all()
+                yield client, server
+                db.session.remove()
+                db.drop_all()
+    
+    app.config.update(original)
+    app.extensions.pop('fitbit_client', None)
+
+def test_weight_endpoint_serves_local_data_and_enqueues_sync(fitbit):
+    """体重取得はFitbit APIを待たずにローカルデータを返し、同期はワーカーが行うテスト"""
+    client, server = fitbit
+    create_auth(db)
+    
+    response = client.get('/api/fitbit/weight')
+    data = json.loads(response.data)
+    assert response.status_code == 200
+    assert data['data'] == []
+    assert data['last_synced_at'] is None
+    assert data['sync_pending'] is True
+    assert server.weight_requests() == []
+    
+    assert run_pending_jobs() == 1
+    assert len(server.weight_requests()) == 1
+    
+    response = client.get('/api/fitbit/weight')
+    data = json.loads(response.data)
+    assert len(data['data']) == 10
+    assert data['last_synced_at'] is not None
+    assert data['sync_pending'] is False
+    assert FitbitSyncJob.query.count() == 1
+
+def test_weight_endpoint_requires_fitbit_connection(fitbit):
+    """Fitbit未連携の場合は401を返すテスト"""
+    client, server = fitbit
+    
+    response = client.get('/api/fitbit/weight')
+    assert response.status_code == 401
+
+def test_periodic_schedule_enqueues_each_connected_user_once(fitbit):
+    """定期同期は連携済みの各ユーザーに1件だけジョブを登録するテスト"""
+    client, server = fitbit
+    create_auth(db, user_id='user-a')
+    create_auth(db, user_id='user-b')
+    
+    assert schedule_periodic_syncs() == 2
+    assert schedule_periodic_syncs() == 0
+    
+    assert run_pending_jobs() == 2
+    assert {job.status for job in FitbitSyncJob.query} == {'completed'}
+    assert {state.last_status for state in FitbitSyncState.query} == {'completed'}
+    
+    # 同期間隔が経過するまでは再登録しない
+    assert schedule_periodic_syncs() == 0
+    assert schedule_periodic_syncs(now=datetime.utcnow() + timedelta(hours=1)) == 2
+
+def test_routine_sync_resumes_from_high_water_mark(fitbit):
+    """定期同期は high-water mark の前日からだけを取得し、変更のない記録は書き込まないテスト"""
+    client, server = fitbit
+    create_auth(db)
+    today = datetime.now().date()
+    
+    sync_user_weights('default_user')
+    state = FitbitSyncState.query.filter_by(user_id='default_user').one()
+    assert state.last_synced_date == today
+    assert state.last_log_id == 10
+    assert server.weight_requests()[-1] == \
+        f'/1/user/-/body/log/weight/date/{(today - timedelta(days=30)).isoformat()}/{today.isoformat()}.json'
+    
+    # 前日の記録の編集と当日の新しい記録
+    server.weights[-2] = dict(server.weights[-2], weight=70.0)
+    server.weights.append(dict(server.weights[-1], logId=11, time='20:00:00'))
+    
+    assert sync_user_weights('default_user') == {'inserted': 1, 'updated': 1, 'skipped': 1, 'conflicts': 0}
+    assert server.weight_requests()[-1] == \
+        f'/1/user/-/body/log/weight/date/{(today - timedelta(days=1)).isoformat()}/{today.isoformat()}.json'
+    assert FitbitSyncState.query.filter_by(user_id='default_user').one().last_log_id == 11
+    
+    # 同期済みの期間と連続しない過去の期間の同期では high-water mark を変えない
+    sync_user_weights('default_user', today - timedelta(days=60), today - timedelta(days=40))
+    state = FitbitSyncState.query.filter_by(user_id='default_user').one()
+    assert state.last_synced_date == today
+    
+    app.config['FITBIT_SYNC_OVERLAP_DAYS'] = 0
+    sync_user_weights('default_user')
+    assert server.weight_requests()[-1] == f'/1/user/-/body/log/weight/date/{today.isoformat()}.json'
@@ -0,0 +1,97 @@
+import pytest
+import json
+import numpy as np
+from datetime import date, timedelta
+from app import app, db
+from services import upsert_weight_entries, load_daily_series, parse_metrics
+from services.weight_analytics import trend, rolling_averages, weekly_aggregates, monthly_aggregates
+
+@pytest.fixture
+def client():
+    """テスト用のクライアントを作成する"""
+    app.config['TESTING'] = True
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.session.remove()
+            db.drop_all()
+
+# (日付, 時刻, 体重) の記録。2024-01-29(月) から 2024-02-05(月) まで、欠測日を含む
+READINGS = [
+    (date(2024, 1, 29), '07:00:00', 72.0),
+    (date(2024, 1, 29), '21:00:00', 72.6),
+    (date(2024, 1, 31), '07:00:00', 71.8),
+    (date(2024, 2, 1), '07:00:00', 71.5),
+    (date(2024, 2, 4), '07:00:00', 71.2),
+    (date(2024, 2, 4), '20:00:00', 71.6),
+    (date(2024, 2, 5), '07:00:00', 70.9),
+]
+
+def _seed():
+    upsert_weight_entries('default_user', [
+        {'logId': i, 'weight': weight, 'date': day.isoformat(), 'time': clock}
+        for i, (day, clock, weight) in enumerate(READINGS)
+    ])
+    return load_daily_series('default_user', '2024-01-01', '2024-12-31')
+
+def test_parse_metrics():
+    """metrics パラメータの解析テスト"""
+    assert parse_metrics(None) == ()
+    assert parse_metrics('monthly, trend') == ('trend', 'monthly')
+    assert parse_metrics('all') == ('trend', 'rolling', 'weekly', 'monthly')
+    with pytest.raises(ValueError):
+        parse_metrics('trend,median')
+
+def test_trend_matches_least_squares_over_readings(client):
+    """日次集計からの傾きが全記録の最小二乗法と一致するテスト"""
+    series = _seed()
+    
+    x = [(day - READINGS[0][0]).days for day, _, _ in READINGS]
+    y = [weight for _, _, weight in READINGS]
+    slope, intercept = np.polyfit(x, y, 1)
+    
+    result = trend(series)
+    assert result['slope_per_day'] == pytest.approx(slope, abs=1e-4)
+    assert result['intercept'] == pytest.approx(intercept, abs=0.01)
+    assert result['days'] == 5
+
+def test_rolling_averages_use_calendar_windows(client):
+    """移動平均が暦日の期間内の全記録の平均になるテスト"""
+    series = _seed()
+    
+    rolling = rolling_averages(series, windows=(3,))
+    for point in rolling:
+        day = date.fromisoformat(point['date'])
+        window = [w for d, _, w in READINGS if day - timedelta(days=2) <= d <= day]
+        assert point['mean_3d'] == pytest.approx(round(sum(window) / len(window), 2))
+    assert [point['date'] for point in rolling] == ['2024-01-29', '2024-01-31', '2024-02-01', '2024-02-04', '2024-02-05']
+
+def test_weekly_and_monthly_aggregates(client):
+    """週次（月曜始まり）・月次の集計テスト"""
+    series = _seed()
+    
+    weekly = weekly_aggregates(series)
+    assert [(w['period_start'], w['count']) for w in weekly] == [('2024-01-29', 6), ('2024-02-05', 1)]
+    assert weekly[0]['min_weight'] == 71.2 and weekly[0]['max_weight'] == 72.6
+    assert weekly[0]['change'] == pytest.approx(71.6 - 72.0)
+    
+    monthly = monthly_aggregates(series)
+    assert [(m['period_start'], m['count']) for m in monthly] == [('2024-01-01', 3), ('2024-02-01', 4)]
+    assert monthly[1]['mean_weight'] == pytest.approx(round((71.5 + 71.2 + 71.6 + 70.9) / 4, 2))
+
+def test_analysis_metrics_parameter(client):
+    """analysis エンドポイントの metrics パラメータのテスト"""
+    _seed()
+    url = '/api/fitbit/weight/analysis?from_date=2024-01-01&to_date=2024-12-31'
+    
+    analysis = json.loads(client.get(url).data)['analysis']
+    assert 'metrics' not in analysis
+    assert analysis['count'] == len(READINGS)
+    
+    analysis = json.loads(client.get(url + '&metrics=trend,weekly').data)['analysis']
+    assert set(analysis['metrics']) == {'trend', 'weekly'}
+    
+    response = client.get(url + '&metrics=median')
+    assert response.status_code == 400
@@ -0,0 +1,127 @@
+import pytest
+import json
+from contextlib import contextmanager
+from sqlalchemy import event
+from datetime import datetime, timedelta, time
+from app import app, db
+from models import FitbitWeight, WeightGoal
+
+@pytest.fixture
+def client():
+    """テスト用のクライアントを作成する"""
+    app.config['TESTING'] = True
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.session.remove()
+            db.drop_all()
+
+@contextmanager
+def _count_queries():
+    """実行されたSQL文の数を数える"""
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+    
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+def _add_weight(day, weight, hour=7, log_id=None, user_id='default_user'):
+    """テスト用の体重データを追加する"""
+    entry = FitbitWeight(
+        user_id=user_id,
+        weight=weight,
+        date=day,
+        time=time(hour, 0, 0),
+        log_id=log_id
+    )
+    db.session.add(entry)
+    return entry
+
+def _add_goal(start_date, target_date, start_weight=80.0, target_weight=70.0):
+    """テスト用の目標を追加する"""
+    goal = WeightGoal(
+        user_id='default_user',
+        target_weight=target_weight,
+        target_date=target_date,
+        start_weight=start_weight,
+        start_date=start_date
+    )
+    db.session.add(goal)
+    db.session.commit()
+    return goal
+
+def test_weight_diff_daily_policy(client):
+    """同日に複数の記録がある場合の集約方法テスト"""
+    today = datetime.now().date()
+    start = today - timedelta(days=2)
+    goal = _add_goal(start, today + timedelta(days=30))
+    _add_weight(start, 80.0, hour=7)
+    _add_weight(start, 81.0, hour=21)
+    _add_weight(start + timedelta(days=1), 79.5)
+    db.session.commit()
+    
+    expected = {'first': 80.0, 'last': 81.0, 'mean': 80.5}
+    for policy, weight in expected.items():
+        response = client.get(f'/api/fit/weight/diff?goal_id={goal.id}&daily_policy={policy}')
+        data = json.loads(response.data)
+        assert response.status_code == 200
+        diffs = data['daily_weight_diffs']
+        assert len(diffs) == 3
+        assert diffs[0]['actual_weight'] == weight
+        assert diffs[1]['actual_weight'] == 79.5
+        assert diffs[2]['actual_weight'] is None
+
+def test_weight_diff_invalid_policy(client):
+    """無効な集約方法の指定テスト"""
+    today = datetime.now().date()
+    goal = _add_goal(today, today + timedelta(days=30))
+    
+    response = client.get(f'/api/fit/weight/diff?goal_id={goal.id}&daily_policy=median')
+    assert response.status_code == 400
+
+def test_get_goals_query_count_is_constant(client):
+    """目標一覧の取得で目標数に関わらずクエリ数が一定であることのテスト"""
+    today = datetime.now().date()
+    _add_weight(today, 75.0)
+    _add_goal(today, today + timedelta(days=30))
+    
+    with _count_queries() as single:
+        response = client.get('/api/fit/goal')
+    assert response.status_code == 200
+    assert json.loads(response.data)[0]['progress_percentage'] == 50.0
+    
+    for i in range(9):
+        _add_goal(today, today + timedelta(days=31 + i))
+    
+    with _count_queries() as many:
+        response = client.get('/api/fit/goal')
+    data = json.loads(response.data)
+    assert len(data) == 10
+    assert all(goal['progress_percentage'] == 50.0 for goal in data)
+    assert len(many) == len(single)
+
+def test_weight_diff_columnar_format(client):
+    """差分データの列指向形式が通常の形式と同じ値を返すテスト"""
+    today = datetime.now().date()
+    start = today - timedelta(days=2)
+    goal = _add_goal(start, today + timedelta(days=30))
+    _add_weight(start, 80.0)
+    _add_weight(start + timedelta(days=1), 79.5)
+    db.session.commit()
+    
+    rows = json.loads(client.get(f'/api/fit/weight/diff?goal_id={goal.id}').data)['daily_weight_diffs']
+    columnar = json.loads(client.get(f'/api/fit/weight/diff?goal_id={goal.id}&format=columnar').data)['daily_weight_diffs']
+    
+    assert columnar['count'] == len(rows)
+    for name in ('target_weight', 'actual_weight', 'difference'):
+        assert columnar['columns'][name] == [row[name] for row in rows]
+    assert columnar['dates'] == [(datetime.strptime(row['date'], '%Y-%m-%d').date() - datetime(1970, 1, 1).date()).days for row in rows]
+    
+    response = client.get(f'/api/fit/weight/diff?goal_id={goal.id}&format=binary')
+    assert response.mimetype == 'application/octet-stream'
@@ -0,0 +1,83 @@
+import pytest
+import json
+from datetime import date, time
+from app import app, db
+from models import FitbitWeight
+from tests.fake_fitbit import create_auth
+
+URL = '/api/fitbit/weight?from_date=2024-01-01&to_date=2024-01-31'
+
+@pytest.fixture
+def client():
+    """Fitbit連携済みのテスト用クライアントを作成する"""
+    app.config['TESTING'] = True
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            create_auth(db)
+            _seed()
+            yield client
+            db.session.remove()
+            db.drop_all()
+
+def _seed():
+    """同じ日時の記録や時刻のない記録を含む体重データを追加する"""
+    readings = [
+        (date(2024, 1, 2), time(7, 0)), (date(2024, 1, 1), time(21, 0)), (date(2024, 1, 1), None),
+        (date(2024, 1, 1), time(7, 0)), (date(2024, 1, 1), time(7, 0)), (date(2024, 1, 2), None),
+        (date(2024, 1, 3), time(6, 30)),
+    ]
+    for i, (day, clock) in enumerate(readings):
+        db.session.add(FitbitWeight(user_id='default_user', weight=70 + i, date=day, time=clock, log_id=str(i)))
+    db.session.add(FitbitWeight(user_id='other_user', weight=60, date=date(2024, 1, 1), log_id='other'))
+    db.session.commit()
+
+def _expected_ids():
+    entries = FitbitWeight.query.filter_by(user_id='default_user').all()
+    entries.sort(key=lambda w: (w.date, w.time is not None, w.time or time(), w.id))
+    return [w.id for w in entries]
+
+def test_keyset_pagination_walks_all_rows_once(client):
+    """カーソルを辿ると全件が重複・欠落なく (date, time, id) 順に返るテスト"""
+    ids = []
+    cursor = None
+    pages = 0
+    while True:
+        url = URL + '&limit=2' + (f'&cursor={cursor}' if cursor else '')
+        data = json.loads(client.get(url).data)
+        ids.extend(entry['id'] for entry in data['data'])
+        pages += 1
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+    
+    assert ids == _expected_ids()
+    assert pages == 4
+
+def test_stream_json_matches_buffered_response(client):
+    """stream=json の出力が通常の応答と同じ内容になるテスト"""
+    buffered = json.loads(client.get(URL).data)
+    streamed = json.loads(client.get(URL + '&stream=json').data)
+    
+    assert streamed == buffered
+    assert [entry['id'] for entry in streamed['data']] == _expected_ids()
+
+def test_stream_ndjson(client):
+    """stream=ndjson で1行1件のJSONが返るテスト"""
+    response = client.get(URL + '&stream=ndjson')
+    lines = response.data.decode().splitlines()
+    
+    assert response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line)['id'] for line in lines] == _expected_ids()
+
+@pytest.mark.parametrize('query', ['&limit=0', '&limit=abc', '&cursor=not-a-cursor', '&stream=xml', '&stream=json&limit=10'])
+def test_invalid_paging_parameters(client, query):
+    """不正なページング・ストリーミング指定で400を返すテスト"""
+    assert client.get(URL + query).status_code == 400
+
+@pytest.mark.parametrize('path', ['/api/fitbit/weight', '/api/fitbit/weight/analysis'])
+@pytest.mark.parametrize('query', ['from_date=2024-1-1x', 'to_date=yesterday', 'from_date=2024-02-01&to_date=2024-01-01'])
+def test_invalid_date_range(client, path, query):
+    """日付の形式が不正な場合や期間が逆の場合は400を返すテスト"""
+    assert client.get(f'{path}?{query}').status_code == 400
@@ -0,0 +1,96 @@
+import pytest
+import json
+import numpy as np
+from datetime import date, datetime, timedelta
+from app import app, db
+from models import WeightGoal
+from services import upsert_weight_entries, load_daily_series, project_weights
+
+TODAY = date(2024, 3, 1)
+
+@pytest.fixture
+def client():
+    """テスト用のクライアントを作成する"""
+    app.config['TESTING'] = True
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.session.remove()
+            db.drop_all()
+
+def _seed(weights, end=TODAY):
+    """end の前日までの1日1件の体重データを追加する"""
+    start = end - timedelta(days=len(weights))
+    upsert_weight_entries('default_user', [
+        {'logId': i, 'weight': weight, 'date': (start + timedelta(days=i)).isoformat(), 'time': '07:00:00'}
+        for i, weight in enumerate(weights)
+    ])
+    return load_daily_series('default_user', start, end)
+
+def test_linear_projection_on_exact_trend(client):
+    """直線的に減少するデータで傾き・今日の推定値が一致し、区間の幅が0になるテスト"""
+    series = _seed([80 - 0.1 * i for i in range(20)])
+    
+    projection = project_weights(series, TODAY, 10, 'linear')
+    
+    assert projection.slope == pytest.approx(-0.1)
+    assert projection.level == pytest.approx(78.0)
+    assert projection.mean.tolist() == pytest.approx([78.0 - 0.1 * h for h in range(1, 11)])
+    assert np.allclose(projection.upper, projection.lower)
+
+def test_theil_sen_ignores_outliers(client):
+    """外れ値があってもTheil–Senの傾きは影響を受けないテスト"""
+    weights = [80 - 0.1 * i for i in range(20)]
+    weights[5] = 90.0
+    weights[15] = 60.0
+    series = _seed(weights)
+    
+    assert project_weights(series, TODAY, 5, 'theil_sen').slope == pytest.approx(-0.1)
+    assert project_weights(series, TODAY, 5, 'linear').slope != pytest.approx(-0.1, abs=0.01)
+
+def test_smoothing_models(client):
+    """EWMAは傾きなしで区間が広がり、Holtは傾向を捉えるテスト"""
+    rng = np.random.default_rng(0)
+    series = _seed((80 - 0.1 * np.arange(60) + rng.normal(0, 0.3, 60)).tolist())
+    
+    ewma = project_weights(series, TODAY, 30, 'ewma')
+    assert ewma.slope == 0
+    width = ewma.upper - ewma.lower
+    assert np.all(np.diff(width) > 0)
+    
+    holt = project_weights(series, TODAY, 30, 'holt')
+    assert holt.slope == pytest.approx(-0.1, abs=0.05)
+    assert np.all(np.diff(holt.upper - holt.lower) > 0)
+
+def test_average_model_matches_previous_behaviour(client):
+    """average モデルが最初と最後の記録の差による従来の予測と一致するテスト"""
+    series = _seed([80.0, 79.0, 79.5, 78.0])
+    
+    projection = project_weights(series, TODAY, 3, 'average')
+    
+    assert projection.slope == pytest.approx(-2.0 / 3)
+    assert projection.mean.tolist() == pytest.approx([78.0 - 2.0 / 3 * h for h in (1, 2, 3)])
+    assert projection.lower is None
+
+def test_projection_endpoint(client):
+    """予測エンドポイントの model・days・lookback パラメータのテスト"""
+    today = datetime.now().date()
+    _seed([80 - 0.1 * i for i in range(40)], end=today)
+    goal = WeightGoal(user_id='default_user', target_weight=70.0, target_date=today + timedelta(days=200),
+                      start_weight=80.0, start_date=today - timedelta(days=40))
+    db.session.add(goal)
+    db.session.commit()
+    
+    data = json.loads(client.get(f'/api/fit/weight/projection?goal_id={goal.id}&model=theil_sen&days=3650').data)
+    assert data['model'] == 'theil_sen'
+    assert data['lookback_days'] == 28
+    assert data['avg_change_per_day'] == pytest.approx(-0.1)
+    assert len(data['weight_projections']) == 3650
+    assert set(data['weight_projections'][0]) == {'date', 'projected_weight', 'lower', 'upper'}
+    # 今日の推定値 76.0 から 0.1kg/日 で 70.0 まで 60日
+    assert data['projected_completion_date'] == (today + timedelta(days=60)).isoformat()
+    
+    for query in ('model=arima', 'days=0', 'days=3651', 'lookback=1', 'days=abc'):
+        assert client.get(f'/api/fit/weight/projection?goal_id={goal.id}&{query}').status_code == 400
@@ -0,0 +1,96 @@
+import pytest
+import json
+from datetime import date
+from app import app, db
+from models import FitbitWeight, FitbitWeightDaily
+from services import upsert_weight_entries, rebuild_rollups, check_rollups
+
+@pytest.fixture
+def client():
+    """テスト用のクライアントを作成する"""
+    app.config['TESTING'] = True
+    
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            yield client
+            db.session.remove()
+            db.drop_all()
+
+def _entry(log_id, weight, day, clock='07:00:00', bmi=24.0):
+    """Fitbit APIの体重ログ形式のエントリを作成する"""
+    return {'logId': log_id, 'weight': weight, 'bmi': bmi, 'date': day, 'time': clock, 'source': 'API'}
+
+def _rollup(day, user_id='default_user'):
+    return FitbitWeightDaily.query.filter_by(user_id=user_id, date=day).one_or_none()
+
+def test_rollup_maintained_on_sync_insert_and_update(client):
+    """同期による追加・更新で該当日の集計だけが更新されるテスト"""
+    upsert_weight_entries('default_user', [
+        _entry(1, 71.0, '2024-01-01', '07:00:00'),
+        _entry(2, 70.0, '2024-01-01', '21:00:00', bmi=None),
+        _entry(3, 69.5, '2024-01-02'),
+    ])
+    
+    day = _rollup(date(2024, 1, 1))
+    assert (day.count, day.min_weight, day.max_weight) == (2, 70.0, 71.0)
+    assert (day.first_weight, day.last_weight) == (71.0, 70.0)
+    assert day.mean_weight == pytest.approx(70.5)
+    assert day.mean_bmi == pytest.approx(24.0)
+    
+    # Fitbit側で編集されたログ（日付の移動を含む）
+    upsert_weight_entries('default_user', [_entry(2, 72.0, '2024-01-02', '21:00:00')])
+    
+    assert _rollup(date(2024, 1, 1)).count == 1
+    day = _rollup(date(2024, 1, 2))
+    assert (day.count, day.first_weight, day.last_weight, day.max_weight) == (2, 69.5, 72.0, 72.0)
+    assert check_rollups() == []
+
+def test_rollup_maintained_on_orm_delete(client):
+    """ORMでの削除で集計が更新・削除されるテスト"""
+    upsert_weight_entries('default_user', [_entry(1, 71.0, '2024-01-01'), _entry(2, 70.0, '2024-01-02')])
+    
+    db.session.delete(FitbitWeight.query.filter_by(log_id='2').one())
+    db.session.commit()
+    
+    assert _rollup(date(2024, 1, 2)) is None
+    assert _rollup(date(2024, 1, 1)).count == 1
+    assert check_rollups() == []
+
+def test_rollup_rebuild_and_check(client):
+    """集計の不整合検出と再構築のテスト"""
+    upsert_weight_entries('default_user', [_entry(1, 71.0, '2024-01-01'), _entry(2, 70.0, '2024-01-02')])
+    
+    # 集計を経由しない書き込みで不整合を作る
+    db.session.execute(FitbitWeightDaily.__table__.update().where(
+        FitbitWeightDaily.date == date(2024, 1, 1)).values(max_weight=99.0))
+    db.session.execute(FitbitWeightDaily.__table__.delete().where(FitbitWeightDaily.date == date(2024, 1, 2)))
+    db.session.commit()
+    
+    problems = {(p['date'], p['problem']) for p in check_rollups()}
+    assert problems == {('2024-01-01', 'mismatch'), ('2024-01-02', 'missing')}
+    
+    assert rebuild_rollups() == 2
+    db.session.commit()
+    assert check_rollups() == []
+
+def test_analysis_answers_from_rollup(client):
+    """体重分析が日次集計から計算されるテスト"""
+    upsert_weight_entries('default_user', [
+        _entry(1, 71.0, '2024-01-01', '07:00:00'),
+        _entry(2, 70.0, '2024-01-01', '21:00:00'),
+        _entry(3, 69.0, '2024-01-03'),
+    ])
+    
+    response = client.get('/api/fitbit/weight/analysis?from_date=2024-01-01&to_date=2024-01-31')
+    analysis = json.loads(response.data)['analysis']
+    
+    assert response.status_code == 200
+    assert analysis['count'] == 3
+    assert (analysis['min_weight'], analysis['max_weight']) == (69.0, 71.0)
+    assert analysis['avg_weight'] == pytest.approx(70.0)
+    assert (analysis['start_weight'], analysis['end_weight'], analysis['change']) == (71.0, 69.0, -2.0)
+    assert analysis['chart_data'] == [
+        {'date': '2024-01-01', 'weight': 70.5, 'count': 2},
+        {'date': '2024-01-03', 'weight': 69.0, 'count': 1},
+    ]
@@ -0,0 +1,68 @@
+import pytest
+import json
+import numpy as np
+from datetime import date, time
+from app import app, db
+from models import FitbitWeight
+from services import columnar_payload, pack_binary, unpack_binary, BINARY_MIMETYPE
+from tests.fake_fitbit import create_auth
+
+DATES = [date(2024, 1, 1), date(2024, 1, 1), date(2024, 1, 3)]
+WEIGHTS = [70.3, 70.1, None]
+
+def test_columnar_payload():
+    """列指向ペイロードのテスト"""
+    payload = columnar_payload(DATES, {'weight': WEIGHTS})
+    
+    assert payload['dates'] == [19723, 19723, 19725]
+    assert payload['columns'] == {'weight': [70.3, 70.1, None]}
+    assert payload['count'] == 3
+
+def test_columnar_payload_delta_roundtrip():
+    """差分エンコードした列を累積和で復元できるテスト"""
+    payload = columnar_payload(DATES, {'weight': [70.3, None, 69.95]}, delta=True)
+    
+    assert payload['dates'] == [19723, 0, 2]
+    assert payload['columns']['weight'] == [7030, None, -35]
+    assert list(np.cumsum(payload['dates'])) == [19723, 19723, 19725]
+    assert np.cumsum([7030, -35]).tolist() == [7030, 6995]
+
+@pytest.mark.parametrize('delta', [False, True])
+def test_binary_roundtrip(delta):
+    """バイナリ形式のパックと復元のテスト"""
+    data = pack_binary(DATES, {'weight': WEIGHTS}, delta=delta)
+    days, columns = unpack_binary(data)
+    
+    assert days.tolist() == [19723, 19723, 19725]
+    assert columns['weight'][:2].tolist() == pytest.approx([70.3, 70.1], abs=1e-4)
+    assert np.isnan(columns['weight'][2])
+    assert len(data) == 12 + 1 + len('weight') + 3 * 4 + 3 * 4
+
+def test_weight_endpoint_columnar_and_binary():
+    """体重取得エンドポイントの列指向・バイナリ形式のテスト"""
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+            try:
+                create_auth(db)
+                for i, (day, weight) in enumerate(zip(DATES, [70.3, 70.1, 69.8])):
+                    db.session.add(FitbitWeight(user_id='default_user', weight=weight, date=day,
+                                                time=time(7 + i), log_id=str(i)))
+                db.session.commit()
+                url = '/api/fitbit/weight?from_date=2024-01-01&to_date=2024-01-31'
+                
+                data = json.loads(client.get(url + '&format=columnar').data)['data']
+                assert data['dates'] == [19723, 19723, 19725]
+                assert data['columns']['weight'] == [70.3, 70.1, 69.8]
+                
+                response = client.get(url + '&format=binary&delta=true')
+                assert response.mimetype == BINARY_MIMETYPE
+                days, columns = unpack_binary(response.data)
+                assert days.tolist() == [19723, 19723, 19725]
+                
+                assert client.get(url + '&format=xml').status_code == 400
+                assert client.get(url + '&format=columnar&stream=json').status_code == 400
+            finally:
+                db.session.remove()
+                db.drop_all()
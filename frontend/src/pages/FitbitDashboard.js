@@ -106,7 +106,7 @@ const FitbitDashboard = () => {
     }
   };
   
-  // ChartJSのデータ形式に変換
+  // ChartJSのデータ形式に変換（chart_data は日ごとの平均体重。count はその日の記録数）
   const getChartData = () => {
     if (!analysis.data || !analysis.data.chart_data) {
       return {
@@ -128,8 +128,9 @@ const FitbitDashboard = () => {
       labels: chartData.map(entry => entry.date),
       datasets: [
         {
-          label: 'Weight (kg)',
+          label: 'Daily average weight (kg)',
           data: chartData.map(entry => entry.weight),
+          readingCounts: chartData.map(entry => entry.count),
           fill: false,
           backgroundColor: 'rgb(75, 192, 192)',
           borderColor: 'rgba(75, 192, 192, 0.8)',
@@ -149,6 +150,15 @@ const FitbitDashboard = () => {
         display: true,
         text: 'Weight Trend',
       },
+      tooltip: {
+        callbacks: {
+          // 1日に複数の記録がある日は平均した記録数を表示
+          afterLabel: (context) => {
+            const count = context.dataset.readingCounts && context.dataset.readingCounts[context.dataIndex];
+            return count > 1 ? `Average of ${count} readings` : '';
+          }
+        }
+      },
     },
     scales: {
       y: {